@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark: VKBulkUploader normalization
+=======================================
+Compares the original per-call clean_string/format_date implementations with
+src.utils.normalize on a synthetic DPOR-shaped population, and checks that the
+output is byte-identical.
+
+With --record-perf the timings are kept in the performance history
+(src/utils/perf_history.py) under the current git revision, so versions can
+be compared:
+
+    python -m src.utils.perf_history versions --source bench_normalize
+    python -m src.utils.perf_history report --source bench_normalize --kind benchmark
+
+Usage:
+    python benchmarks/bench_normalize.py --records 200000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.utils.normalize import BatchNormalizer, DATE_COLUMNS  # noqa: E402
+from src.utils.perf_history import PerfHistory, RunMetrics  # noqa: E402
+
+
+def legacy_clean_string(text):
+    """Original VKBulkUploader.clean_string"""
+    if not text:
+        return 'NA'
+    return str(text).replace(',', '').replace("'", '').replace('"', '').strip()
+
+
+def legacy_format_date(date_str):
+    """Original VKBulkUploader.format_date"""
+    if not date_str or date_str == 'NA':
+        return 'NA'
+
+    try:
+        for fmt in ['%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%d', '%b %d, %Y', '%m/%d/%Y']:
+            try:
+                dt = datetime.strptime(date_str, fmt)
+                return dt.strftime('%m/%d/%Y')
+            except:  # noqa: E722
+                continue
+        return date_str
+    except:  # noqa: E722
+        return 'NA'
+
+
+def legacy_normalize(records):
+    return [
+        {k: legacy_format_date(v) if k in DATE_COLUMNS else legacy_clean_string(v) for k, v in r.items()}
+        for r in records
+    ]
+
+
+def make_records(n, seed=42):
+    """Synthetic records with DPOR-like value repetition"""
+    rng = random.Random(seed)
+    cities = ["RICHMOND", "ARLINGTON", "FAIRFAX", "ALEXANDRIA", "NORFOLK", "RESTON, VA"]
+    statuses = ["Active", "Expired", "Lapsed", ""]
+    records = []
+    for i in range(n):
+        day = datetime(2024, 1, 1).toordinal() + rng.randint(0, 1500)
+        exp = datetime.fromordinal(day)
+        records.append({
+            "Agency Name": "VA - DPOR - Board for Contractors",
+            "BBB ID": "0241",
+            "Agency ID": "3838",
+            "Agency URL": "https://www.dpor.virginia.gov/",
+            "TOB ID": "",
+            "State Established": "VA",
+            "Business Name": f"O'Brien \"Bros\", Contracting {i}",
+            "Street": f"{rng.randint(1, 9999)} Main St, Suite {rng.randint(1, 99)}",
+            "City": rng.choice(cities),
+            "Zip": f"2{rng.randint(0, 9999):04d}",
+            "Date Established": "",
+            "Category": rng.choice(["Plumbing", "Electrical", ""]),
+            "License Number": f"2705{rng.randint(100000, 999999)}",
+            "Phone Number": "",
+            "Owner First Name": "JOHN",
+            "Owner Last Name": "SMITH",
+            "Expiration Date": exp.strftime(rng.choice(["%Y-%m-%d", "%Y-%m-%d", "%m/%d/%Y"])),
+            "License Status": rng.choice(statuses),
+            "County": ""
+        })
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark upload normalization')
+    parser.add_argument('--records', type=int, default=200000, help='Number of synthetic records')
+    parser.add_argument('--batch-size', type=int, default=5000, help='Upload batch size')
+    parser.add_argument('--record-perf', action='store_true',
+                        help='Record the timings in the performance history')
+    parser.add_argument('--perf-db', default=None, help='Performance history database (default: data/perf_history.db)')
+    parser.add_argument('--label', default=None, help='Tag for the recorded run (e.g. a branch name)')
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    batches = [records[i:i + args.batch_size] for i in range(0, len(records), args.batch_size)]
+
+    start = time.perf_counter()
+    legacy = [legacy_normalize(b) for b in batches]
+    legacy_time = time.perf_counter() - start
+
+    normalizer = BatchNormalizer()
+    start = time.perf_counter()
+    fast = [normalizer.normalize_batch(b) for b in batches]
+    fast_time = time.perf_counter() - start
+
+    identical = json.dumps(legacy).encode() == json.dumps(fast).encode()
+
+    print(f"Records:        {args.records:,}")
+    print(f"Legacy:         {legacy_time:.3f}s ({args.records / legacy_time:,.0f} records/s)")
+    print(f"Normalizer:     {fast_time:.3f}s ({args.records / fast_time:,.0f} records/s)")
+    print(f"Speedup:        {legacy_time / fast_time:.1f}x")
+    print(f"Date cache:     {normalizer.dates.hits:,} hits / {normalizer.dates.misses:,} misses")
+    print(f"Byte-identical: {identical}")
+
+    if args.record_perf:
+        metrics = RunMetrics()
+        metrics.add_stage("legacy", legacy_time, records=args.records)
+        metrics.add_stage("normalize", fast_time, records=args.records)
+        history = PerfHistory(args.perf_db)
+        try:
+            run_id = history.record_run("bench_normalize", metrics, duration=legacy_time + fast_time,
+                                        success=identical, kind="benchmark", label=args.label,
+                                        meta={"records": args.records, "batch_size": args.batch_size})
+            history.check_run(run_id)
+        finally:
+            history.close()
+        print(f"Recorded:       run {run_id} in {history.path}")
+
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,7 +7,24 @@ import sys
 import argparse
 import logging
 from datetime import datetime
-from pathlib import Path
+
+from src.collectors.registry import list_collectors
+from src.orchestrator import (CollectionOrchestrator, OrchestratorOptions, add_orchestrator_arguments,
+                              orchestrator_options_from_args)
+from src.utils.dataset_selection import add_selection_arguments
+from src.utils.checkpoint import add_checkpoint_arguments
+from src.utils.raw_archive import add_archive_arguments
+from src.utils.license_history import add_history_arguments
+from src.utils.license_store import add_store_arguments
+from src.utils.name_matching import add_linking_arguments
+from src.utils.zip_county import ZipCountyTable, add_enrichment_arguments
+from src.utils.bbb_targets import add_target_arguments
+from src.utils.refresh_schedule import add_refresh_arguments
+from src.utils.perf_history import add_perf_arguments
+from src.utils.deadlines import add_deadline_arguments
+from src.utils.upload_api import add_upload_arguments
+from src.utils.log_setup import add_logging_arguments, setup_logging_from_args
+from src.utils.notifications import NotificationDispatcher, WebhookNotifier, add_notification_arguments
 
 try:
     from vk_api_utils import SlackNotifier
@@ -16,17 +33,6 @@ except ImportError:
     SlackNotifier = None
 
 
-def setup_logging(verbose=False):
-    """Set up logging configuration."""
-    log_level = logging.DEBUG if verbose else logging.INFO
-
-    logging.basicConfig(
-        level=log_level,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-
-
 def run_dc_business_licenses(slack=None):
     """Run DC Business License collector."""
     print("\n" + "="*70)
@@ -52,16 +58,29 @@ def run_dc_business_licenses(slack=None):
         return False
 
 
-def run_all(slack=None):
+def run_registered(collectors=None, slack=None, args=None):
+    """
+    Run registered collectors concurrently through the orchestrator.
+
+    Returns:
+        Dictionary of collector display name -> success
+    """
+    options = orchestrator_options_from_args(args) if args else OrchestratorOptions(
+        zip_table=ZipCountyTable.open_default())
+    orchestrator = CollectionOrchestrator(collectors=collectors, options=options, notifier=slack)
+    return {r.display_name: r.success for r in orchestrator.run()}
+
+
+def run_all(slack=None, args=None):
     """Run all DC collectors."""
     print("\n" + "="*70)
     print("  RUNNING ALL DC COLLECTORS")
     print(f"  Started: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print("="*70)
 
-    results = {
-        'Business Licenses': run_dc_business_licenses(slack)
-    }
+    # Only registered collectors run here; the DC Business License stub is not
+    # implemented yet and stays available as the "business" choice
+    results = run_registered(slack=slack, args=args)
 
     # Print summary
     print("\n" + "="*70)
@@ -80,9 +99,29 @@ def main():
     parser = argparse.ArgumentParser(description="DC License Data Collectors")
     parser.add_argument(
         "collector",
-        choices=["business", "all"],
+        choices=["business", "all"] + list_collectors(),
         help="Which collector to run"
     )
+    parser.add_argument(
+        "--save-csv",
+        action="store_true",
+        help="Save collected data to CSV files"
+    )
+    parser.add_argument(
+        "--upload",
+        action="store_true",
+        help="Upload data to Visual Knowledge API"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Perform dry run (don't actually upload)"
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Divert records failing validation rules to a rejects file"
+    )
     parser.add_argument(
         "--verbose",
         "-v",
@@ -95,16 +134,32 @@ def main():
         choices=["on", "off"],
         help="Enable/disable Slack notifications (default: on)"
     )
+    add_orchestrator_arguments(parser)
+    add_selection_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_archive_arguments(parser)
+    add_history_arguments(parser)
+    add_store_arguments(parser)
+    add_linking_arguments(parser)
+    add_enrichment_arguments(parser)
+    add_target_arguments(parser)
+    add_refresh_arguments(parser)
+    add_perf_arguments(parser)
+    add_deadline_arguments(parser)
+    add_upload_arguments(parser)
+    add_notification_arguments(parser)
+    add_logging_arguments(parser)
 
     args = parser.parse_args()
 
     # Set up logging
-    setup_logging(args.verbose)
+    setup_logging_from_args(args)
 
-    # Set up Slack notifications
+    # Set up Slack notifications; they are sent from a background thread
     slack = None
-    if args.slack.lower() != "off" and SlackNotifier:
-        slack = SlackNotifier("DC Collectors")
+    if args.slack.lower() != "off" and (args.notify_webhook or SlackNotifier):
+        notifier = WebhookNotifier(args.notify_webhook) if args.notify_webhook else SlackNotifier("DC Collectors")
+        slack = NotificationDispatcher(notifier, digest_interval=args.notify_interval)
         slack.notify_start({
             "Collector": args.collector.upper(),
             "Time": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -116,7 +171,9 @@ def main():
         if args.collector == "business":
             success = run_dc_business_licenses(slack)
         elif args.collector == "all":
-            success = run_all(slack)
+            success = run_all(slack, args)
+        else:
+            success = all(run_registered([args.collector], slack, args).values())
 
         # Send final notification
         if slack:
@@ -131,6 +188,8 @@ def main():
             slack.notify_error("DC collectors failed", exception=e)
         success = False
 
+    if slack:
+        slack.close()
     sys.exit(0 if success else 1)
 
 
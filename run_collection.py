@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 Main runner script for DC collectors.
-Runs all collectors for BBB 0241 (DC region).
+Runs all registered collectors for BBB 0241 (DC region) concurrently.
 """
 
 import sys
@@ -12,11 +12,6 @@ from pathlib import Path
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 
@@ -46,10 +41,69 @@ Examples:
 
   # Save and upload
   %(prog)s --save-csv --upload
+
+  # Parse datasets on 16 cores
+  %(prog)s --save-csv --workers 16
+
+  # Run collectors two at a time, 8 downloads each, sharing 2 upload slots
+  %(prog)s --upload --max-parallel 2 --network-slots 8 --upload-slots 2
+
+  # Refresh one board only
+  %(prog)s --upload --include '0225*'
+
+  # Node 2 of a 4-node run
+  %(prog)s --upload --shard 2/4 --dataset-sizes /shared/dataset_sizes.json
+
+  # Checkpoint a nightly run, then resume it after a failure
+  %(prog)s --upload --checkpoint
+  %(prog)s --upload --resume 20250419_031500
+
+  # Archive downloads, then re-run parsing offline from the latest snapshot
+  %(prog)s --archive --save-csv
+  %(prog)s --replay latest --save-csv
+
+  # Record license status changes, then list licenses that expired this week
+  %(prog)s --track-changes
+  python -m src.utils.license_history query --since 2025-04-12 --status Expired
+
+  # Refresh the embedded license store and look up a business
+  %(prog)s --load-store
+  python -m src.utils.license_store name "acme" --prefix
+
+  # Fill County from a ZIP table built from a crosswalk CSV
+  python -m src.utils.zip_county build zip_county.csv --city-column city
+  %(prog)s --save-csv
+
+  # Download and parse once, upload to every BBB region in the targets file
+  %(prog)s --upload --bbb-targets config/bbb_targets.json --upload-slots 3
+
+  # Clean text fields and format dates before uploading
+  %(prog)s --upload --normalize-uploads
+
+  # Profile the parse and upload stages
+  %(prog)s --upload --dry-run --profile --profile-stages process,upload
         """
     )
 
-    parser.add_argument('--collector', choices=['dpor', 'all'],
+    from src.collectors.registry import list_collectors
+    from src.orchestrator import (CollectionOrchestrator, add_orchestrator_arguments,
+                                  orchestrator_options_from_args)
+    from src.utils.profiling import add_profiling_arguments, profiler_from_args
+    from src.utils.dataset_selection import add_selection_arguments
+    from src.utils.checkpoint import add_checkpoint_arguments, run_id_from_args
+    from src.utils.raw_archive import add_archive_arguments
+    from src.utils.license_history import add_history_arguments
+    from src.utils.license_store import add_store_arguments
+    from src.utils.name_matching import add_linking_arguments
+    from src.utils.zip_county import add_enrichment_arguments
+    from src.utils.bbb_targets import add_target_arguments
+    from src.utils.refresh_schedule import add_refresh_arguments
+    from src.utils.perf_history import add_perf_arguments
+    from src.utils.deadlines import add_deadline_arguments
+    from src.utils.upload_api import add_upload_arguments
+    from src.utils.log_setup import add_logging_arguments, setup_logging_from_args
+
+    parser.add_argument('--collector', choices=list_collectors() + ['all'],
                         default='all', help='Which collector(s) to run')
     parser.add_argument('--save-csv', action='store_true',
                         help='Save collected data to CSV files')
@@ -59,58 +113,65 @@ Examples:
                         help='Perform dry run (don\'t actually upload)')
     parser.add_argument('--headless', action='store_true', default=True,
                         help='Run Chrome in headless mode (default: True)')
+    parser.add_argument('--validate', action='store_true',
+                        help='Divert records failing validation rules to a rejects file')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable debug logging')
+    add_orchestrator_arguments(parser)
+    add_selection_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_archive_arguments(parser)
+    add_history_arguments(parser)
+    add_store_arguments(parser)
+    add_linking_arguments(parser)
+    add_enrichment_arguments(parser)
+    add_target_arguments(parser)
+    add_refresh_arguments(parser)
+    add_perf_arguments(parser)
+    add_deadline_arguments(parser)
+    add_upload_arguments(parser)
+    add_profiling_arguments(parser)
+    add_logging_arguments(parser)
 
     args = parser.parse_args()
+    setup_logging_from_args(args)
+    profiler = profiler_from_args(args)
+    run_id = run_id_from_args(args)
 
     logger.info("=" * 70)
     logger.info("DC DATA COLLECTION RUNNER")
     logger.info("=" * 70)
     logger.info(f"Start time: {datetime.now()}")
-    logger.info(f"BBB ID: 0241 (DC Region)")
+    logger.info("BBB ID: 0241 (DC Region)")
     logger.info(f"Collector: {args.collector}")
     logger.info(f"Save CSV: {args.save_csv}")
     logger.info(f"Upload: {args.upload}")
     logger.info(f"Dry Run: {args.dry_run}")
+    logger.info(f"Validate: {args.validate}")
+    if args.include or args.exclude or args.shard:
+        logger.info(f"Datasets: include={args.include} exclude={args.exclude} shard={args.shard}")
+    if run_id:
+        logger.info(f"Checkpoint: run {run_id} (resume with --resume {run_id})")
+    if args.bbb_targets:
+        logger.info(f"BBB targets: {args.bbb_targets}")
+    if args.replay:
+        logger.info(f"Replay: archived snapshot {args.replay} (no downloads)")
+    elif args.refresh:
+        logger.info(f"Refresh: datasets likely to have changed (budget: "
+                    f"{f'{args.refresh_budget:g} MB' if args.refresh_budget is not None else 'unlimited'})")
+    if args.run_budget:
+        logger.info(f"Run budget: {args.run_budget:g} minutes")
+    if args.profile:
+        logger.info(f"Profiling: {args.profile_stages or 'all stages'} -> {profiler.run_dir}")
     logger.info("=" * 70)
 
-    total_records = 0
-    collectors_run = []
-
-    # Run DPOR collector
-    if args.collector in ['dpor', 'all']:
-        logger.info("\n" + "-" * 50)
-        logger.info("Running VA DPOR Collector...")
-        logger.info("-" * 50)
-
-        try:
-            from src.collectors.dpor.dpor_collector import VaDPORCollector
-
-            collector = VaDPORCollector(headless=args.headless)
-            data = collector.collect()
-
-            if data:
-                total_records += len(data)
-                collectors_run.append(('VA DPOR', len(data)))
-
-                # Save to CSV if requested
-                if args.save_csv:
-                    csv_file = collector.save_to_csv()
-                    logger.info(f"✅ Data saved to: {csv_file}")
-
-                # Upload to API if requested
-                if args.upload:
-                    success = collector.upload_to_api(dry_run=args.dry_run)
-                    if success:
-                        logger.info("✅ Upload completed successfully")
-                    else:
-                        logger.error("❌ Upload failed")
-            else:
-                logger.warning("⚠️ No data collected from VA DPOR")
-
-        except Exception as e:
-            logger.error(f"❌ Error running VA DPOR collector: {e}")
-            import traceback
-            traceback.print_exc()
+    orchestrator = CollectionOrchestrator(
+        collectors=None if args.collector == 'all' else [args.collector],
+        options=orchestrator_options_from_args(args),
+        profiler=profiler
+    )
+    results = orchestrator.run()
+
+    total_records = sum(r.records for r in results)
 
     # Summary
     logger.info("\n" + "=" * 70)
@@ -118,11 +179,17 @@ Examples:
     logger.info("=" * 70)
     logger.info(f"Total records collected: {total_records}")
     logger.info("Collectors run:")
-    for name, count in collectors_run:
-        logger.info(f"  - {name}: {count} records")
+    for r in results:
+        status = "✅" if r.success else "❌"
+        logger.info(f"  - {status} {r.display_name}: {r.records} records in {r.duration:.1f}s")
+        if r.csv_file:
+            logger.info(f"      CSV: {r.csv_file}")
     logger.info("=" * 70)
     logger.info(f"End time: {datetime.now()}")
 
+    # With --refresh a run where nothing changed is still a success
+    if args.refresh and results and all(r.success for r in results):
+        return 0
     return 0 if total_records > 0 else 1
 
 
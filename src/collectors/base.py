@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+Base Collector
+==============
+Common streaming interface for DC region collectors.
+
+A collector subclasses BaseCollector, registers itself with
+@register_collector and implements iter_records(). Everything else comes
+from the base class:
+
+- collect(): materialize the record stream into self.collected_data, within
+  an optional memory budget (see src/utils/record_buffer.py)
+- validation: optional pre-upload rule checks (see src/utils/validation.py)
+- enrich_records(): County filled from the offline ZIP table, if built
+  (see src/utils/zip_county.py)
+- checkpoint: optional per-dataset progress for resumable runs
+  (see src/utils/checkpoint.py)
+- cached(): per-collector memoization (e.g. header mappings)
+- reset_run() / close(): reuse one warm collector (HTTP session, DB engine,
+  caches) across runs, e.g. in the collector service (see src/service.py)
+- fetch_parallel(): concurrent downloads bounded by download_workers, optionally
+  kept in a raw archive and replayed from it (see src/utils/raw_archive.py);
+  large files are fetched as parallel, resumable Range requests
+  (see src/utils/ranged_download.py), and slow small ones are hedged
+- budget: optional run time budget split across stages; downloads and uploads
+  stop at their stage's deadline (see src/utils/deadlines.py)
+- save_to_csv() / save_to_parquet(): streaming file sinks
+- upload_to_api(): batched upload via VKBulkUploader
+- upload_to_targets(): one collection uploaded to several BBB regions
+  (see src/utils/bbb_targets.py)
+"""
+
+import csv
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import chain, islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+from src.utils.deadlines import Deadline, DeadlineExceeded, HedgePolicy, RunBudget
+from src.utils.log_setup import RATE_LIMITED, ErrorTally
+from src.utils.perf_history import RunMetrics
+from src.utils.profiling import StageProfiler
+from src.utils.ranged_download import DownloadError, RangedDownloader
+from src.utils.record_buffer import SpillingRecordList
+from src.utils.validation import RecordValidator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+
+class BaseCollector:
+    """Base class for streaming collectors"""
+
+    # Subclasses override these
+    bbb_id = ""
+    agency_id = ""
+    agency_name = ""
+    file_prefix = "collector_data"
+
+    def __init__(self, output_dir: str = "data", profiler: Optional[StageProfiler] = None,
+                 workers: int = 1, download_workers: int = 1, db_pool_size: Optional[int] = None,
+                 headless: bool = True, validate: bool = False, selector=None,
+                 checkpoint=None, archive=None, replay: Optional[str] = None,
+                 zip_table=None, refresh=None, memory_budget: Optional[int] = None,
+                 budget: Optional[RunBudget] = None, hedge: bool = True, hedge_uploads: bool = False,
+                 normalize_uploads: bool = False):
+        """
+        Initialize shared collector state.
+
+        Args:
+            output_dir: Directory to save collected data
+            profiler: Optional stage profiler (profiling is off by default)
+            workers: Number of processes for CPU-bound parsing (1 = serial)
+            download_workers: Number of concurrent downloads
+            db_pool_size: Cap on database connections (None = SQLAlchemy default)
+            headless: Run browsers in headless mode
+            validate: Divert records failing config/validation_rules.json to a rejects file
+            selector: Optional DatasetSelector limiting which datasets are processed
+            checkpoint: Optional RunCheckpoint for resumable, per-dataset progress
+            archive: Optional RawArchive that keeps every downloaded file
+            replay: Archive snapshot date (or "latest") to process instead of downloading
+            zip_table: Optional ZipCountyTable used to fill empty County fields
+            refresh: Optional RefreshScheduler limiting downloads to datasets likely to have changed
+            memory_budget: Bytes of collected records kept in RAM; the rest spill to
+                disk segments (None = no limit)
+            budget: Optional RunBudget; downloads and uploads stop at their stage's deadline
+            hedge: Re-issue single-stream downloads that run past the p95 latency
+            hedge_uploads: Also re-send slow upload batches (only if the API ignores duplicates)
+            normalize_uploads: Clean text fields and format dates of each upload batch
+        """
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(exist_ok=True, parents=True)
+        self.workers = max(1, workers)
+        self.download_workers = max(1, download_workers)
+        self.db_pool_size = db_pool_size
+        self.headless = headless
+        self.memory_budget = memory_budget
+        # Keep expensive per-run resources (e.g. a browser) open between runs
+        self.keep_warm = False
+
+        # Connections are reused across downloads (and across runs of a warm collector)
+        self.session = requests.Session()
+        self.downloader = RangedDownloader(self.session, partial_dir=str(self.output_dir / "partial"))
+        # Latency percentiles are learned across the runs of a warm collector
+        self.download_hedge = HedgePolicy("download")
+        self.upload_hedge = HedgePolicy("upload")
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.download_workers * self.downloader.parts)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+        self.reset_run(profiler=profiler, validate=validate, selector=selector, checkpoint=checkpoint,
+                       archive=archive, replay=replay, zip_table=zip_table, refresh=refresh,
+                       budget=budget, hedge=hedge, hedge_uploads=hedge_uploads,
+                       normalize_uploads=normalize_uploads)
+
+    def reset_run(self, profiler: Optional[StageProfiler] = None, validate: bool = False, selector=None,
+                  checkpoint=None, archive=None, replay: Optional[str] = None, zip_table=None,
+                  refresh=None, budget: Optional[RunBudget] = None, hedge: bool = True,
+                  hedge_uploads: bool = False, normalize_uploads: bool = False):
+        """
+        Set the per-run options and drop the previous run's records.
+
+        Connections, caches and other warm resources are kept, so one
+        collector instance can serve many runs. Arguments are as for __init__.
+        """
+        if replay and archive is None:
+            raise ValueError("replay requires an archive")
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.selector = selector
+        self.checkpoint = checkpoint
+        self.archive = archive
+        self.replay = replay
+        self.zip_table = zip_table
+        self.refresh = refresh
+        self.budget = budget
+        self.downloader.hedge = self.download_hedge if hedge else None
+        self.hedge_uploads = hedge_uploads
+        self.normalize_uploads = normalize_uploads
+        self.metrics = RunMetrics()
+        # Why this run's output may not cover every dataset (failed or skipped downloads)
+        self.incomplete: List[str] = []
+        # Row-level parse problems, counted per dataset instead of logged per row
+        self.row_problems = ErrorTally()
+        if isinstance(getattr(self, "collected_data", None), SpillingRecordList):
+            self.collected_data.close()
+        self.collected_data = []
+        self._collected = False
+        # (dataset, start, end) slices of collected_data, set by buffer_datasets()
+        self.dataset_spans: Optional[List[Tuple[str, int, int]]] = None
+        self.validator = RecordValidator(output_dir=str(self.output_dir), prefix=self.file_prefix) if validate else None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Run the wrapped block as a profiler stage, adding its time to this run's metrics."""
+        # Fix the stage's share of the run budget when it starts
+        self.stage_deadline(name)
+        start = time.perf_counter()
+        try:
+            with self.profiler.stage(name):
+                yield
+        finally:
+            self.metrics.add_stage(name, time.perf_counter() - start)
+
+    def stage_deadline(self, name: str) -> Optional[Deadline]:
+        """Deadline of a stage under this run's budget (None without a budget)."""
+        return self.budget.stage(name) if self.budget is not None else None
+
+    def uploader_options(self) -> Dict:
+        """VKBulkUploader options for this run: the upload deadline, hedging and normalization."""
+        return {"deadline": self.stage_deadline("upload"),
+                "hedge": self.upload_hedge if self.hedge_uploads else None,
+                "normalize": self.normalize_uploads}
+
+    def close(self):
+        """Release connections and other warm resources."""
+        if isinstance(self.collected_data, SpillingRecordList):
+            self.collected_data.close()
+        self.session.close()
+
+    # ------------------------------------------------------------------
+    # Interface
+    # ------------------------------------------------------------------
+
+    def iter_records(self) -> Iterator[Dict]:
+        """Yield standardized records one at a time. Subclasses must implement."""
+        raise NotImplementedError
+
+    def iter_validated(self) -> Iterator[Dict]:
+        """iter_records(), filtered through the validation stage if enabled"""
+        stream = self.iter_records()
+        return self.validator.iter_valid(stream) if self.validator else stream
+
+    def validate_records(self, records: List[Dict]) -> List[Dict]:
+        """Run the validation stage over a list of records, if enabled"""
+        if not self.validator:
+            return records
+        with self.stage("validate"):
+            return self.validator.filter(records)
+
+    def enrich_records(self, records: List[Dict]) -> List[Dict]:
+        """Fill County (and empty City) from the ZIP table in place, if enabled"""
+        if self.zip_table is not None:
+            self.zip_table.enrich(records)
+        return records
+
+    def record_buffer(self, records: Iterable[Dict]) -> List[Dict]:
+        """
+        Materialize records: a list, or with a memory budget a SpillingRecordList
+        (iterable, sized, indexable) that keeps the overflow on disk.
+        """
+        if self.memory_budget is None:
+            return list(records)
+        buffer = SpillingRecordList(self.memory_budget, spill_dir=str(self.output_dir / "spill"))
+        buffer.extend(records)
+        if buffer.segments:
+            logger.info(f"Collected records: {buffer!r}")
+        return buffer
+
+    def buffer_datasets(self, dataset_records: Iterable[Tuple[str, Iterable[Dict]]]) -> List[Dict]:
+        """
+        Validate and materialize (dataset, records) pairs, remembering each dataset's slice.
+
+        Sets dataset_spans to (dataset, start, end) for every dataset that kept
+        at least one record after validation.
+        """
+        current = [None]
+
+        def stream():
+            for dataset, records in dataset_records:
+                current[0] = dataset
+                yield from records
+
+        all_records = self.record_buffer(())
+        spans = []
+        # iter_valid() is lazy, so current[0] is the dataset of each yielded record
+        for record in (self.validator.iter_valid(stream()) if self.validator else stream()):
+            if not spans or spans[-1][0] != current[0]:
+                spans.append([current[0], len(all_records), len(all_records)])
+            all_records.append(record)
+            spans[-1][2] += 1
+        self.dataset_spans = [tuple(span) for span in spans]
+        return all_records
+
+    def dataset_records(self) -> Optional[Iterator[Tuple[str, Iterable[Dict]]]]:
+        """(dataset, records) for each dataset collected this run, or None if datasets weren't tracked"""
+        if not self._collected or self.dataset_spans is None:
+            return None
+        return ((dataset, self.collected_data[start:end]) for dataset, start, end in self.dataset_spans)
+
+    def collect(self) -> List[Dict]:
+        """Main collection method: materialize iter_records() into collected_data"""
+        self.collected_data = self.record_buffer(self.iter_validated())
+        self._collected = True
+        logger.info(f"Total records collected: {len(self.collected_data):,}")
+        return self.collected_data
+
+    def records(self) -> Iterable[Dict]:
+        """Collected records if collect() has run, otherwise a fresh record stream"""
+        return self.collected_data if self._collected else self.iter_validated()
+
+    # ------------------------------------------------------------------
+    # Shared fast paths
+    # ------------------------------------------------------------------
+
+    def cached(self, key, loader: Callable):
+        """
+        Return a memoized value for key, calling loader() on a miss.
+
+        None results are not cached so failed lookups are retried.
+        """
+        with self._cache_lock:
+            if key in self._cache:
+                return self._cache[key]
+
+        value = loader()
+        if value is not None:
+            with self._cache_lock:
+                self._cache[key] = value
+        return value
+
+    def clear_cache(self):
+        """Forget memoized values so they are looked up again."""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def fetch_url(self, url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """Download one URL (or read an archive:// URL) and return its text, or None on failure."""
+        if url.startswith("archive://"):
+            try:
+                return self.archive.load_url(url)
+            except (OSError, KeyError, ValueError) as e:
+                logger.error(f"Error reading {url}: {e}")
+                return None
+
+        try:
+            return self.downloader.fetch_text(url, deadline=deadline)
+        except DeadlineExceeded:
+            # Counted and reported once by fetch_parallel()
+            logger.debug("Download deadline reached: %s", url, extra=RATE_LIMITED)
+        except DownloadError as e:
+            logger.warning("Failed to download: %s (%s)", url, e, extra=RATE_LIMITED)
+        except requests.exceptions.RequestException as e:
+            logger.error("Error downloading %s: %s", url, e)
+        return None
+
+    def fetch_parallel(self, targets: List[Tuple[str, str]], desc: str = "Downloading files",
+                       on_result: Optional[Callable[[str, str], None]] = None) -> Dict[str, str]:
+        """
+        Download (key, url) targets with up to download_workers in flight.
+
+        Args:
+            targets: (key, url) pairs
+            desc: Progress bar label
+            on_result: Called as on_result(key, text) for each successful download,
+                in target order (e.g. to checkpoint it)
+
+        Returns:
+            Dictionary of key -> text, in target order (failed downloads omitted)
+        """
+        results = {}
+        deadline = self.stage_deadline("download")
+
+        with tqdm(total=len(targets), desc=desc) as pbar, \
+                ThreadPoolExecutor(max_workers=self.download_workers) as pool:
+            futures = [(key, pool.submit(self._fetch_and_archive, key, url, deadline)) for key, url in targets]
+
+            # Collect in target order so output doesn't depend on download timing
+            for key, future in futures:
+                text_data = future.result()
+                if text_data is not None:
+                    results[key] = text_data
+                    if on_result:
+                        on_result(key, text_data)
+                    pbar.set_postfix({"Current": key})
+                pbar.update(1)
+
+        if len(results) < len(targets):
+            self.incomplete.append(f"{len(targets) - len(results)} of {len(targets)} download(s) failed or skipped")
+        if deadline is not None and deadline.expired and len(results) < len(targets):
+            logger.warning(f"Download deadline reached: {len(targets) - len(results)} of {len(targets)} "
+                           f"file(s) not downloaded")
+        hedge = self.downloader.hedge
+        if hedge is not None and hedge.hedged:
+            logger.info(f"Hedging: {hedge.summary()}")
+
+        return results
+
+    def _fetch_and_archive(self, key: str, url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """fetch_url(), archiving fresh downloads in the worker thread if an archive is set"""
+        if deadline is not None and deadline.expired:
+            return None
+        start = time.perf_counter()
+        text_data = self.fetch_url(url, deadline=deadline)
+        if text_data is not None:
+            self.metrics.add_dataset(key, download_seconds=time.perf_counter() - start, bytes=len(text_data))
+        if text_data is not None and self.archive is not None and not url.startswith("archive://"):
+            try:
+                self.archive.store(key, text_data)
+            except OSError as e:
+                logger.warning(f"Could not archive {key}: {e}")
+        return text_data
+
+    # ------------------------------------------------------------------
+    # Sinks
+    # ------------------------------------------------------------------
+
+    def _output_path(self, filename: Optional[str], extension: str) -> Path:
+        if not filename:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"{self.file_prefix}_{timestamp}.{extension}"
+        return self.output_dir / filename
+
+    def partial_reasons(self) -> List[str]:
+        """Why this run's records may not cover every dataset (empty for a complete run)."""
+        reasons = []
+        if self.selector is not None and not self.selector.is_noop:
+            reasons.append("dataset selection (--include/--exclude/--shard)")
+        if self.refresh is not None:
+            reasons.append("refresh (only changed datasets)")
+        return reasons + self.incomplete
+
+    def save_to_csv(self, filename: Optional[str] = None) -> str:
+        """
+        Save records to a CSV file, streaming if they haven't been collected.
+
+        A ``<name>.manifest.json`` written next to it records whether the run
+        covered every dataset, so readers such as the lookup service can tell
+        a full snapshot from a partial one.
+        """
+        records = iter(self.records())
+        first = next(records, None)
+        if first is None:
+            logger.warning("No data to save")
+            return ""
+
+        filepath = self._output_path(filename, "csv")
+        # Write under a temporary name and rename, so readers (e.g. the lookup service) never see a partial file
+        partial = filepath.with_name(filepath.name + ".part")
+
+        with self.stage("csv"):
+            with open(partial, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=first.keys())
+                writer.writeheader()
+                writer.writerow(first)
+                writer.writerows(records)
+            # The run is over once the records are written; publish the manifest before the CSV
+            reasons = self.partial_reasons()
+            manifest = {"file": filepath.name, "complete": not reasons, "reasons": reasons,
+                        "datasets": sorted(self.metrics.datasets), "written": datetime.now().isoformat()}
+            manifest_path = filepath.with_suffix(".manifest.json")
+            manifest_partial = manifest_path.with_name(manifest_path.name + ".part")
+            manifest_partial.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+            os.replace(manifest_partial, manifest_path)
+            os.replace(partial, filepath)
+
+        if reasons:
+            logger.info(f"Output covers only part of the datasets: {'; '.join(reasons)}")
+
+        logger.info(f"Data saved to: {filepath}")
+        return str(filepath)
+
+    def save_to_parquet(self, filename: Optional[str] = None, batch_size: int = 50000) -> str:
+        """Save records to a Parquet file in row groups of batch_size (requires pyarrow)"""
+        if pa is None:
+            raise ImportError("pyarrow is required for Parquet output. Run: pip install pyarrow")
+
+        records = iter(self.records())
+        first = next(records, None)
+        if first is None:
+            logger.warning("No data to save")
+            return ""
+
+        filepath = self._output_path(filename, "parquet")
+        fieldnames = list(first.keys())
+        schema = pa.schema([(name, pa.string()) for name in fieldnames])
+
+        with self.stage("csv"), pq.ParquetWriter(str(filepath), schema) as writer:
+            stream = chain([first], records)
+            while True:
+                batch = list(islice(stream, batch_size))
+                if not batch:
+                    break
+                columns = {name: [None if r.get(name) is None else str(r.get(name)) for r in batch]
+                           for name in fieldnames}
+                writer.write_table(pa.table(columns, schema=schema))
+
+        logger.info(f"Data saved to: {filepath}")
+        return str(filepath)
+
+    def upload_to_api(self, dry_run: bool = False) -> bool:
+        """
+        Upload records to Visual Knowledge API in batches.
+
+        Args:
+            dry_run: If True, don't actually upload data
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if self._collected and not self.collected_data:
+            logger.warning("No data to upload")
+            return False
+
+        # Import the uploader
+        from src.utils.upload_api import VKBulkUploader
+
+        logger.info("="*60)
+        logger.info("Starting API Upload")
+        logger.info("="*60)
+
+        uploader = VKBulkUploader(dry_run=dry_run, **self.uploader_options())
+        with self.stage("upload"):
+            if self._collected and self.checkpoint and self.dataset_spans is not None:
+                result = self._upload_checkpointed(uploader)
+            elif self._collected:
+                result = uploader.upload_data(self.collected_data)
+            else:
+                result = uploader.upload_stream(self.iter_validated())
+
+        self.metrics.add_uploaded(result.get("uploaded", 0))
+        if result["success"]:
+            logger.info(f"✅ Upload successful: {result['uploaded']} records uploaded")
+        else:
+            logger.error("❌ Upload failed")
+
+        return result["success"]
+
+    def upload_to_targets(self, targets, dry_run: bool = False, gate=None) -> bool:
+        """
+        Upload collected records to several BBB targets in parallel.
+
+        Records are parsed once and projected per target (BBB ID, Agency ID,
+        board mappings, filters). Per-dataset upload checkpoints only apply
+        to upload_to_api().
+
+        Args:
+            targets: BBBTarget list
+            dry_run: If True, don't actually upload data
+            gate: Optional semaphore of global upload slots; each target upload
+                takes its own slot, so a fan-out never exceeds the run's limit
+
+        Returns:
+            True if every target uploaded successfully
+        """
+        from src.utils.bbb_targets import upload_to_targets
+
+        if not self._collected:
+            self.collect()
+        if not self.collected_data:
+            logger.warning("No data to upload")
+            return False
+
+        logger.info("="*60)
+        logger.info(f"Starting API Upload to {len(targets)} BBB target(s)")
+        logger.info("="*60)
+
+        with self.stage("upload"):
+            results = upload_to_targets(self.collected_data, targets, dry_run=dry_run,
+                                        uploader_options=self.uploader_options(), gate=gate)
+        self.metrics.add_uploaded(sum(result.get("uploaded", 0) for result in results.values()))
+        return all(result["success"] for result in results.values())
+
+    def _upload_checkpointed(self, uploader) -> Dict:
+        """Upload collected data dataset by dataset, skipping and recording uploaded datasets"""
+        from src.utils.checkpoint import UPLOADED
+
+        total = uploaded = skipped = 0
+        failed = []
+        for dataset, start, end in self.dataset_spans:
+            total += end - start
+            if self.checkpoint.reached(dataset, UPLOADED):
+                skipped += 1
+                continue
+
+            with self.metrics.timed(dataset, "upload_seconds"):
+                result = uploader.upload_data(self.collected_data[start:end])
+            self.metrics.add_dataset(dataset, uploaded=result.get("uploaded", 0))
+            uploaded += result.get("uploaded", 0)
+            if not result["success"] or result.get("failed_batches"):
+                # Partially uploaded datasets are sent again in full on resume
+                failed.append(dataset)
+            elif not uploader.dry_run:
+                self.checkpoint.mark(dataset, UPLOADED, uploaded=result["uploaded"])
+
+        if skipped:
+            logger.info(f"Skipped {skipped} dataset(s) already uploaded in run {self.checkpoint.run_id}")
+        if failed:
+            logger.error(f"Upload failed for {len(failed)} dataset(s): {', '.join(failed)} "
+                         f"(retry with --resume {self.checkpoint.run_id})")
+
+        return {"success": not failed, "total": total, "uploaded": uploaded}
@@ -5,12 +5,13 @@ Collects license data from VA DPOR for BBB 0241 (DC region)
 """
 
 import re
+import os
+import time
 import logging
-import requests
-from datetime import datetime
-from pathlib import Path
-from typing import List, Dict, Optional
-from tqdm import tqdm
+from functools import lru_cache
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterator, Optional, Tuple
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
@@ -19,31 +20,203 @@ from sqlalchemy import text
 
 # Import database connection module
 from src.utils import db_connect
+from src.utils.profiling import StageProfiler
+from src.utils.dataset_selection import DatasetSelector, DatasetSizeHistory
+from src.utils.checkpoint import RunCheckpoint, DOWNLOADED, PROCESSED
+from src.utils.record_io import read_records, read_text, write_records, write_text
+from src.utils.raw_archive import RawArchive
+from src.utils.zip_county import ZipCountyTable
+from src.utils.refresh_schedule import RefreshScheduler
+from src.utils.deadlines import RunBudget
+from src.collectors.base import BaseCollector
+from src.collectors.registry import register_collector, ResourceLimits
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Source TSV columns copied into each record, in the order parse_tsv_rows() emits them
+# (after Category and License Number, which are built separately)
+_TSV_FIELD_COLUMNS = ("Name", "MAILING ADDRESS", "CITY", "ZIP CODE", "PHONE",
+                      "FIRST NAME", "LAST NAME", "EXPIRES", "STATUS")
+
+
+def format_dataset_key(dataset_key: str) -> str:
+    """Format a dataset key like the old scraper (e.g. "0225crnt" -> "0225 CRNT")"""
+    return re.sub(r'(\d+)([a-zA-Z]+)', r'\1 \2', dataset_key).upper()
+
+
+def parse_tsv_rows(tsv_headers: List[str], tsv_data_rows: List[str],
+                   problems: Optional[Dict[str, int]] = None) -> List[Tuple]:
+    """
+    Parse TSV data rows into compact per-record tuples.
+
+    Only the fields that vary per row are returned, in the order
+    (Business Name, Street, City, Zip, Category, License Number, Phone Number,
+    Owner First Name, Owner Last Name, Expiration Date, License Status).
+    build_records() adds the per-dataset constant fields. Keeping this a plain
+    function of its inputs lets process pool workers run it without a
+    collector or database connection.
+
+    Args:
+        tsv_headers: Header row split on tabs
+        tsv_data_rows: Data rows (unsplit lines)
+        problems: If given, counts of rows with fewer fields than the header
+            ("short rows") and without a license number ("rows without a
+            license number") are added to it, rather than logging each row
+
+    Returns:
+        List of field tuples, one per row
+    """
+    def header_index(header_name: str) -> int:
+        return tsv_headers.index(header_name) if header_name in tsv_headers else -1
+
+    # Build license number from board, occupation, and certificate
+    board_idx = header_index("BOARD")
+    occupation_idx = header_index("OCCUPATION")
+    certificate_idx = header_index("CERTIFICATE #")
+    specialty_idx = header_index("LICENSE SPECIALTY")
+    composite_license = board_idx >= 0 and occupation_idx >= 0 and certificate_idx >= 0
+    (name_idx, street_idx, city_idx, zip_idx, phone_idx,
+     first_idx, last_idx, expires_idx, status_idx) = [header_index(h) for h in _TSV_FIELD_COLUMNS]
+
+    width = len(tsv_headers)
+    short = unlicensed = 0
+    rows = []
+    for row in tsv_data_rows:
+        fields = row.split('\t')
+        n = len(fields)
+        if n < width:
+            short += 1
+
+        if composite_license:
+            license_number = (
+                (fields[board_idx] if board_idx < n else "")
+                + (fields[occupation_idx] if occupation_idx < n else "")
+                + (fields[certificate_idx] if certificate_idx < n else "")
+            )
+        else:
+            # Fallback to just certificate number
+            license_number = fields[certificate_idx] if 0 <= certificate_idx < n else ""
+        if not license_number:
+            unlicensed += 1
+
+        rows.append((
+            fields[name_idx].strip() if 0 <= name_idx < n else "",
+            fields[street_idx].strip() if 0 <= street_idx < n else "",
+            fields[city_idx].strip() if 0 <= city_idx < n else "",
+            fields[zip_idx].strip() if 0 <= zip_idx < n else "",
+            fields[specialty_idx] if 0 <= specialty_idx < n else "",
+            license_number,
+            fields[phone_idx].strip() if 0 <= phone_idx < n else "",
+            fields[first_idx].strip() if 0 <= first_idx < n else "",
+            fields[last_idx].strip() if 0 <= last_idx < n else "",
+            fields[expires_idx].strip() if 0 <= expires_idx < n else "",
+            fields[status_idx].strip() if 0 <= status_idx < n else "Active",
+        ))
+
+    if problems is not None:
+        problems["short rows"] = problems.get("short rows", 0) + short
+        problems["rows without a license number"] = problems.get("rows without a license number", 0) + unlicensed
+    return rows
+
+
+def build_records(rows: List[Tuple], header_mapping: Dict, bbb_id: str, agency_id: str) -> List[Dict]:
+    """Expand parse_tsv_rows() tuples into standardized record dicts"""
+    agency_name = header_mapping['Agency Name']
+    agency_url = header_mapping['Agency URL']
+    return [
+        {
+            "Agency Name": agency_name,
+            "BBB ID": bbb_id,
+            "Agency ID": agency_id,
+            "Agency URL": agency_url,
+            "TOB ID": "",
+            "State Established": "VA",
+            "Business Name": r[0],
+            "Street": r[1],
+            "City": r[2],
+            "Zip": r[3],
+            "Date Established": "",
+            "Category": r[4],
+            "License Number": r[5],
+            "Phone Number": r[6],
+            "Owner First Name": r[7],
+            "Owner Last Name": r[8],
+            "Expiration Date": r[9],
+            "License Status": r[10],
+            "County": ""
+        }
+        for r in rows
+    ]
+
+
+@lru_cache(maxsize=1)
+def chromedriver_path() -> str:
+    """Install (or find) the matching chromedriver once per process"""
+    os.environ['WDM_LOG'] = '0'  # Suppress webdriver-manager logs
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
 
-class VaDPORCollector:
+
+def _parse_chunk(task: Tuple) -> Tuple[List[Tuple], Dict[str, int]]:
+    """Process pool entry point: parse one (headers, newline-joined rows) chunk into (rows, problem counts)"""
+    tsv_headers, rows_text = task
+    problems = {}
+    return parse_tsv_rows(tsv_headers, rows_text.split('\n'), problems), problems
+
+
+@register_collector("dpor", display_name="VA DPOR",
+                    limits=ResourceLimits(network_slots=4, cpu_workers=1, db_connections=2))
+class VaDPORCollector(BaseCollector):
     """Collector for Virginia DPOR license data"""
 
-    def __init__(self, headless: bool = True, output_dir: str = "data"):
+    file_prefix = "dpor_data"
+
+    def __init__(self, headless: bool = True, output_dir: str = "data",
+                 profiler: Optional[StageProfiler] = None, workers: int = 1,
+                 chunk_rows: int = 50000, download_workers: int = 1,
+                 db_pool_size: Optional[int] = None, validate: bool = False,
+                 selector: Optional[DatasetSelector] = None,
+                 checkpoint: Optional[RunCheckpoint] = None,
+                 archive: Optional[RawArchive] = None, replay: Optional[str] = None,
+                 zip_table: Optional[ZipCountyTable] = None,
+                 refresh: Optional[RefreshScheduler] = None,
+                 memory_budget: Optional[int] = None, budget: Optional[RunBudget] = None,
+                 hedge: bool = True, hedge_uploads: bool = False, normalize_uploads: bool = False):
         """
         Initialize the DPOR collector.
 
         Args:
             headless: Run Chrome in headless mode
             output_dir: Directory to save collected data
+            profiler: Optional stage profiler (profiling is off by default)
+            workers: Number of processes used to parse datasets (1 = serial)
+            chunk_rows: Rows per work item when splitting large datasets
+            download_workers: Number of concurrent TSV downloads
+            db_pool_size: Cap on database connections (None = SQLAlchemy default)
+            validate: Divert records failing validation rules to a rejects file
+            selector: Optional include/exclude/shard filter over dataset codes
+            checkpoint: Optional run checkpoint; completed datasets are skipped on resume
+            archive: Optional raw archive that keeps every downloaded TSV
+            replay: Archive snapshot date (or "latest") to process instead of downloading
+            zip_table: Optional ZIP county table used to fill the County field
+            refresh: Optional refresh scheduler; only datasets likely to have changed
+                are downloaded, and unchanged downloads are not processed
+            memory_budget: Bytes of collected records kept in RAM; the rest spill to disk
+            budget: Optional run time budget; downloads and uploads stop at their stage's deadline
+            hedge: Re-request TSV downloads that run past the p95 download time
+            hedge_uploads: Also re-send slow upload batches (only if the API ignores duplicates)
+            normalize_uploads: Clean text fields and format dates of each upload batch
         """
+        super().__init__(output_dir=output_dir, profiler=profiler, workers=workers,
+                         download_workers=download_workers, db_pool_size=db_pool_size,
+                         headless=headless, validate=validate, selector=selector,
+                         checkpoint=checkpoint, archive=archive, replay=replay,
+                         zip_table=zip_table, refresh=refresh, memory_budget=memory_budget,
+                         budget=budget, hedge=hedge, hedge_uploads=hedge_uploads,
+                         normalize_uploads=normalize_uploads)
         self.base_url = "https://www.dpor.virginia.gov/RegulantLists#:~:text=Registered%20Athlete%20Agents-"
-        self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(exist_ok=True, parents=True)
-        self.headless = headless
-        self.collected_data = []
+        self.chunk_rows = max(1, chunk_rows)
+        self.size_history = DatasetSizeHistory(self.output_dir / "dataset_sizes.json")
 
         # Agency information for DC region
         self.bbb_id = "0241"
@@ -51,7 +224,9 @@ class VaDPORCollector:
         self.agency_name = "VA - DPOR"
 
         # Setup database connection
-        self.engine = db_connect.PGconnection()
+        self.engine = db_connect.PGconnection(pool_size=db_pool_size)
+        # Browser kept open between runs when keep_warm is set
+        self._driver: Optional[webdriver.Chrome] = None
 
     def setup_driver(self) -> webdriver.Chrome:
         """Setup Chrome driver with options"""
@@ -63,19 +238,42 @@ class VaDPORCollector:
         chrome_options.add_argument("--disable-gpu")
         chrome_options.add_argument("--window-size=1920,1080")
 
-        # Use webdriver manager to handle driver installation (suppress logging)
-        import os
-        os.environ['WDM_LOG'] = '0'  # Suppress webdriver-manager logs
-        from webdriver_manager.chrome import ChromeDriverManager
-        service = Service(ChromeDriverManager().install())
+        # Use webdriver manager to handle driver installation
+        service = Service(chromedriver_path())
 
         return webdriver.Chrome(service=service, options=chrome_options)
 
+    def _warm_driver(self) -> webdriver.Chrome:
+        """The kept browser, replaced if it has died since the last run"""
+        if self._driver is not None:
+            try:
+                self._driver.current_url
+                return self._driver
+            except Exception:
+                logger.info("Kept browser is gone, starting a new one")
+                self._quit_driver()
+        self._driver = self.setup_driver()
+        return self._driver
+
+    def _quit_driver(self):
+        if self._driver is not None:
+            try:
+                self._driver.quit()
+            except Exception as e:
+                logger.debug(f"Error closing browser: {e}")
+            self._driver = None
+
+    def close(self):
+        """Close the kept browser and database connections"""
+        self._quit_driver()
+        self.engine.dispose()
+        super().close()
+
     def get_data_links(self) -> List[str]:
         """Get all TSV data file links from DPOR website"""
         logger.info("Fetching data links from DPOR website...")
 
-        driver = self.setup_driver()
+        driver = self._warm_driver() if self.keep_warm else self.setup_driver()
         links = []
 
         try:
@@ -93,48 +291,118 @@ class VaDPORCollector:
 
         except Exception as e:
             logger.error(f"Error fetching links: {e}")
+            if self.keep_warm:
+                self._quit_driver()
         finally:
-            driver.quit()
+            if not self.keep_warm:
+                driver.quit()
 
         return links
 
+    def dataset_targets(self, links: List[str]) -> List[Tuple[str, str]]:
+        """Map data links to (dataset_code, url) pairs, filtered by the selector"""
+        pattern = re.compile(r'/(\w+?)__crnt.txt')
+
+        targets = []
+        for link in links:
+            match = pattern.search(link)
+            if match:
+                targets.append((match.group(1), link))
+            else:
+                logger.warning(f"No match found for link: {link}")
+
+        return self.select_targets(targets)
+
+    def select_targets(self, targets: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Apply the dataset selector (if any) to (dataset_code, url) pairs"""
+        if self.selector and not self.selector.is_noop:
+            selected = set(self.selector.select(code for code, _ in targets))
+            targets = [(code, link) for code, link in targets if code in selected]
+        return targets
+
+    def discover_targets(self) -> List[Tuple[str, str]]:
+        """Dataset targets for this run: archived files when replaying, else the DPOR links"""
+        if self.replay:
+            return self.select_targets(self.archive.replay_targets(self.replay))
+
+        with self.stage("links"):
+            links = self.get_data_links()
+        if not links:
+            logger.error("No data links found")
+            return []
+        targets = self.dataset_targets(links)
+        if self.refresh is not None:
+            targets = self.refresh.plan(targets)
+        return targets
+
+    def dataset_sizes(self) -> DatasetSizeHistory:
+        """
+        Size history to record downloads in.
+
+        Unsharded runs with --dataset-sizes refresh the shared file. Sharded runs
+        only read it (every node must see the same sizes), so they and runs
+        without it record into the collector's own history.
+        """
+        path = getattr(self.selector, "sizes_path", None)
+        sharded = self.selector is not None and self.selector.shard and self.selector.shard[1] > 1
+        return DatasetSizeHistory(path) if path and not sharded else self.size_history
+
     def fetch_tsv_data(self, links: List[str]) -> Dict[str, str]:
-        """Fetch TSV data from all links"""
-        logger.info("Downloading TSV data files...")
-        csv_data_dict = {}
+        """Fetch TSV data from all links, up to download_workers at a time"""
+        return self.fetch_targets(self.dataset_targets(links))
 
-        pattern = re.compile(r'/(\w+?)__crnt.txt')
+    def fetch_targets(self, targets: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Fetch TSV data for (dataset_code, url) targets, up to download_workers at a time"""
+        logger.info("Downloading TSV data files...")
 
-        with tqdm(total=len(links), desc="Downloading files") as pbar:
-            for link in links:
-                match = pattern.search(link)
-                if match:
-                    extracted_part = match.group(1)
-
-                    try:
-                        response = requests.get(link, timeout=30)
-                        if response.status_code == 200:
-                            csv_data_dict[extracted_part] = response.text
-                            pbar.set_postfix({"Current": extracted_part})
-                        else:
-                            logger.warning(f"Failed to download: {link} (Status: {response.status_code})")
-                    except requests.exceptions.RequestException as e:
-                        logger.error(f"Error downloading {link}: {e}")
-                else:
-                    logger.warning(f"No match found for link: {link}")
+        csv_data_dict = self.fetch_parallel(targets)
 
-                pbar.update(1)
+        # Sizes feed size-balanced sharding on later runs
+        if not self.replay:
+            self.dataset_sizes().update({code: len(text_data) for code, text_data in csv_data_dict.items()})
+            if self.refresh is not None:
+                csv_data_dict = self.refresh.filter_unchanged(csv_data_dict)
 
         return csv_data_dict
 
     def get_header_mapping(self, dataset_key: str) -> Optional[Dict]:
         """
         Get header mapping for a dataset from the database.
-        Uses the same query as the old DPOR scraper.
+        Uses the same query as the old DPOR scraper. Mappings found in the
+        database are cached for the life of the collector.
         """
         # Format the key by adding a space and capitalizing if it contains alpha characters
-        key = re.sub(r'(\d+)([a-zA-Z]+)', r'\1 \2', dataset_key).upper()
+        key = format_dataset_key(dataset_key)
 
+        header_mapping = self.cached(("header_mapping", key), lambda: self._query_header_mapping(key))
+        if header_mapping:
+            return header_mapping
+
+        # Fallback to basic mapping if database lookup fails
+        logger.debug(f"Using fallback mapping for dataset {dataset_key}")
+        return {
+            'Agency Name': self.agency_name,
+            'Agency ID': self.agency_id,
+            'Agency URL': 'https://www.dpor.virginia.gov/',
+            'TOB ID': '',
+            'State Established': 'VA',
+            'Business Name': 'Name',
+            'Street': 'MAILING ADDRESS',
+            'City': 'CITY',
+            'Zip': 'ZIP CODE',
+            'Date Established': 'NA',
+            'Category': 'LICENSE SPECIALTY',
+            'License Number': 'CERTIFICATE #',
+            'Phone Number': 'NA',
+            'Owner First Name': 'NA',
+            'Owner Last Name': 'NA',
+            'Expiration Date': 'EXPIRES',
+            'License Status': 'STATUS',
+            'County': 'NA'
+        }
+
+    def _query_header_mapping(self, key: str) -> Optional[Dict]:
+        """Look up a formatted dataset key in header_mappings, or None if missing"""
         # Use ID from URL to get header mappings from DB (same query as old scraper)
         query = f"""
         SELECT la.agency_id AS "Agency ID",
@@ -178,114 +446,118 @@ class VaDPORCollector:
         except Exception as e:
             logger.error(f"Database query failed for {key}: {e}")
 
-        # Fallback to basic mapping if database lookup fails
-        logger.debug(f"Using fallback mapping for dataset {dataset_key}")
-        return {
-            'Agency Name': self.agency_name,
-            'Agency ID': self.agency_id,
-            'Agency URL': 'https://www.dpor.virginia.gov/',
-            'TOB ID': '',
-            'State Established': 'VA',
-            'Business Name': 'Name',
-            'Street': 'MAILING ADDRESS',
-            'City': 'CITY',
-            'Zip': 'ZIP CODE',
-            'Date Established': 'NA',
-            'Category': 'LICENSE SPECIALTY',
-            'License Number': 'CERTIFICATE #',
-            'Phone Number': 'NA',
-            'Owner First Name': 'NA',
-            'Owner Last Name': 'NA',
-            'Expiration Date': 'EXPIRES',
-            'License Status': 'STATUS',
-            'County': 'NA'
-        }
+        return None
 
     def process_tsv_data(self, dataset_key: str, tsv_data: str) -> List[Dict]:
         """Process TSV data into structured records"""
-        records = []
-
         # Format the key
-        key = re.sub(r'(\d+)([a-zA-Z]+)', r'\1 \2', dataset_key).upper()
+        key = format_dataset_key(dataset_key)
 
         # Get header mapping
         header_mapping = self.get_header_mapping(key)
         if not header_mapping:
             logger.debug(f"No header mapping found for {key}")
-            return records
+            return []
 
         # Parse TSV data
         tsv_lines = tsv_data.splitlines()
         if not tsv_lines:
-            return records
+            return []
 
         tsv_headers = tsv_lines[0].split('\t')
-        tsv_data_rows = tsv_lines[1:]
-
-        # Process silently without logging each dataset
-        for row in tsv_data_rows:
-            fields = row.split('\t')
+        problems = {}
+        rows = parse_tsv_rows(tsv_headers, tsv_lines[1:], problems)
+        self.row_problems.log_dataset(logger, dataset_key, problems, level=logging.DEBUG)
+        return build_records(rows, header_mapping, self.bbb_id, self.agency_id)
+
+    def iter_dataset_records(self, csv_data_dict: Dict[str, str]) -> Iterator[Tuple[str, List[Dict]]]:
+        """Yield (dataset_key, records) for each downloaded dataset, enriched, in download order"""
+        start = time.perf_counter()
+        for dataset_key, records in self._iter_parsed_datasets(csv_data_dict):
+            records = self.enrich_records(records)
+            # Time spent producing this dataset, not the consumer's time between datasets
+            self.metrics.add_dataset(dataset_key, parse_seconds=time.perf_counter() - start,
+                                     records=len(records))
+            yield dataset_key, records
+            start = time.perf_counter()
+        self.row_problems.log_summary(logger)
+
+    def _iter_parsed_datasets(self, csv_data_dict: Dict[str, str]) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        Yield (dataset_key, parsed records) for each downloaded dataset, in download order.
 
-            try:
-                # Build license number from board, occupation, and certificate
-                board_idx = tsv_headers.index("BOARD") if "BOARD" in tsv_headers else -1
-                occupation_idx = tsv_headers.index("OCCUPATION") if "OCCUPATION" in tsv_headers else -1
-                certificate_idx = tsv_headers.index("CERTIFICATE #") if "CERTIFICATE #" in tsv_headers else -1
-
-                if board_idx >= 0 and occupation_idx >= 0 and certificate_idx >= 0:
-                    board = fields[board_idx] if board_idx < len(fields) else ""
-                    occupation = fields[occupation_idx] if occupation_idx < len(fields) else ""
-                    certificate = fields[certificate_idx] if certificate_idx < len(fields) else ""
-                    license_number = f"{board}{occupation}{certificate}"
-                else:
-                    # Fallback to just certificate number
-                    license_number = fields[certificate_idx] if certificate_idx >= 0 and certificate_idx < len(fields) else ""
-
-                # Get license specialty if available
-                license_specialty = ""
-                if "LICENSE SPECIALTY" in tsv_headers:
-                    specialty_idx = tsv_headers.index("LICENSE SPECIALTY")
-                    if specialty_idx < len(fields):
-                        license_specialty = fields[specialty_idx]
-
-                # Get other fields safely
-                def safe_get_field(header_name: str, default: str = "") -> str:
-                    if header_name in tsv_headers:
-                        idx = tsv_headers.index(header_name)
-                        if idx < len(fields):
-                            return fields[idx].strip()
-                    return default
-
-                # Build record
-                record = {
-                    "Agency Name": header_mapping['Agency Name'],
-                    "BBB ID": self.bbb_id,
-                    "Agency ID": self.agency_id,
-                    "Agency URL": header_mapping['Agency URL'],
-                    "TOB ID": "",
-                    "State Established": "VA",
-                    "Business Name": safe_get_field("Name", ""),
-                    "Street": safe_get_field("MAILING ADDRESS", ""),
-                    "City": safe_get_field("CITY", ""),
-                    "Zip": safe_get_field("ZIP CODE", ""),
-                    "Date Established": "",
-                    "Category": license_specialty,
-                    "License Number": license_number,
-                    "Phone Number": safe_get_field("PHONE", ""),
-                    "Owner First Name": safe_get_field("FIRST NAME", ""),
-                    "Owner Last Name": safe_get_field("LAST NAME", ""),
-                    "Expiration Date": safe_get_field("EXPIRES", ""),
-                    "License Status": safe_get_field("STATUS", "Active"),
-                    "County": ""
-                }
-
-                records.append(record)
+        With workers > 1, datasets (and chunks of large datasets) are parsed
+        in a process pool. Header mappings are resolved up front in this
+        process, workers return compact row tuples, and results are merged
+        in dataset/chunk order so output matches the serial path exactly.
+        """
+        if self.workers <= 1:
+            for dataset_key, tsv_data in csv_data_dict.items():
+                yield dataset_key, self.process_tsv_data(dataset_key, tsv_data)
+            return
+
+        # Resolve header mappings and split work before dispatching
+        tasks = []
+        task_owners = []
+        for dataset_key, tsv_data in csv_data_dict.items():
+            key = format_dataset_key(dataset_key)
+            header_mapping = self.get_header_mapping(key)
+            if not header_mapping:
+                logger.debug(f"No header mapping found for {key}")
+                continue
 
-            except Exception as e:
-                logger.debug(f"Error processing row in {key}: {e}")
+            tsv_lines = tsv_data.splitlines()
+            if not tsv_lines:
                 continue
 
-        return records
+            tsv_headers = tsv_lines[0].split('\t')
+            for start in range(1, len(tsv_lines), self.chunk_rows):
+                rows_text = '\n'.join(tsv_lines[start:start + self.chunk_rows])
+                tasks.append((tsv_headers, rows_text))
+                task_owners.append((dataset_key, header_mapping))
+
+        logger.info(f"Parsing {len(tasks)} chunks with {self.workers} worker processes")
+
+        current_key = None
+        current_records = []
+        current_problems = {}
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # map() yields in submission order, which keeps the merge deterministic
+            for (dataset_key, header_mapping), (rows, problems) in zip(task_owners, pool.map(_parse_chunk, tasks)):
+                if dataset_key != current_key:
+                    if current_key is not None:
+                        self.row_problems.log_dataset(logger, current_key, current_problems, level=logging.DEBUG)
+                        yield current_key, current_records
+                    current_key, current_records, current_problems = dataset_key, [], {}
+                current_records.extend(build_records(rows, header_mapping, self.bbb_id, self.agency_id))
+                for kind, n in problems.items():
+                    current_problems[kind] = current_problems.get(kind, 0) + n
+
+        if current_key is not None:
+            self.row_problems.log_dataset(logger, current_key, current_problems, level=logging.DEBUG)
+            yield current_key, current_records
+
+    def process_datasets(self, csv_data_dict: Dict[str, str]) -> List[Dict]:
+        """Process all downloaded datasets into one list of records"""
+        all_records = []
+        for _, records in self.iter_dataset_records(csv_data_dict):
+            all_records.extend(records)
+        return all_records
+
+    def download_datasets(self) -> Dict[str, str]:
+        """Discover data links and download every dataset (or read them from the archive)"""
+        targets = self.discover_targets()
+        if not targets:
+            return {}
+
+        # Fetch TSV data
+        with self.stage("download"):
+            return self.fetch_targets(targets)
+
+    def iter_records(self) -> Iterator[Dict]:
+        """Stream records dataset by dataset without holding all of them"""
+        for _, records in self.iter_dataset_records(self.download_datasets()):
+            yield from records
 
     def collect(self) -> List[Dict]:
         """Main collection method"""
@@ -294,85 +566,103 @@ class VaDPORCollector:
         logger.info(f"BBB ID: {self.bbb_id}, Agency ID: {self.agency_id}")
         logger.info("="*60)
 
-        # Get data links
-        links = self.get_data_links()
-        if not links:
-            logger.error("No data links found")
-            return []
+        if self.checkpoint:
+            return self._collect_checkpointed()
 
-        # Fetch TSV data
-        csv_data_dict = self.fetch_tsv_data(links)
+        csv_data_dict = self.download_datasets()
+        if not csv_data_dict:
+            return []
 
-        # Process each dataset silently
-        all_records = []
+        # Process each dataset silently, validating on the way so only one copy is kept
         logger.info("Processing downloaded data...")
-        for dataset_key, tsv_data in csv_data_dict.items():
-            records = self.process_tsv_data(dataset_key, tsv_data)
-            all_records.extend(records)
+        with self.stage("process"):
+            all_records = self.buffer_datasets(self.iter_dataset_records(csv_data_dict))
 
         self.collected_data = all_records
+        self._collected = True
         logger.info(f"Total records collected: {len(all_records):,}")
 
         return all_records
 
-    def upload_to_api(self, dry_run: bool = False) -> bool:
+    def _collect_checkpointed(self) -> List[Dict]:
         """
-        Upload collected data to Visual Knowledge API.
-
-        Args:
-            dry_run: If True, don't actually upload data
+        collect() with per-dataset progress saved to the run checkpoint.
 
-        Returns:
-            True if successful, False otherwise
+        Downloads are spilled to raw files and processed records to record
+        files as each dataset finishes, so a resumed run skips link discovery
+        and every dataset that already got through a stage.
         """
-        if not self.collected_data:
-            logger.warning("No data to upload")
-            return False
-
-        # Import the uploader
-        from src.utils.upload_api import VKBulkUploader
-
-        logger.info("="*60)
-        logger.info("Starting API Upload")
-        logger.info("="*60)
+        checkpoint = self.checkpoint
+
+        targets = checkpoint.targets
+        if targets is None:
+            targets = self.discover_targets()
+            if not targets:
+                return []
+            checkpoint.set_targets(targets)
+        elif self.selector and not self.selector.is_noop:
+            logger.warning("Dataset selection is ignored on resume; using the run's original datasets")
+
+        refresh = self.refresh if not self.replay else None
+
+        def save_download(code: str, text_data: str):
+            if refresh is not None and not refresh.observe(code, text_data) and refresh.skip_unchanged:
+                # Same content as last time: nothing to parse or upload
+                write_records(checkpoint.records_path(code), [])
+                checkpoint.mark(code, PROCESSED, size=len(text_data), records=0, unchanged=True)
+                return
+            write_text(checkpoint.raw_path(code), text_data)
+            checkpoint.mark(code, DOWNLOADED, size=len(text_data))
+
+        pending = [(code, url) for code, url in targets if not checkpoint.reached(code, DOWNLOADED)]
+        if len(pending) < len(targets):
+            logger.info(f"Skipping {len(targets) - len(pending)} dataset(s) already downloaded")
+        with self.stage("download"):
+            downloaded = self.fetch_parallel(pending, on_result=save_download)
+        if not self.replay:
+            self.dataset_sizes().update({code: len(text_data) for code, text_data in downloaded.items()})
+
+        # Parse datasets that are downloaded but not yet processed
+        to_process = {}
+        for code, _ in targets:
+            if checkpoint.reached(code, DOWNLOADED) and not checkpoint.reached(code, PROCESSED):
+                to_process[code] = downloaded.pop(code, None) or read_text(checkpoint.raw_path(code))
+        del downloaded
+
+        logger.info(f"Processing {len(to_process)} dataset(s)...")
+        with self.stage("process"):
+            for code, records in self.iter_dataset_records(to_process):
+                count = write_records(checkpoint.records_path(code), records)
+                checkpoint.mark(code, PROCESSED, records=count)
+
+        # Reassemble in target order, remembering which slice belongs to which dataset.
+        # Datasets skipped as unchanged have no records and so no span.
+        with (self.stage("validate") if self.validator else nullcontext()):
+            all_records = self.buffer_datasets(
+                (code, read_records(checkpoint.records_path(code)))
+                for code, _ in targets if checkpoint.reached(code, PROCESSED))
 
-        uploader = VKBulkUploader(dry_run=dry_run)
-        result = uploader.upload_data(self.collected_data)
-
-        if result["success"]:
-            logger.info(f"✅ Upload successful: {result['uploaded']} records uploaded")
-        else:
-            logger.error("❌ Upload failed")
-
-        return result["success"]
-
-    def save_to_csv(self, filename: Optional[str] = None) -> str:
-        """Save collected data to CSV file"""
-        if not self.collected_data:
-            logger.warning("No data to save")
-            return ""
-
-        if not filename:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"dpor_data_{timestamp}.csv"
-
-        filepath = self.output_dir / filename
-
-        # Write CSV
-        import csv
-        with open(filepath, 'w', newline='', encoding='utf-8') as f:
-            if self.collected_data:
-                fieldnames = self.collected_data[0].keys()
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(self.collected_data)
+        self.collected_data = all_records
+        self._collected = True
+        logger.info(f"Total records collected: {len(all_records):,} "
+                    f"(run {checkpoint.run_id}: {checkpoint.counts()})")
 
-        logger.info(f"Data saved to: {filepath}")
-        return str(filepath)
+        return all_records
 
 
 if __name__ == "__main__":
     import argparse
+    from src.utils.profiling import add_profiling_arguments, profiler_from_args
+    from src.utils.dataset_selection import add_selection_arguments, selector_from_args
+    from src.utils.checkpoint import add_checkpoint_arguments, run_id_from_args
+    from src.utils.raw_archive import add_archive_arguments, archive_options
+    from src.utils.zip_county import add_enrichment_arguments, zip_table_from_args
+    from src.utils.bbb_targets import add_target_arguments, targets_from_args
+    from src.utils.refresh_schedule import add_refresh_arguments, refresh_scheduler
+    from src.utils.perf_history import add_perf_arguments, record_collector_run
+    from src.utils.deadlines import add_deadline_arguments
+    from src.utils.upload_api import add_upload_arguments
+    from src.utils.log_setup import add_logging_arguments, setup_logging_from_args
 
     parser = argparse.ArgumentParser(description='VA DPOR Data Collector for BBB 0241')
     parser.add_argument('--headless', action='store_true', default=True,
@@ -383,14 +673,63 @@ if __name__ == "__main__":
                         help='Upload data to Visual Knowledge API')
     parser.add_argument('--dry-run', action='store_true',
                         help='Perform dry run (don\'t actually upload)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for parsing datasets (default: 1)')
+    parser.add_argument('--memory-budget', type=int, default=None, metavar='MB',
+                        help='Collected records kept in RAM; the rest spill to disk (default: no limit)')
+    parser.add_argument('--validate', action='store_true',
+                        help='Divert records failing validation rules to a rejects file')
+    add_selection_arguments(parser)
+    add_checkpoint_arguments(parser)
+    add_archive_arguments(parser)
+    add_enrichment_arguments(parser)
+    add_target_arguments(parser)
+    add_refresh_arguments(parser)
+    add_perf_arguments(parser)
+    add_deadline_arguments(parser)
+    add_upload_arguments(parser)
+    add_profiling_arguments(parser)
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable debug logging')
+    add_logging_arguments(parser)
 
     args = parser.parse_args()
+    setup_logging_from_args(args)
 
-    # Run collector
-    collector = VaDPORCollector(headless=args.headless)
-    data = collector.collect()
+    run_id = run_id_from_args(args)
+    checkpoint = None
+    if run_id:
+        checkpoint = RunCheckpoint(run_id, "dpor", runs_dir=args.runs_dir, resume=bool(args.resume))
+        logger.info(f"Checkpointing run {run_id} (resume with --resume {run_id})")
 
-    if data:
+    refresh = refresh_scheduler("dpor", args.refresh and not args.replay, args.refresh_budget,
+                                args.refresh_max_age)
+
+    # Run collector
+    collector = VaDPORCollector(headless=args.headless, profiler=profiler_from_args(args),
+                                workers=args.workers, validate=args.validate,
+                                selector=selector_from_args(args), checkpoint=checkpoint,
+                                zip_table=zip_table_from_args(args), refresh=refresh,
+                                memory_budget=args.memory_budget * 1024 * 1024 if args.memory_budget else None,
+                                budget=RunBudget(args.run_budget * 60) if args.run_budget else None,
+                                hedge=not args.no_hedge, hedge_uploads=args.hedge_uploads,
+                                normalize_uploads=args.normalize_uploads,
+                                **archive_options(args, "dpor"))
+    start = time.perf_counter()
+    try:
+        data = collector.collect()
+    except FileNotFoundError as e:
+        if not args.replay:
+            raise
+        # Empty or missing archive, or a date that was never archived
+        logger.error(f"No archived snapshot to replay: {e}")
+        raise SystemExit(1)
+    success = bool(data)
+
+    if not data and refresh is not None and refresh.pending:
+        logger.info("No datasets changed since they were last checked")
+        success = True
+        refresh.save()
+    elif data:
         # Save to CSV if requested
         if args.save_csv:
             csv_file = collector.save_to_csv()
@@ -398,10 +737,22 @@ if __name__ == "__main__":
 
         # Upload to API if requested
         if args.upload:
-            success = collector.upload_to_api(dry_run=args.dry_run)
+            targets = [t for t in targets_from_args(args) or () if t.applies_to("dpor")]
+            if targets:
+                success = collector.upload_to_targets(targets, dry_run=args.dry_run)
+            else:
+                success = collector.upload_to_api(dry_run=args.dry_run)
             if success:
                 logger.info("✅ Upload completed successfully")
             else:
                 logger.error("❌ Upload failed")
+
+        # A failed upload leaves the datasets unchecked, so the next run retries them
+        if refresh is not None and (not args.upload or success):
+            refresh.save()
     else:
-        logger.error("No data collected")
\ No newline at end of file
+        logger.error("No data collected")
+
+    if args.record_perf:
+        record_collector_run("dpor", collector, time.perf_counter() - start, success, path=args.perf_db,
+                             kind="replay" if args.replay else "collect")
\ No newline at end of file
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Collector Registry
+==================
+Collectors register themselves with @register_collector so the runners can
+discover and run them without hard-coded imports. Collectors shipped in other
+packages are discovered through the ``dc_collectors.collectors`` entry point
+group, e.g. in their pyproject.toml:
+
+    [project.entry-points."dc_collectors.collectors"]
+    dc_business = "dc_business.collector:DCBusinessCollector"
+
+Registered collectors should subclass src.collectors.base.BaseCollector. They
+must accept these keyword arguments, which the orchestrator fills from the
+collector's ResourceLimits:
+
+- ``workers``: CPU worker processes
+- ``download_workers``: concurrent network downloads
+- ``db_pool_size``: database connections
+
+and, only when a memory budget is set, ``memory_budget`` (bytes of collected
+records kept in RAM; see src/utils/record_buffer.py).
+"""
+
+import importlib
+import logging
+import pkgutil
+from importlib import metadata
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP = "dc_collectors.collectors"
+
+
+class ResourceLimits:
+    """Per-collector resource limits used by the orchestrator"""
+
+    def __init__(self, network_slots: int = 1, cpu_workers: int = 1, db_connections: int = 1,
+                 memory_mb: Optional[int] = None):
+        """
+        Args:
+            network_slots: Maximum concurrent downloads
+            cpu_workers: Maximum worker processes for parsing
+            db_connections: Maximum database connections
+            memory_mb: Collected records kept in RAM, in MB (None = no limit)
+        """
+        self.network_slots = max(1, network_slots)
+        self.cpu_workers = max(1, cpu_workers)
+        self.db_connections = max(1, db_connections)
+        self.memory_mb = max(1, memory_mb) if memory_mb else None
+
+    def override(self, network_slots: Optional[int] = None, cpu_workers: Optional[int] = None,
+                 db_connections: Optional[int] = None, memory_mb: Optional[int] = None) -> "ResourceLimits":
+        """Return a copy with any non-None values replaced."""
+        return ResourceLimits(
+            network_slots=network_slots or self.network_slots,
+            cpu_workers=cpu_workers or self.cpu_workers,
+            db_connections=db_connections or self.db_connections,
+            memory_mb=memory_mb or self.memory_mb
+        )
+
+    def __repr__(self):
+        return (f"ResourceLimits(network_slots={self.network_slots}, "
+                f"cpu_workers={self.cpu_workers}, db_connections={self.db_connections}"
+                + (f", memory_mb={self.memory_mb}" if self.memory_mb else "") + ")")
+
+
+class CollectorSpec:
+    """Registration record for a collector class"""
+
+    def __init__(self, name: str, cls: type, display_name: str, limits: ResourceLimits):
+        self.name = name
+        self.cls = cls
+        self.display_name = display_name
+        self.limits = limits
+
+    def create(self, limits: Optional[ResourceLimits] = None, **options):
+        """Instantiate the collector with the given (or default) resource limits."""
+        limits = limits or self.limits
+        if limits.memory_mb:
+            options["memory_budget"] = limits.memory_mb * 1024 * 1024
+        return self.cls(
+            workers=limits.cpu_workers,
+            download_workers=limits.network_slots,
+            db_pool_size=limits.db_connections,
+            **options
+        )
+
+
+_REGISTRY: Dict[str, CollectorSpec] = {}
+
+
+def register_collector(name: str, display_name: Optional[str] = None,
+                       limits: Optional[ResourceLimits] = None):
+    """
+    Class decorator that registers a collector under a short CLI name.
+
+    Args:
+        name: Short name used on the command line (e.g. "dpor")
+        display_name: Human readable name for logs and summaries
+        limits: Default resource limits for this collector
+    """
+    def decorator(cls):
+        if name in _REGISTRY and _REGISTRY[name].cls is not cls:
+            raise ValueError(f"Collector name already registered: {name}")
+        _REGISTRY[name] = CollectorSpec(name, cls, display_name or name, limits or ResourceLimits())
+        return cls
+    return decorator
+
+
+def _entry_points():
+    """Return entry points in ENTRY_POINT_GROUP across Python versions."""
+    eps = metadata.entry_points()
+    if hasattr(eps, 'select'):
+        return eps.select(group=ENTRY_POINT_GROUP)
+    return eps.get(ENTRY_POINT_GROUP, [])
+
+
+def discover_collectors() -> Dict[str, CollectorSpec]:
+    """
+    Import every collector package under src.collectors and every
+    ENTRY_POINT_GROUP entry point so their @register_collector decorators
+    run, and return the registry.
+
+    Entry points that load an undecorated class are registered under the
+    entry point name with default resource limits.
+    """
+    import src.collectors as collectors_pkg
+
+    for module_info in pkgutil.iter_modules(collectors_pkg.__path__):
+        if not module_info.ispkg:
+            continue
+        package_name = f"{collectors_pkg.__name__}.{module_info.name}"
+        try:
+            package = importlib.import_module(package_name)
+            for sub in pkgutil.iter_modules(package.__path__):
+                importlib.import_module(f"{package_name}.{sub.name}")
+        except Exception as e:
+            logger.error(f"Failed to load collector package {package_name}: {e}")
+
+    for entry_point in _entry_points():
+        try:
+            cls = entry_point.load()
+        except Exception as e:
+            logger.error(f"Failed to load collector entry point {entry_point.name}: {e}")
+            continue
+        if not any(spec.cls is cls for spec in _REGISTRY.values()):
+            register_collector(entry_point.name)(cls)
+
+    return dict(_REGISTRY)
+
+
+def get_collector(name: str) -> CollectorSpec:
+    """Return the registered collector spec for a name."""
+    if name not in _REGISTRY:
+        discover_collectors()
+    if name not in _REGISTRY:
+        raise KeyError(f"Unknown collector: {name}")
+    return _REGISTRY[name]
+
+
+def list_collectors() -> List[str]:
+    """Return the names of all discovered collectors."""
+    return sorted(discover_collectors())
@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+License Lookup Service
+======================
+Read-only HTTP API answering "is this license active?" from the latest
+collection output, without touching the production database.
+
+The newest ``<prefix>_YYYYMMDD_HHMMSS.csv`` written by save_to_csv in the
+data directory is loaded into an in-memory snapshot. Only complete runs are
+served: save_to_csv writes a ``<name>.manifest.json`` next to each CSV, and
+output from a partial run (--include/--exclude/--shard, --refresh, or failed
+downloads) is skipped, since it is missing datasets rather than licenses that
+lapsed. ``--include-partial`` serves it anyway.
+
+The snapshot has:
+
+- index by License Number (exact, case-insensitive)
+- index by normalized business name ("Acme, Inc." -> "ACME INC"; the same
+  normalization as the license store), with a sorted key list for prefix search
+
+A lookup is a dict probe, a few microseconds. Responses are kept in an LRU
+cache keyed by snapshot generation and today's date, so an entry never
+outlives its snapshot or the day its expiration dates were checked on.
+
+A watcher polls the data directory. When a collection writes a newer CSV
+(save_to_csv writes to a temporary file and renames it, so a half-written
+file is never seen), the next snapshot is built off to the side. It then
+replaces the current one in a single reference swap. Requests in flight
+finish on the snapshot they started with. ``POST /reload`` checks at once.
+
+API (JSON):
+
+    GET  /health                       -> {"status": "ok"}
+    GET  /snapshot                     -> loaded file, record count, cache and lookup stats
+    GET  /license/<number>             -> {"license_number", "found", "active", "records"}
+    GET  /name/<name>[?prefix=1&limit=N] -> {"name", "key", "found", "records"}
+    POST /license                      -> {"license_numbers": [...]} -> {"results": {number: ...}}
+    POST /name                         -> {"names": [...], "prefix": false, "limit": 10}
+                                          -> {"results": {name: ...}}
+    POST /reload                       -> load the newest output now
+
+A record is active when its License Status is "Active" and its Expiration
+Date, if any, has not passed.
+
+Usage:
+
+    python -m src.lookup_service --port 8766
+    curl localhost:8766/license/2705123456
+    curl -d '{"license_numbers": ["2705123456", "0401000001"]}' localhost:8766/license
+"""
+
+import csv
+import json
+import logging
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from src.utils.license_store import normalize_name
+from src.utils.log_setup import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8766
+DEFAULT_PREFIX = "dpor_data"
+
+ACTIVE_STATUSES = {"ACTIVE"}
+
+# Most items accepted by one batch request
+MAX_BATCH = 1000
+
+_DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%Y-%m-%d %H:%M:%S", "%m/%d/%y")
+
+
+def _date_ordinal(value: str, cache: Dict[str, int]) -> int:
+    """Ordinal of a date string (0 if empty or unparseable), memoized in cache."""
+    ordinal = cache.get(value)
+    if ordinal is None:
+        ordinal = 0
+        text = value.strip()
+        if text and text.upper() != "NA":
+            for fmt in _DATE_FORMATS:
+                try:
+                    ordinal = datetime.strptime(text, fmt).toordinal()
+                    break
+                except ValueError:
+                    continue
+        cache[value] = ordinal
+    return ordinal
+
+
+def _add(index: Dict, key: str, row: int):
+    """Index a row under key: an int for one row, a tuple for several (most keys have one)."""
+    existing = index.get(key)
+    if existing is None:
+        index[key] = row
+    elif isinstance(existing, tuple):
+        index[key] = existing + (row,)
+    else:
+        index[key] = (existing, row)
+
+
+def _rows(entry) -> Tuple[int, ...]:
+    if entry is None:
+        return ()
+    return entry if isinstance(entry, tuple) else (entry,)
+
+
+class LicenseSnapshot:
+    """Immutable in-memory indexes over one collection output CSV"""
+
+    def __init__(self, path: str, generation: int = 0):
+        """
+        Load and index a CSV written by save_to_csv.
+
+        Args:
+            path: CSV file
+            generation: Snapshot number, part of every cache key
+        """
+        start = time.perf_counter()
+        self.path = Path(path)
+        self.generation = generation
+        self.mtime = self.path.stat().st_mtime
+
+        by_license: Dict = {}
+        by_name: Dict = {}
+        rows: List[tuple] = []
+        expires: List[int] = []
+        dates: Dict[str, int] = {}
+        with open(self.path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            self.fields = tuple(next(reader, ()))
+            column = {name: i for i, name in enumerate(self.fields)}
+            license_col = column.get("License Number")
+            name_col = column.get("Business Name")
+            status_col = column.get("License Status")
+            expiration_col = column.get("Expiration Date")
+            if license_col is None or name_col is None:
+                raise ValueError(f"{path} has no License Number / Business Name columns")
+
+            width = len(self.fields)
+            for row in reader:
+                if len(row) != width:
+                    continue
+                i = len(rows)
+                rows.append(tuple(row))
+                _add(by_license, row[license_col].strip().upper(), i)
+                key = normalize_name(row[name_col])
+                if key:
+                    _add(by_name, key, i)
+                expires.append(_date_ordinal(row[expiration_col], dates) if expiration_col is not None else 0)
+
+        self.rows = rows
+        self.expires = expires
+        self.by_license = by_license
+        self.by_name = by_name
+        self.name_keys = sorted(by_name)
+        self._status_col = status_col
+        self.loaded_at = datetime.now()
+        self.load_seconds = time.perf_counter() - start
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def record(self, row: int) -> Dict:
+        return dict(zip(self.fields, self.rows[row]))
+
+    def is_active(self, row: int, today: Optional[int] = None) -> bool:
+        """Status "Active" and not past its expiration date (if it has one)."""
+        if self._status_col is None:
+            return False
+        if self.rows[row][self._status_col].strip().upper() not in ACTIVE_STATUSES:
+            return False
+        expires = self.expires[row]
+        return not expires or expires >= (today or date.today().toordinal())
+
+    def lookup_license(self, number: str) -> Dict:
+        rows = _rows(self.by_license.get(number.strip().upper()))
+        today = date.today().toordinal()
+        return {"license_number": number, "found": bool(rows),
+                "active": any(self.is_active(row, today) for row in rows),
+                "records": [dict(self.record(row), active=self.is_active(row, today)) for row in rows]}
+
+    def lookup_name(self, name: str, prefix: bool = False, limit: int = 10) -> Dict:
+        key = normalize_name(name)
+        rows: List[int] = []
+        if key and prefix:
+            # Range scan over the sorted keys
+            for i in range(bisect_left(self.name_keys, key), len(self.name_keys)):
+                name_key = self.name_keys[i]
+                if not name_key.startswith(key) or len(rows) >= limit:
+                    break
+                rows.extend(_rows(self.by_name[name_key]))
+        elif key:
+            rows.extend(_rows(self.by_name.get(key)))
+        rows = rows[:limit]
+        today = date.today().toordinal()
+        return {"name": name, "key": key, "found": bool(rows),
+                "records": [dict(self.record(row), active=self.is_active(row, today)) for row in rows]}
+
+    def info(self) -> Dict:
+        return {"file": str(self.path), "generation": self.generation, "records": len(self.rows),
+                "licenses": len(self.by_license), "names": len(self.by_name),
+                "file_modified": datetime.fromtimestamp(self.mtime).isoformat(timespec='seconds'),
+                "loaded_at": self.loaded_at.isoformat(timespec='seconds'),
+                "load_seconds": round(self.load_seconds, 2)}
+
+
+class LookupService:
+    """Serves lookups from the latest snapshot, hot-swapping to newer collection output"""
+
+    def __init__(self, data_dir: str = "data", prefix: str = DEFAULT_PREFIX, path: Optional[str] = None,
+                 cache_size: int = 10000, poll_interval: float = 30.0, include_partial: bool = False):
+        """
+        Args:
+            data_dir: Directory that save_to_csv writes to
+            prefix: Collector file prefix (e.g. "dpor_data")
+            path: Serve this file only, instead of watching for the newest output
+            cache_size: Responses kept in the LRU cache
+            poll_interval: Seconds between checks for newer output (0 = only on /reload)
+            include_partial: Also serve output from partial runs (see save_to_csv's manifest)
+        """
+        self.data_dir = Path(data_dir)
+        self.prefix = prefix
+        self.path = Path(path) if path else None
+        self.cache_size = cache_size
+        self.poll_interval = poll_interval
+        self.include_partial = include_partial
+        self._skipped: set = set()
+        self._pattern = re.compile(rf"^{re.escape(prefix)}_\d{{8}}_\d{{6}}\.csv$")
+
+        self.snapshot: Optional[LicenseSnapshot] = None
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = datetime.now()
+        self.lookups = 0
+        self.cache_hits = 0
+        self.lookup_seconds = 0.0
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+
+    def latest_file(self) -> Optional[Path]:
+        """Newest complete collection output (by the timestamp in its name)."""
+        if self.path is not None:
+            return self.path
+        if not self.data_dir.is_dir():
+            return None
+        files = sorted((p for p in self.data_dir.iterdir() if self._pattern.match(p.name)),
+                       key=lambda p: p.name, reverse=True)
+        for path in files:
+            if self.include_partial or self.is_complete(path):
+                return path
+        return None
+
+    def is_complete(self, path: Path) -> bool:
+        """Whether save_to_csv's manifest says the file holds every dataset (logged once if not)."""
+        try:
+            manifest = json.loads(path.with_suffix(".manifest.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            manifest = {"complete": False, "reasons": ["no manifest"]}
+        if manifest.get("complete"):
+            return True
+        if path.name not in self._skipped:
+            self._skipped.add(path.name)
+            logger.warning(f"Not serving {path.name}, partial run: {'; '.join(manifest.get('reasons') or [])}")
+        return False
+
+    def reload(self) -> bool:
+        """
+        Load the newest output if it differs from the current snapshot.
+
+        Returns:
+            True if a new snapshot was swapped in
+        """
+        # Concurrent triggers coalesce into the reload already running
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            latest = self.latest_file()
+            current = self.snapshot
+            if latest is None or (current is not None and current.path == latest
+                                  and current.mtime == latest.stat().st_mtime):
+                return False
+            snapshot = LicenseSnapshot(str(latest), generation=(current.generation + 1) if current else 1)
+            # The swap is one reference assignment; readers hold on to the snapshot they started with
+            self.snapshot = snapshot
+            with self._cache_lock:
+                self._cache.clear()
+            logger.info(f"Serving {latest.name}: {len(snapshot):,} records, {len(snapshot.by_license):,} "
+                        f"licenses (loaded in {snapshot.load_seconds:.1f}s, generation {snapshot.generation})")
+            return True
+        finally:
+            self._reload_lock.release()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"Could not load new collection output: {e}")
+
+    def start(self):
+        """Load the first snapshot and start watching for newer output."""
+        self.reload()
+        if self.poll_interval > 0 and self.path is None:
+            self._thread = threading.Thread(target=self._watch, name="snapshot-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _cached(self, key: tuple, compute) -> Dict:
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return result
+        result = compute()
+        with self._cache_lock:
+            self._cache[key] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def lookup_licenses(self, numbers: Iterable[str]) -> Dict[str, Dict]:
+        snapshot = self._current()
+        start = time.perf_counter()
+        today = date.today().toordinal()
+        results = {number: self._cached((snapshot.generation, today, "license", number.strip().upper()),
+                                        lambda number=number: snapshot.lookup_license(number))
+                   for number in numbers}
+        self._count(len(results), start)
+        return results
+
+    def lookup_names(self, names: Iterable[str], prefix: bool = False, limit: int = 10) -> Dict[str, Dict]:
+        snapshot = self._current()
+        start = time.perf_counter()
+        today = date.today().toordinal()
+        results = {name: self._cached((snapshot.generation, today, "name", normalize_name(name), prefix, limit),
+                                      lambda name=name: snapshot.lookup_name(name, prefix, limit))
+                   for name in names}
+        self._count(len(results), start)
+        return results
+
+    def _current(self) -> LicenseSnapshot:
+        snapshot = self.snapshot
+        if snapshot is None:
+            raise LookupError("no collection output loaded yet")
+        return snapshot
+
+    def _count(self, lookups: int, start: float):
+        elapsed = time.perf_counter() - start
+        with self._cache_lock:
+            self.lookups += lookups
+            self.lookup_seconds += elapsed
+
+    def status(self) -> Dict:
+        snapshot = self.snapshot
+        with self._cache_lock:
+            lookups, hits, seconds, cached = self.lookups, self.cache_hits, self.lookup_seconds, len(self._cache)
+        return {
+            "snapshot": snapshot.info() if snapshot else None,
+            "started": self.started.isoformat(timespec='seconds'),
+            "lookups": lookups,
+            "cache": {"entries": cached, "capacity": self.cache_size, "hits": hits,
+                      "hit_rate": round(hits / lookups, 3) if lookups else None},
+            "mean_lookup_us": round(seconds / lookups * 1e6, 2) if lookups else None,
+            "watching": str(self.path or self.data_dir / f"{self.prefix}_*.csv"),
+        }
+
+
+# ----------------------------------------------------------------------
+# HTTP API
+# ----------------------------------------------------------------------
+
+class LookupHandler(BaseHTTPRequestHandler):
+    """JSON API over the lookup service (self.server.service)"""
+
+    # Keep-alive, so clients don't pay a connection per lookup; without Nagle the
+    # separately written headers and body don't wait on the client's delayed ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self, status: int, body: Dict):
+        data = json.dumps(body, separators=(',', ':'), default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        return body
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == "/health":
+                self._reply(200, {"status": "ok"})
+            elif url.path == "/snapshot":
+                self._reply(200, service.status())
+            elif url.path.startswith("/license/"):
+                number = unquote(url.path[len("/license/"):])
+                self._reply(200, service.lookup_licenses([number])[number])
+            elif url.path.startswith("/name/"):
+                name = unquote(url.path[len("/name/"):])
+                prefix = query.get("prefix", ["0"])[0].lower() in ("1", "true", "yes")
+                limit = min(int(query.get("limit", ["10"])[0]), MAX_BATCH)
+                self._reply(200, service.lookup_names([name], prefix=prefix, limit=limit)[name])
+            else:
+                self._reply(404, {"error": "not found"})
+        except LookupError as e:
+            self._reply(503, {"error": str(e)})
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+
+    def do_POST(self):
+        service = self.server.service
+        try:
+            if self.path == "/reload":
+                self._read_json()
+                swapped = service.reload()
+                self._reply(200, {"reloaded": swapped, "snapshot": service.status()["snapshot"]})
+                return
+            body = self._read_json()
+            if self.path == "/license":
+                items, lookup = body.get("license_numbers"), service.lookup_licenses
+                options = {}
+            elif self.path == "/name":
+                items, lookup = body.get("names"), service.lookup_names
+                options = {"prefix": bool(body.get("prefix", False)),
+                           "limit": min(int(body.get("limit", 10)), MAX_BATCH)}
+            else:
+                self._reply(404, {"error": "not found"})
+                return
+            if not isinstance(items, list) or not all(isinstance(i, str) for i in items):
+                raise ValueError("Expected a list of strings")
+            if len(items) > MAX_BATCH:
+                raise ValueError(f"At most {MAX_BATCH} items per request")
+            self._reply(200, {"results": lookup(items, **options)})
+        except LookupError as e:
+            self._reply(503, {"error": str(e)})
+        except (ValueError, json.JSONDecodeError) as e:
+            self._reply(400, {"error": str(e)})
+
+    def log_message(self, format, *args):
+        # Per request, so left for the log thread to format (and skipped unless verbose)
+        logger.debug("%s " + format, self.client_address[0], *args, extra=RATE_LIMITED)
+
+
+def make_server(service: LookupService, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+    """HTTP server for the lookup service."""
+    server = ThreadingHTTPServer((host, port), LookupHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main():
+    import argparse
+    import signal
+
+    from src.utils.log_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='License lookup API over the latest collection output')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port (default: {DEFAULT_PORT})')
+    parser.add_argument('--data-dir', default='data', help='Directory collections save CSVs to (default: data)')
+    parser.add_argument('--prefix', default=DEFAULT_PREFIX,
+                        help=f'Collector file prefix to serve (default: {DEFAULT_PREFIX})')
+    parser.add_argument('--file', default=None, help='Serve this CSV only (no hot-swapping)')
+    parser.add_argument('--cache-size', type=int, default=10000, help='Responses kept in the LRU cache')
+    parser.add_argument('--poll', type=float, default=30, metavar='SECONDS',
+                        help='How often to check for newer collection output (0 = only on POST /reload)')
+    parser.add_argument('--include-partial', action='store_true',
+                        help='Also serve output from partial runs (dataset selection, --refresh, failed downloads)')
+    args = parser.parse_args()
+
+    service = LookupService(data_dir=args.data_dir, prefix=args.prefix, path=args.file,
+                            cache_size=args.cache_size, poll_interval=args.poll,
+                            include_partial=args.include_partial)
+    service.start()
+    if service.snapshot is None:
+        logger.warning(f"No complete {args.prefix}_*.csv in {args.data_dir} yet; lookups return 503 until one is written")
+    server = make_server(service, host=args.host, port=args.port)
+
+    def shutdown(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    logger.info(f"License lookup service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    finally:
+        service.stop()
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Collection Orchestrator
+=======================
+Runs registered collectors concurrently, each under its own resource limits
+(network slots, CPU workers, DB connections). Upload stages share one global
+upload capacity so concurrent collectors don't overload the API.
+
+Total run time is bounded by the slowest collector instead of the sum of all
+collectors.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from src.collectors.registry import CollectorSpec, ResourceLimits, discover_collectors
+from src.utils.bbb_targets import targets_from_args
+from src.utils.checkpoint import RunCheckpoint, run_id_from_args
+from src.utils.dataset_selection import selector_from_args
+from src.utils.deadlines import Deadline, DeadlineExceeded, RunBudget
+from src.utils.raw_archive import collector_archive_options
+from src.utils.license_history import LicenseHistory
+from src.utils.license_store import LicenseStore
+from src.utils.name_matching import DEFAULT_THRESHOLD, link_records, write_clusters
+from src.utils.perf_history import record_collector_run
+from src.utils.refresh_schedule import refresh_scheduler
+from src.utils.zip_county import zip_table_from_args
+
+logger = logging.getLogger(__name__)
+
+
+class CollectorResult:
+    """Outcome of running one collector"""
+
+    def __init__(self, name: str, display_name: str):
+        self.name = name
+        self.display_name = display_name
+        self.records = 0
+        self.success = False
+        self.uploaded = None
+        self.csv_file = None
+        self.error = None
+        self.duration = 0.0
+
+
+@dataclass
+class OrchestratorOptions:
+    """
+    What a collection run does, and the shared settings it runs with.
+
+    Attributes:
+        save_csv: Save each collector's data to CSV
+        upload: Upload each collector's data to the API
+        dry_run: Pass dry_run to uploads
+        headless: Run Chrome in headless mode
+        validate: Run the pre-upload validation stage in each collector
+        selector: Optional DatasetSelector passed to each collector
+        max_parallel: Maximum collectors running at once (default: all)
+        upload_slots: Upload stages allowed to run at the same time across collectors
+        limit_overrides: Keyword overrides applied to every collector's ResourceLimits
+            (network_slots, cpu_workers, db_connections, memory_mb)
+        run_id: Checkpoint each collector's progress under this run id (None disables)
+        resume: Continue the existing checkpoints of run_id instead of starting fresh
+        runs_dir: Directory for run checkpoints (default: data/runs)
+        archive: Keep every downloaded file in each collector's raw archive
+        replay: Process this archived snapshot date (or "latest") instead of downloading
+        archive_dir: Raw archive root (default: data/archive)
+        track_changes: Record license transitions in the history index after collection
+        history_db: License history database (default: data/license_history.db)
+        load_store: Bulk load each collector's records into the embedded license store
+        store_db: License store database (default: data/licenses.db)
+        link_names: Write clusters of matching business names across boards to CSV
+        link_threshold: Name similarity threshold for link_names
+        zip_table: Optional ZipCountyTable shared by collectors to fill County
+        targets: Optional BBBTarget list; uploads go to each target that applies
+            to a collector instead of only the collector's own BBB
+        refresh: Only download datasets likely to have changed (see src/utils/refresh_schedule.py)
+        refresh_budget: Download budget per collector run in MB for refresh (None = unlimited)
+        refresh_max_age: With refresh, always download datasets not checked for this many days
+        record_perf: Record each collector's stage and dataset timings in the performance
+            history and warn about throughput regressions (see src/utils/perf_history.py)
+        perf_db: Performance history database (default: data/perf_history.db)
+        run_budget: Minutes for the whole run (None = no limit). Each collector splits the
+            time left across its stages; collectors not started in time are skipped
+            (see src/utils/deadlines.py)
+        hedge: Re-issue downloads that run past the p95 download time
+        hedge_uploads: Also re-send slow upload batches (only if the API ignores duplicates)
+        normalize_uploads: Clean text fields and format dates of each upload batch
+    """
+
+    save_csv: bool = False
+    upload: bool = False
+    dry_run: bool = False
+    headless: bool = True
+    validate: bool = False
+    selector: Optional[Any] = None
+    max_parallel: Optional[int] = None
+    upload_slots: int = 1
+    limit_overrides: Optional[Dict] = None
+    run_id: Optional[str] = None
+    resume: bool = False
+    runs_dir: Optional[str] = None
+    archive: bool = False
+    replay: Optional[str] = None
+    archive_dir: Optional[str] = None
+    track_changes: bool = False
+    history_db: Optional[str] = None
+    load_store: bool = False
+    store_db: Optional[str] = None
+    link_names: bool = False
+    link_threshold: float = DEFAULT_THRESHOLD
+    zip_table: Optional[Any] = None
+    targets: Optional[List] = None
+    refresh: bool = False
+    refresh_budget: Optional[float] = None
+    refresh_max_age: float = 30.0
+    record_perf: bool = False
+    perf_db: Optional[str] = None
+    run_budget: Optional[float] = None
+    hedge: bool = True
+    hedge_uploads: bool = False
+    normalize_uploads: bool = False
+
+
+class CollectionOrchestrator:
+    """Runs collectors concurrently with per-collector and global limits"""
+
+    def __init__(self, collectors: Optional[List[str]] = None, options: Optional[OrchestratorOptions] = None,
+                 profiler=None, notifier=None, collector_pool: Optional[Dict] = None):
+        """
+        Initialize the orchestrator.
+
+        Args:
+            collectors: Collector names to run (None runs every registered collector)
+            options: What the run does and its shared settings (default: OrchestratorOptions())
+            profiler: Optional StageProfiler passed to collectors
+            notifier: Optional object with notify_progress/notify_error (e.g. SlackNotifier)
+            collector_pool: Optional name -> collector dict of warm collectors to reuse
+                (and fill) instead of creating new ones; see src/service.py
+        """
+        registry = discover_collectors()
+        names = collectors or sorted(registry)
+        unknown = [n for n in names if n not in registry]
+        if unknown:
+            raise KeyError(f"Unknown collector(s): {', '.join(unknown)}")
+
+        self.specs: List[CollectorSpec] = [registry[n] for n in names]
+        self.options = options = options or OrchestratorOptions()
+        self.max_parallel = options.max_parallel or max(1, len(self.specs))
+        self.upload_gate = threading.BoundedSemaphore(max(1, options.upload_slots))
+        self.limit_overrides = options.limit_overrides or {}
+        self.profiler = profiler
+        self.notifier = notifier
+        self.collector_pool = collector_pool
+        self.deadline = None
+
+    def limits_for(self, spec: CollectorSpec) -> ResourceLimits:
+        """Return the effective resource limits for a collector."""
+        return spec.limits.override(**self.limit_overrides)
+
+    def run(self) -> List[CollectorResult]:
+        """Run all selected collectors and return their results in selection order."""
+        options = self.options
+        logger.info(f"Running {len(self.specs)} collector(s), up to {self.max_parallel} at once"
+                    + (f", within {options.run_budget:g} minutes" if options.run_budget else ""))
+        self.deadline = Deadline(options.run_budget * 60 if options.run_budget else None, name="run")
+        if options.run_id:
+            logger.info(f"{'Resuming' if options.resume else 'Checkpointing'} run {options.run_id} "
+                        f"(resume with --resume {options.run_id})")
+
+        with ThreadPoolExecutor(max_workers=self.max_parallel,
+                                thread_name_prefix="collector") as pool:
+            futures = [pool.submit(self._run_one, spec) for spec in self.specs]
+            return [f.result() for f in futures]
+
+    def _notify(self, method: str, *args, **kwargs):
+        """Send a notification, never letting notifier errors break a run."""
+        if not self.notifier:
+            return
+        try:
+            getattr(self.notifier, method)(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Notification failed: {e}")
+
+    def _run_one(self, spec: CollectorSpec) -> CollectorResult:
+        """Collect, save and upload for a single collector."""
+        options = self.options
+        result = CollectorResult(spec.name, spec.display_name)
+        limits = self.limits_for(spec)
+        start = time.perf_counter()
+        collector = None
+
+        if self.deadline is not None and self.deadline.expired:
+            logger.warning(f"⚠️ Run budget used up; {spec.display_name} not started")
+            result.error = DeadlineExceeded("run deadline reached before the collector started")
+            return result
+
+        logger.info(f"Starting {spec.display_name} with {limits}")
+        self._notify("notify_progress", f"Starting {spec.display_name} collector...")
+
+        try:
+            kwargs = collector_archive_options(spec.name, options.archive, options.replay, options.archive_dir)
+            if options.run_id:
+                kwargs["checkpoint"] = RunCheckpoint(options.run_id, spec.name, runs_dir=options.runs_dir,
+                                                     resume=options.resume)
+            # Replays process what was archived, so there is nothing to schedule
+            refresh = refresh_scheduler(spec.name, options.refresh and not options.replay,
+                                        options.refresh_budget, options.refresh_max_age)
+            collector = self._collector(spec, limits, dict(
+                kwargs, profiler=self.profiler, validate=options.validate,
+                selector=options.selector, zip_table=options.zip_table, refresh=refresh,
+                budget=RunBudget(None, parent=self.deadline, name=spec.name) if options.run_budget else None,
+                hedge=options.hedge, hedge_uploads=options.hedge_uploads,
+                normalize_uploads=options.normalize_uploads))
+            data = collector.collect()
+            result.records = len(data) if data else 0
+
+            if not data and refresh is not None and refresh.pending:
+                logger.info(f"No changed datasets for {spec.display_name}")
+                result.success = True
+            elif not data:
+                logger.warning(f"⚠️ No data collected from {spec.display_name}")
+            else:
+                result.success = True
+
+                if options.track_changes:
+                    self._record_history(spec, collector)
+
+                if options.load_store:
+                    store = LicenseStore(options.store_db)
+                    try:
+                        store.load(collector.records(), source=spec.name)
+                    finally:
+                        store.close()
+
+                if options.link_names:
+                    clusters = link_records(collector.records(), threshold=options.link_threshold)
+                    write_clusters(clusters, collector.output_dir / (
+                        f"{collector.file_prefix}_name_clusters_{datetime.now():%Y%m%d_%H%M%S}.csv"))
+
+                if options.save_csv:
+                    result.csv_file = collector.save_to_csv()
+
+                if options.upload:
+                    targets = [t for t in options.targets or () if t.applies_to(spec.name)]
+                    if targets:
+                        # Each target upload takes its own global upload slot
+                        result.uploaded = collector.upload_to_targets(targets, dry_run=options.dry_run,
+                                                                      gate=self.upload_gate)
+                    else:
+                        # Uploads from all collectors share the global upload capacity
+                        with self.upload_gate:
+                            result.uploaded = collector.upload_to_api(dry_run=options.dry_run)
+                    result.success = result.uploaded
+
+            # Only a successful run may mark datasets as checked, so failed work is redone
+            if result.success and refresh is not None:
+                refresh.save()
+
+        except Exception as e:
+            if options.replay and isinstance(e, FileNotFoundError):
+                # Empty or missing archive, or a date that was never archived: no traceback
+                logger.error(f"❌ {spec.display_name}: no archived snapshot to replay: {e}")
+            else:
+                logger.error(f"❌ Error running {spec.display_name} collector: {e}", exc_info=True)
+            result.error = e
+            result.success = False
+            self._notify("notify_error", f"{spec.display_name} collector failed", exception=e)
+
+        result.duration = time.perf_counter() - start
+        if options.record_perf and collector is not None:
+            # Replays read the archive instead of the network, so they get their own baseline
+            record_collector_run(spec.name, collector, result.duration, result.success, path=options.perf_db,
+                                 kind="replay" if options.replay else "collect")
+        logger.info(f"Finished {spec.display_name}: {result.records:,} records in {result.duration:.1f}s")
+        self._notify("notify_progress", f"Finished {spec.display_name}: {result.records:,} records "
+                                        f"in {result.duration:.1f}s")
+        return result
+
+    def _collector(self, spec: CollectorSpec, limits: ResourceLimits, options: Dict):
+        """Create the collector, or reset the warm one from collector_pool for this run."""
+        if self.collector_pool is None:
+            return spec.create(limits, headless=self.options.headless, **options)
+
+        collector = self.collector_pool.get(spec.name)
+        if collector is None:
+            collector = spec.create(limits, headless=self.options.headless, **options)
+            collector.keep_warm = True
+            self.collector_pool[spec.name] = collector
+        else:
+            collector.reset_run(**options)
+        return collector
+
+    def _record_history(self, spec: CollectorSpec, collector):
+        """Append the collector's license transitions to the history index."""
+        # Replays are recorded under their snapshot date, so history can be backfilled
+        run_date = collector.archive.resolve_date(self.options.replay) if self.options.replay else None
+        history = LicenseHistory(self.options.history_db)
+        try:
+            dataset_records = collector.dataset_records()
+            if dataset_records is not None:
+                history.record_datasets(dataset_records, source=spec.name, run_date=run_date)
+            else:
+                # Without per-dataset slices no license can be scoped, so none is marked removed
+                history.record_run(collector.records(), source=spec.name, run_date=run_date)
+        finally:
+            history.close()
+
+
+def add_orchestrator_arguments(parser):
+    """Add the shared resource limit options to an argparse parser."""
+    parser.add_argument('--max-parallel', type=int, default=None,
+                        help='Maximum collectors running at once (default: all)')
+    parser.add_argument('--upload-slots', type=int, default=1,
+                        help='Uploads allowed at the same time across collectors (default: 1)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes per collector for parsing (default: collector setting)')
+    parser.add_argument('--network-slots', type=int, default=None,
+                        help='Concurrent downloads per collector (default: collector setting)')
+    parser.add_argument('--db-connections', type=int, default=None,
+                        help='Database connections per collector (default: collector setting)')
+    parser.add_argument('--memory-budget', type=int, default=None, metavar='MB',
+                        help='Collected records kept in RAM per collector; the rest spill to disk '
+                             '(default: no limit)')
+
+
+def limit_overrides_from_args(args) -> Dict:
+    """Build ResourceLimits overrides from parsed orchestrator options."""
+    return {
+        'cpu_workers': args.workers,
+        'network_slots': args.network_slots,
+        'db_connections': args.db_connections,
+        'memory_mb': getattr(args, 'memory_budget', None)
+    }
+
+
+def orchestrator_options_from_args(args) -> OrchestratorOptions:
+    """Build OrchestratorOptions from the options parsed by run.py / run_collection.py."""
+    return OrchestratorOptions(
+        save_csv=getattr(args, 'save_csv', False),
+        upload=getattr(args, 'upload', False),
+        dry_run=getattr(args, 'dry_run', False),
+        headless=getattr(args, 'headless', True),
+        validate=getattr(args, 'validate', False),
+        selector=selector_from_args(args),
+        max_parallel=getattr(args, 'max_parallel', None),
+        upload_slots=getattr(args, 'upload_slots', 1),
+        limit_overrides=limit_overrides_from_args(args),
+        run_id=run_id_from_args(args),
+        resume=bool(getattr(args, 'resume', None)),
+        runs_dir=getattr(args, 'runs_dir', None),
+        archive=getattr(args, 'archive', False),
+        replay=getattr(args, 'replay', None),
+        archive_dir=getattr(args, 'archive_dir', None),
+        track_changes=getattr(args, 'track_changes', False),
+        history_db=getattr(args, 'history_db', None),
+        load_store=getattr(args, 'load_store', False),
+        store_db=getattr(args, 'store_db', None),
+        link_names=getattr(args, 'link_names', False),
+        link_threshold=getattr(args, 'link_threshold', DEFAULT_THRESHOLD),
+        zip_table=zip_table_from_args(args),
+        targets=targets_from_args(args),
+        refresh=getattr(args, 'refresh', False),
+        refresh_budget=getattr(args, 'refresh_budget', None),
+        refresh_max_age=getattr(args, 'refresh_max_age', 30.0),
+        record_perf=getattr(args, 'record_perf', False),
+        perf_db=getattr(args, 'perf_db', None),
+        run_budget=getattr(args, 'run_budget', None),
+        hedge=not getattr(args, 'no_hedge', False),
+        hedge_uploads=getattr(args, 'hedge_uploads', False),
+        normalize_uploads=getattr(args, 'normalize_uploads', False),
+    )
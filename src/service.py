@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+"""
+Collector Service
+=================
+Long-running collector process that keeps expensive resources warm between
+runs, so each run only pays for the data work:
+
+- collector instances, with their SQLAlchemy engine, HTTP session
+  (keep-alive TLS connections) and header-mapping cache
+- the Chrome browser used for link discovery, plus the chromedriver install
+- imported modules and the ZIP county table
+
+Runs are triggered over a local HTTP API (TCP on 127.0.0.1, or a Unix socket)
+and/or on a schedule, and execute one at a time through the orchestrator.
+
+API:
+
+    GET  /health           -> {"status": "ok"}
+    GET  /status           -> service state, current run with live stage timings, recent runs
+    GET  /runs/<id>        -> one run
+    POST /runs             -> queue a run; JSON body with optional overrides, e.g.
+                              {"collectors": ["dpor"], "upload": true, "include": ["0225*"]}
+
+Usage:
+
+    python -m src.service serve --every 360 --upload
+    python -m src.service serve --socket /run/dc-collectors.sock --at 03:15
+    python -m src.service trigger --upload --include '0225*'
+    python -m src.service status
+"""
+
+import http.client
+import itertools
+import json
+import logging
+import queue
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.collectors.registry import list_collectors
+from src.orchestrator import (CollectionOrchestrator, OrchestratorOptions, add_orchestrator_arguments,
+                              limit_overrides_from_args)
+from src.utils.checkpoint import new_run_id
+from src.utils.dataset_selection import DatasetSelector, parse_shard, shared_sizes
+from src.utils.log_setup import RATE_LIMITED
+from src.utils.profiling import StageProfiler
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+# Run options a trigger may override, with their types
+RUN_OPTIONS = {
+    "collectors": list, "save_csv": bool, "upload": bool, "dry_run": bool, "validate": bool,
+    "include": list, "exclude": list, "shard": str, "checkpoint": bool, "archive": bool,
+    "replay": str, "track_changes": bool, "load_store": bool, "link_names": bool,
+    "refresh": bool,
+}
+
+
+class CollectorService:
+    """Runs triggered and scheduled collections on warm collectors, one at a time"""
+
+    def __init__(self, defaults: Dict, orchestrator_options: Optional[Dict] = None,
+                 every: Optional[float] = None, at: Optional[List[str]] = None,
+                 cache_ttl: float = 3600.0, max_pending: int = 5, history: int = 50):
+        """
+        Initialize the service.
+
+        Args:
+            defaults: Default run options (RUN_OPTIONS keys); triggers override them
+            orchestrator_options: Fixed OrchestratorOptions fields
+                (limits, upload slots, database paths, ZIP table, BBB targets, ...)
+            every: Run every N minutes
+            at: Run daily at these HH:MM times
+            cache_ttl: Seconds before cached header mappings are looked up again
+            max_pending: Runs that may wait in the queue
+            history: Finished runs kept for /status
+        """
+        self.defaults = defaults
+        self.orchestrator_options = orchestrator_options or {}
+        self.every = every
+        self.at = sorted(datetime.strptime(t, "%H:%M").time() for t in at or ())
+        self.cache_ttl = cache_ttl
+        self.history = history
+
+        self.pool: Dict = {}
+        self.runs: "OrderedDict[str, Dict]" = OrderedDict()
+        self.current: Optional[Dict] = None
+        self.started = datetime.now()
+        self.next_scheduled: Optional[datetime] = None
+
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._cache_cleared = time.monotonic()
+        self._threads: List[threading.Thread] = []
+        self._run_numbers = itertools.count(1)
+
+    # ------------------------------------------------------------------
+    # Triggers
+    # ------------------------------------------------------------------
+
+    def trigger(self, overrides: Optional[Dict] = None, source: str = "api") -> Dict:
+        """
+        Queue a run.
+
+        Args:
+            overrides: Run options overriding the service defaults
+            source: What triggered the run ("api" or "schedule")
+
+        Returns:
+            The queued run
+
+        Raises:
+            ValueError: Unknown or mistyped run option
+            queue.Full: Too many runs waiting
+        """
+        overrides = overrides or {}
+        for key, value in overrides.items():
+            if key not in RUN_OPTIONS:
+                raise ValueError(f"Unknown run option: {key}")
+            if value is not None and not isinstance(value, RUN_OPTIONS[key]):
+                raise ValueError(f"Run option {key} must be {RUN_OPTIONS[key].__name__}")
+        unknown = set(overrides.get("collectors") or ()) - set(list_collectors())
+        if unknown:
+            raise ValueError(f"Unknown collector(s): {', '.join(sorted(unknown))}")
+
+        run = {"id": f"{new_run_id()}_{next(self._run_numbers)}", "source": source, "state": "queued",
+               "options": dict(self.defaults, **overrides), "queued": datetime.now().isoformat(),
+               "started": None, "finished": None, "results": [], "error": None}
+        with self._lock:
+            self._queue.put_nowait(run)
+            self.runs[run["id"]] = run
+            while len(self.runs) > self.history:
+                self.runs.popitem(last=False)
+        logger.info(f"Queued run {run['id']} ({source})")
+        return run
+
+    def _pending(self) -> bool:
+        return self.current is not None or not self._queue.empty()
+
+    def _next_run_time(self, now: datetime) -> Optional[datetime]:
+        candidates = []
+        if self.every:
+            candidates.append(now + timedelta(minutes=self.every))
+        for t in self.at:
+            day = now if t > now.time() else now + timedelta(days=1)
+            candidates.append(datetime.combine(day.date(), t))
+        return min(candidates) if candidates else None
+
+    def _schedule_loop(self):
+        while self.next_scheduled and not self._stop.is_set():
+            wait = (self.next_scheduled - datetime.now()).total_seconds()
+            if wait > 0 and self._stop.wait(min(wait, 60)):
+                return
+            if datetime.now() < self.next_scheduled:
+                continue
+            # A run that is still pending covers this slot
+            if self._pending():
+                logger.info("Scheduled run skipped: previous run still pending")
+            else:
+                try:
+                    self.trigger(source="schedule")
+                except queue.Full:
+                    logger.warning("Scheduled run skipped: run queue is full")
+            self.next_scheduled = self._next_run_time(datetime.now())
+
+    # ------------------------------------------------------------------
+    # Runs
+    # ------------------------------------------------------------------
+
+    def _run_loop(self):
+        while not self._stop.is_set():
+            try:
+                run = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            self._execute(run)
+
+    def _execute(self, run: Dict):
+        options = run["options"]
+        profiler = StageProfiler(enabled=False)
+        with self._lock:
+            run.update(state="running", started=datetime.now().isoformat(), profiler=profiler)
+            self.current = run
+        start = time.perf_counter()
+        logger.info(f"Starting run {run['id']}: {options}")
+
+        if time.monotonic() - self._cache_cleared > self.cache_ttl:
+            for collector in self.pool.values():
+                collector.clear_cache()
+            self._cache_cleared = time.monotonic()
+
+        try:
+            shard = parse_shard(options.get("shard"))
+            selector = None
+            sizes_path = self.orchestrator_options.get("dataset_sizes")
+            if options.get("include") or options.get("exclude") or shard or sizes_path:
+                sizes = shared_sizes(sizes_path, shard) if sizes_path else None
+                selector = DatasetSelector(include=options.get("include"), exclude=options.get("exclude"),
+                                           shard=shard, sizes=sizes, sizes_path=sizes_path)
+            fixed = {k: v for k, v in self.orchestrator_options.items() if k != "dataset_sizes"}
+            run_options = OrchestratorOptions(
+                save_csv=options.get("save_csv", False),
+                upload=options.get("upload", False),
+                dry_run=options.get("dry_run", False),
+                validate=options.get("validate", False),
+                selector=selector,
+                run_id=new_run_id() if options.get("checkpoint") else None,
+                archive=options.get("archive", False),
+                replay=options.get("replay"),
+                track_changes=options.get("track_changes", False),
+                load_store=options.get("load_store", False),
+                link_names=options.get("link_names", False),
+                refresh=options.get("refresh", False),
+                **fixed
+            )
+            orchestrator = CollectionOrchestrator(collectors=options.get("collectors") or None,
+                                                  options=run_options, profiler=profiler,
+                                                  collector_pool=self.pool)
+            results = orchestrator.run()
+            run["results"] = [{"collector": r.name, "records": r.records, "success": r.success,
+                               "uploaded": r.uploaded, "csv_file": r.csv_file,
+                               "error": str(r.error) if r.error else None,
+                               "duration": round(r.duration, 1)} for r in results]
+            run["state"] = "succeeded" if results and all(r.success for r in results) else "failed"
+        except Exception as e:
+            logger.error(f"Run {run['id']} failed: {e}", exc_info=True)
+            run.update(state="failed", error="".join(traceback.format_exception_only(type(e), e)).strip())
+        finally:
+            # Drop the run's records; connections, browser and caches stay warm
+            for collector in self.pool.values():
+                collector.reset_run()
+            with self._lock:
+                run["stages"] = profiler.status()["finished"]
+                run.pop("profiler", None)
+                run.update(finished=datetime.now().isoformat(), duration=round(time.perf_counter() - start, 1))
+                self.current = None
+            logger.info(f"Run {run['id']} {run['state']} in {run['duration']:.1f}s")
+
+    # ------------------------------------------------------------------
+    # Status
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _public(run: Dict) -> Dict:
+        public = {k: v for k, v in run.items() if k != "profiler"}
+        profiler = run.get("profiler")
+        if profiler is not None:
+            public["stages"] = profiler.status()
+        return public
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        with self._lock:
+            run = self.runs.get(run_id)
+            return self._public(run) if run else None
+
+    def status(self) -> Dict:
+        with self._lock:
+            current = self._public(self.current) if self.current else None
+            recent = [self._public(r) for r in reversed(self.runs.values()) if r is not self.current]
+        return {
+            "state": "running" if current else "idle",
+            "started": self.started.isoformat(),
+            "uptime": round((datetime.now() - self.started).total_seconds()),
+            "current": current,
+            "queued": self._queue.qsize(),
+            "next_scheduled": self.next_scheduled.isoformat() if self.next_scheduled else None,
+            "warm_collectors": sorted(self.pool),
+            "defaults": self.defaults,
+            "recent": recent[:10],
+        }
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the run and schedule threads."""
+        self.next_scheduled = self._next_run_time(datetime.now())
+        for target, name in ((self._run_loop, "runner"), (self._schedule_loop, "scheduler")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        """Stop accepting work and release warm resources (a running run is abandoned)."""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        for collector in self.pool.values():
+            try:
+                collector.close()
+            except Exception as e:
+                logger.warning(f"Error closing collector: {e}")
+        self.pool.clear()
+
+
+# ----------------------------------------------------------------------
+# HTTP API
+# ----------------------------------------------------------------------
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON API over the service (self.server.service)"""
+
+    def _reply(self, status: int, body: Dict):
+        data = json.dumps(body, indent=2, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self._reply(200, {"status": "ok"})
+        elif self.path == "/status":
+            self._reply(200, service.status())
+        elif self.path.startswith("/runs/"):
+            run = service.get_run(self.path[len("/runs/"):])
+            self._reply(200, run) if run else self._reply(404, {"error": "unknown run"})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/runs":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            overrides = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            if not isinstance(overrides, dict):
+                raise ValueError("Request body must be a JSON object")
+            run = self.server.service.trigger(overrides)
+        except (ValueError, json.JSONDecodeError) as e:
+            self._reply(400, {"error": str(e)})
+        except queue.Full:
+            self._reply(429, {"error": "run queue is full"})
+        else:
+            self._reply(202, self.server.service.get_run(run["id"]))
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        logger.debug("%s " + format, self.address_string(), *args, extra=RATE_LIMITED)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix domain socket"""
+    daemon_threads = True
+
+
+def make_server(service: CollectorService, port: int = DEFAULT_PORT, socket_path: Optional[str] = None):
+    """HTTP server for the service on 127.0.0.1:port, or on a Unix socket."""
+    if socket_path:
+        Path(socket_path).unlink(missing_ok=True)
+        server = UnixHTTPServer(socket_path, ServiceHandler)
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", port), ServiceHandler)
+        server.daemon_threads = True
+    server.service = service
+    return server
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """http.client connection over a Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: float = 10.0):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(method: str, path: str, body: Optional[Dict] = None, port: int = DEFAULT_PORT,
+            socket_path: Optional[str] = None):
+    """Call the service API and return (status, JSON body)."""
+    conn = UnixHTTPConnection(socket_path) if socket_path else http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        conn.request(method, path, body=payload, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        conn.close()
+
+
+def _add_run_option_arguments(parser):
+    parser.add_argument('--collector', action='append', dest='collectors', choices=list_collectors(),
+                        help='Collector to run (repeatable; default: all)')
+    parser.add_argument('--save-csv', action='store_true', default=None, help='Save collected data to CSV files')
+    parser.add_argument('--upload', action='store_true', default=None, help='Upload data to Visual Knowledge API')
+    parser.add_argument('--dry-run', action='store_true', default=None, help='Perform dry run (don\'t actually upload)')
+    parser.add_argument('--validate', action='store_true', default=None,
+                        help='Divert records failing validation rules to a rejects file')
+    parser.add_argument('--include', action='append', default=None, metavar='PATTERN',
+                        help='Only process datasets matching this code or glob (repeatable)')
+    parser.add_argument('--exclude', action='append', default=None, metavar='PATTERN',
+                        help='Skip datasets matching this code or glob (repeatable)')
+    parser.add_argument('--shard', default=None, metavar='i/N', help='Process only shard i of N')
+    parser.add_argument('--checkpoint', action='store_true', default=None,
+                        help='Checkpoint runs so a failed one can be resumed with run_collection.py --resume')
+    parser.add_argument('--archive', action='store_true', default=None,
+                        help='Keep every downloaded file in the local raw archive')
+    parser.add_argument('--link-names', action='store_true', default=None,
+                        help='Write clusters of matching business names across boards to CSV')
+
+
+def _run_options(args) -> Dict:
+    """RUN_OPTIONS given on the command line (unset flags are left out)."""
+    return {key: getattr(args, key) for key in RUN_OPTIONS
+            if getattr(args, key, None) is not None}
+
+
+def main():
+    import argparse
+    from src.utils.license_history import add_history_arguments
+    from src.utils.license_store import add_store_arguments
+    from src.utils.zip_county import add_enrichment_arguments, zip_table_from_args
+    from src.utils.bbb_targets import add_target_arguments, targets_from_args
+    from src.utils.refresh_schedule import add_refresh_arguments
+    from src.utils.perf_history import add_perf_arguments
+    from src.utils.deadlines import add_deadline_arguments
+    from src.utils.upload_api import add_upload_arguments
+    from src.utils.log_setup import add_logging_arguments, setup_logging_from_args
+
+    parser = argparse.ArgumentParser(description='Long-running DC collector service')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help=f'API port on 127.0.0.1 (default: {DEFAULT_PORT})')
+    parser.add_argument('--socket', default=None, metavar='PATH',
+                        help='Serve the API on this Unix socket instead of TCP')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable debug logging')
+    add_logging_arguments(parser)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve = subparsers.add_parser('serve', help='Run the service')
+    _add_run_option_arguments(serve)
+    serve.add_argument('--every', type=float, default=None, metavar='MINUTES', help='Run every N minutes')
+    serve.add_argument('--at', action='append', default=None, metavar='HH:MM', help='Run daily at this time (repeatable)')
+    serve.add_argument('--cache-ttl', type=float, default=3600,
+                       help='Seconds before cached header mappings are refreshed (default: 3600)')
+    serve.add_argument('--headless', action='store_true', default=True,
+                       help='Run Chrome in headless mode (default: True)')
+    serve.add_argument('--dataset-sizes', default=None, help='Size history used to balance shards')
+    serve.add_argument('--runs-dir', default=None, help='Directory for run checkpoints (default: data/runs)')
+    serve.add_argument('--archive-dir', default=None, help='Raw archive root (default: data/archive)')
+    add_orchestrator_arguments(serve)
+    add_history_arguments(serve)
+    add_store_arguments(serve)
+    add_enrichment_arguments(serve)
+    add_target_arguments(serve)
+    add_refresh_arguments(serve)
+    add_perf_arguments(serve)
+    add_deadline_arguments(serve)
+    add_upload_arguments(serve)
+
+    trigger = subparsers.add_parser('trigger', help='Queue a run on a running service')
+    _add_run_option_arguments(trigger)
+    trigger.add_argument('--replay', default=None, metavar='DATE', help='Process an archived snapshot')
+    trigger.add_argument('--track-changes', action='store_true', default=None,
+                         help='Record license status changes in the history index')
+    trigger.add_argument('--load-store', action='store_true', default=None,
+                         help='Load collected records into the embedded license store')
+    trigger.add_argument('--refresh', action='store_true', default=None,
+                         help='Only download datasets likely to have changed')
+    trigger.add_argument('--wait', action='store_true', help='Wait for the run to finish')
+    subparsers.add_parser('status', help='Show service status')
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+
+    if args.command == 'status':
+        status, body = request("GET", "/status", port=args.port, socket_path=args.socket)
+        print(json.dumps(body, indent=2))
+        return 0 if status == 200 else 1
+
+    if args.command == 'trigger':
+        status, run = request("POST", "/runs", _run_options(args), port=args.port, socket_path=args.socket)
+        if status != 202:
+            logger.error(f"Trigger rejected ({status}): {run.get('error')}")
+            return 1
+        logger.info(f"Queued run {run['id']}")
+        while args.wait and run.get("state") in ("queued", "running"):
+            time.sleep(2)
+            _, run = request("GET", f"/runs/{run['id']}", port=args.port, socket_path=args.socket)
+        if args.wait:
+            print(json.dumps(run, indent=2))
+            return 0 if run.get("state") == "succeeded" else 1
+        return 0
+
+    service = CollectorService(
+        defaults=_run_options(args),
+        orchestrator_options={
+            "headless": args.headless,
+            "max_parallel": args.max_parallel,
+            "upload_slots": args.upload_slots,
+            "limit_overrides": limit_overrides_from_args(args),
+            "runs_dir": args.runs_dir,
+            "archive_dir": args.archive_dir,
+            "history_db": args.history_db,
+            "store_db": args.store_db,
+            "zip_table": zip_table_from_args(args),
+            "targets": targets_from_args(args),
+            "refresh_budget": args.refresh_budget,
+            "refresh_max_age": args.refresh_max_age,
+            "record_perf": args.record_perf,
+            "perf_db": args.perf_db,
+            "run_budget": args.run_budget,
+            "hedge": not args.no_hedge,
+            "hedge_uploads": args.hedge_uploads,
+            "normalize_uploads": args.normalize_uploads,
+            "dataset_sizes": args.dataset_sizes,
+        },
+        every=args.every, at=args.at, cache_ttl=args.cache_ttl)
+    server = make_server(service, port=args.port, socket_path=args.socket)
+
+    def shutdown(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down")
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    service.start()
+    logger.info(f"Collector service listening on {args.socket or f'http://127.0.0.1:{args.port}'}"
+                + (f"; next scheduled run {service.next_scheduled}" if service.next_scheduled else ""))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.stop()
+        if args.socket:
+            Path(args.socket).unlink(missing_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
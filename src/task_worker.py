@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Queue Workers for DC Collectors
+===============================
+Runs a collection as per-dataset tasks in a durable TaskQueue instead of one
+in-memory flow, so a crash only loses the task in hand and any number of
+worker processes (on one or more hosts) can share the work.
+
+    # Discover links and enqueue one download task per dataset
+    python -m src.task_worker enqueue --collector dpor --run-id nightly-0419 --upload
+
+    # Start workers (repeat on as many hosts as you like)
+    python -m src.task_worker work --run-id nightly-0419 --processes 4 --exit-when-idle
+
+    # Progress by task kind and state
+    python -m src.task_worker status --run-id nightly-0419
+
+Each task hands its output to the next through files under --work-dir:
+
+    download -> <work-dir>/<run-id>/raw/<dataset>.txt          -> process
+    process  -> <work-dir>/<run-id>/records/<dataset>.jsonl.gz -> upload
+
+Workers on different hosts must share the queue (a Postgres URL, or a SQLite
+file on shared storage) and the work directory.
+
+Collectors run through the queue must provide get_data_links(),
+dataset_targets(links) and process_tsv_data(dataset, text).
+"""
+
+import logging
+import multiprocessing
+import sys
+import time
+from pathlib import Path
+from typing import Dict
+
+from src.collectors.registry import get_collector
+from src.utils.record_io import read_records, read_text, write_records, write_text
+from src.utils.task_queue import TaskQueue, default_owner
+from src.utils.zip_county import ZipCountyTable
+
+logger = logging.getLogger(__name__)
+
+TASK_KINDS = ("download", "process", "upload")
+
+
+def _task_key(collector: str, dataset: str) -> str:
+    return f"{collector}:{dataset}"
+
+
+def enqueue_run(queue: TaskQueue, collector_name: str, run_id: str, work_dir: str,
+                upload: bool = False, dry_run: bool = False, validate: bool = False,
+                selector=None, headless: bool = True, normalize_uploads: bool = False) -> int:
+    """
+    Discover a collector's datasets and enqueue one download task per dataset.
+
+    Re-running with the same run_id only adds datasets that aren't queued yet.
+
+    Returns:
+        Number of new download tasks
+    """
+    spec = get_collector(collector_name)
+    collector = spec.create(headless=headless, selector=selector)
+
+    links = collector.get_data_links()
+    if not links:
+        logger.error("No data links found")
+        return 0
+
+    options = {"collector": collector_name, "work_dir": str(Path(work_dir).resolve()),
+               "upload": upload, "dry_run": dry_run, "validate": validate,
+               "normalize_uploads": normalize_uploads}
+    items = [(_task_key(collector_name, code), dict(options, code=code, url=url))
+             for code, url in collector.dataset_targets(links)]
+
+    created = queue.enqueue_many(run_id, "download", items)
+    logger.info(f"Enqueued {created} of {len(items)} download tasks for run {run_id}")
+    return created
+
+
+class TaskWorker:
+    """Claims and runs collector tasks until the queue is drained or stopped"""
+
+    def __init__(self, queue: TaskQueue, run_id=None, kinds=None, owner=None,
+                 poll_interval: float = 5.0, headless: bool = True):
+        """
+        Initialize the worker.
+
+        Args:
+            queue: Shared task queue
+            run_id: Only work on this run (None works on every run)
+            kinds: Task kinds to claim (default: all)
+            owner: Lease owner name (default: host:pid:thread)
+            poll_interval: Seconds to wait when no task is runnable
+            headless: Run Chrome in headless mode
+        """
+        self.queue = queue
+        self.run_id = run_id
+        self.kinds = list(kinds or TASK_KINDS)
+        self.owner = owner or default_owner()
+        self.poll_interval = poll_interval
+        self.headless = headless
+        self._collectors: Dict = {}
+        self._zip_table = None
+
+    def collector(self, name: str, validate: bool = False):
+        """One collector instance per (name, validate), so DB engines and caches are reused."""
+        key = (name, validate)
+        if key not in self._collectors:
+            if self._zip_table is None:
+                self._zip_table = ZipCountyTable.open_default()
+            self._collectors[key] = get_collector(name).create(headless=self.headless, validate=validate,
+                                                               zip_table=self._zip_table)
+        return self._collectors[key]
+
+    def run(self, exit_when_idle: bool = False) -> int:
+        """
+        Process tasks until the run is drained (with exit_when_idle) or forever.
+
+        Returns:
+            Number of tasks that ran successfully
+        """
+        completed = 0
+        while True:
+            task = self.queue.claim(owner=self.owner, kinds=self.kinds, run_id=self.run_id)
+            if task is None:
+                if exit_when_idle and self.queue.is_drained(self.run_id):
+                    logger.info(f"Queue drained, worker {self.owner} exiting after {completed} tasks")
+                    return completed
+                time.sleep(self.poll_interval)
+                continue
+
+            logger.info(f"Running {task}")
+            try:
+                with self.queue.keep_alive(task):
+                    getattr(self, f"run_{task.kind}")(task)
+            except Exception as e:
+                logger.error(f"{task} raised: {e}", exc_info=True)
+                self.queue.fail(task, f"{type(e).__name__}: {e}")
+                continue
+
+            self.queue.complete(task)
+            completed += 1
+
+    def _run_dir(self, task) -> Path:
+        return Path(task.payload["work_dir"]) / task.run_id
+
+    def run_download(self, task):
+        """Download one dataset to the raw spill directory and enqueue its processing."""
+        payload = task.payload
+        collector = self.collector(payload["collector"])
+
+        text_data = collector.fetch_url(payload["url"])
+        if text_data is None:
+            raise RuntimeError(f"Download failed: {payload['url']}")
+
+        raw_path = self._run_dir(task) / "raw" / f"{payload['code']}.txt"
+        write_text(raw_path, text_data)
+
+        self.queue.enqueue(task.run_id, "process", task.dataset, dict(payload, raw=str(raw_path)))
+
+    def run_process(self, task):
+        """Parse a downloaded dataset into a records spill file and enqueue its upload."""
+        payload = task.payload
+        collector = self.collector(payload["collector"], validate=payload.get("validate", False))
+
+        records = collector.process_tsv_data(payload["code"], read_text(payload["raw"]))
+        records = collector.enrich_records(records)
+        records = collector.validate_records(records)
+
+        records_path = self._run_dir(task) / "records" / f"{payload['code']}.jsonl.gz"
+        count = write_records(records_path, records)
+        logger.info(f"{task.dataset}: {count:,} records -> {records_path}")
+
+        if payload.get("upload") and count:
+            self.queue.enqueue(task.run_id, "upload", task.dataset,
+                               dict(payload, records=str(records_path), count=count))
+
+    def run_upload(self, task):
+        """Upload a dataset's records spill file."""
+        from src.utils.upload_api import VKBulkUploader
+
+        payload = task.payload
+        uploader = VKBulkUploader(dry_run=payload.get("dry_run", False),
+                                  normalize=payload.get("normalize_uploads", False))
+        stats = uploader.upload_stream(read_records(payload["records"]), total=payload.get("count"))
+        # A partial upload fails the task so the retry (or an operator) picks up the rest
+        if not stats.get("success") or stats.get("failed") or stats.get("failed_batches"):
+            raise RuntimeError(f"Upload failed: {stats}")
+
+
+def _work(location: str, run_id, kinds, poll_interval: float, exit_when_idle: bool) -> int:
+    """Entry point for one worker process."""
+    queue = TaskQueue(location)
+    worker = TaskWorker(queue, run_id=run_id, kinds=kinds, poll_interval=poll_interval)
+    return worker.run(exit_when_idle=exit_when_idle)
+
+
+def print_status(queue: TaskQueue, run_id=None):
+    """Log task counts by kind and state."""
+    counts = queue.counts(run_id)
+    if not counts:
+        logger.info("No tasks found")
+        return
+    for kind in TASK_KINDS:
+        if kind in counts:
+            states = ", ".join(f"{state}={n}" for state, n in sorted(counts[kind].items()))
+            logger.info(f"  {kind:<9} {states}")
+
+
+def main():
+    import argparse
+    from src.utils.dataset_selection import add_selection_arguments, selector_from_args
+    from src.utils.log_setup import add_logging_arguments, setup_logging_from_args
+    from src.utils.upload_api import add_upload_arguments
+
+    parser = argparse.ArgumentParser(description='Queue-based DC collection workers')
+    parser.add_argument('--queue', default='data/tasks.db',
+                        help='SQLite file or SQLAlchemy URL (e.g. postgresql://...) (default: data/tasks.db)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Enable debug logging')
+    add_logging_arguments(parser)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = subparsers.add_parser('enqueue', help='Enqueue download tasks for a collector run')
+    enqueue.add_argument('--collector', default='dpor', help='Collector to run (default: dpor)')
+    enqueue.add_argument('--run-id', required=True, help='Name of this run')
+    enqueue.add_argument('--work-dir', default='data/queue',
+                         help='Directory for raw and record spill files (default: data/queue)')
+    enqueue.add_argument('--upload', action='store_true', help='Enqueue uploads after processing')
+    enqueue.add_argument('--dry-run', action='store_true', help='Perform dry run uploads')
+    enqueue.add_argument('--validate', action='store_true',
+                         help='Divert records failing validation rules to a rejects file')
+    add_selection_arguments(enqueue)
+    add_upload_arguments(enqueue)
+
+    work = subparsers.add_parser('work', help='Claim and run tasks')
+    work.add_argument('--run-id', default=None, help='Only work on this run (default: any run)')
+    work.add_argument('--kinds', default=','.join(TASK_KINDS),
+                      help=f'Comma-separated task kinds to claim (default: {",".join(TASK_KINDS)})')
+    work.add_argument('--processes', type=int, default=1, help='Worker processes to start (default: 1)')
+    work.add_argument('--poll-interval', type=float, default=5.0,
+                      help='Seconds between polls when idle (default: 5)')
+    work.add_argument('--exit-when-idle', action='store_true',
+                      help='Exit once no task is pending or leased')
+
+    status = subparsers.add_parser('status', help='Show task counts')
+    status.add_argument('--run-id', default=None, help='Only count this run')
+
+    args = parser.parse_args()
+    setup_logging_from_args(args)
+    queue = TaskQueue(args.queue)
+
+    if args.command == 'enqueue':
+        enqueue_run(queue, args.collector, args.run_id, args.work_dir, upload=args.upload,
+                    dry_run=args.dry_run, validate=args.validate, selector=selector_from_args(args),
+                    normalize_uploads=args.normalize_uploads)
+        print_status(queue, args.run_id)
+        return 0
+
+    if args.command == 'status':
+        print_status(queue, args.run_id)
+        return 0
+
+    kinds = [k.strip() for k in args.kinds.split(',') if k.strip()]
+    unknown = set(kinds) - set(TASK_KINDS)
+    if unknown:
+        parser.error(f"Unknown task kinds: {', '.join(sorted(unknown))}")
+
+    work_args = (args.queue, args.run_id, kinds, args.poll_interval, args.exit_when_idle)
+    if args.processes <= 1:
+        _work(*work_args)
+    else:
+        processes = [multiprocessing.Process(target=_work, args=work_args, name=f"task-worker-{i}")
+                     for i in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    print_status(queue, args.run_id)
+    failed = sum(states.get("failed", 0) for states in queue.counts(args.run_id).values())
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+BBB Targets
+===========
+Fan one collection pass out to several BBB regions. Each source is
+downloaded and parsed once. The records are then projected per target,
+which re-stamps ``BBB ID``/``Agency ID``, applies the target's per-board
+mappings and drops records outside the target's filters. Targets upload
+in parallel, up to ``max_parallel`` at a time, each holding one of the
+run's global upload slots (``gate``) while it sends. A target whose filters leave
+no records has nothing to upload, which counts as success.
+
+Targets are read from a JSON file (e.g. ``config/bbb_targets.json``):
+
+    {
+      "targets": [
+        {"name": "dc", "bbb_id": "0241", "agency_id": "3838"},
+        {"name": "richmond", "bbb_id": "<bbb id>", "agency_id": "<agency id>",
+         "collectors": ["dpor"],
+         "boards": ["VA - DPOR - Real Estate Board", "VA - DPOR - Board for Contractors*"],
+         "zip_prefixes": ["230", "231", "232"],
+         "statuses": ["Active"],
+         "mappings": {
+           "VA - DPOR - Real Estate Board": {"Agency ID": "<agency id>", "TOB ID": "<tob id>"}
+         }}
+      ]
+    }
+
+- ``fields``: values set on every record of the target
+- ``mappings``: per-board (source ``Agency Name``) field overrides
+- ``boards``: fnmatch patterns on the source ``Agency Name`` (case-insensitive)
+- ``zip_prefixes`` / ``statuses``: keep only matching ZIP codes / license statuses
+- ``collectors``: collectors the target applies to (default: all)
+"""
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from fnmatch import fnmatchcase
+from itertools import chain
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TARGETS_PATH = Path("config") / "bbb_targets.json"
+
+# Target uploads running at once within one collector's fan-out
+DEFAULT_TARGET_PARALLEL = 4
+
+
+class BBBTarget:
+    """One BBB region's view of the collected records"""
+
+    def __init__(self, bbb_id: str, agency_id: str = "", name: Optional[str] = None,
+                 fields: Optional[Dict] = None, mappings: Optional[Dict[str, Dict]] = None,
+                 boards: Optional[List[str]] = None, zip_prefixes: Optional[List[str]] = None,
+                 statuses: Optional[List[str]] = None, collectors: Optional[List[str]] = None):
+        """
+        Initialize a target.
+
+        Args:
+            bbb_id: BBB ID stamped on the target's records
+            agency_id: Agency ID stamped on the target's records ("" keeps the source value)
+            name: Label for logs (default: bbb_id)
+            fields: Extra field values set on every record
+            mappings: Source Agency Name -> field overrides for that board
+            boards: Only keep boards whose Agency Name matches one of these patterns
+            zip_prefixes: Only keep records whose ZIP starts with one of these
+            statuses: Only keep records with one of these license statuses
+            collectors: Collectors this target applies to (None = all)
+        """
+        self.bbb_id = bbb_id
+        self.agency_id = agency_id
+        self.name = name or bbb_id
+        self.fields = {"BBB ID": bbb_id}
+        if agency_id:
+            self.fields["Agency ID"] = agency_id
+        self.fields.update(fields or {})
+        self.mappings = mappings or {}
+        self.boards = [pattern.lower() for pattern in boards] if boards else None
+        self.zip_prefixes = tuple(zip_prefixes) if zip_prefixes else None
+        self.statuses = {status.strip().lower() for status in statuses} if statuses else None
+        self.collectors = set(collectors) if collectors else None
+
+        # Agency Name -> merged overrides, or None if the board is filtered out
+        self._boards: Dict[str, Optional[Dict]] = {}
+
+    @classmethod
+    def from_dict(cls, config: Dict) -> "BBBTarget":
+        if not config.get("bbb_id"):
+            raise ValueError(f"BBB target is missing bbb_id: {config}")
+        return cls(bbb_id=str(config["bbb_id"]), agency_id=str(config.get("agency_id", "")),
+                   name=config.get("name"), fields=config.get("fields"),
+                   mappings=config.get("mappings"), boards=config.get("boards"),
+                   zip_prefixes=config.get("zip_prefixes"), statuses=config.get("statuses"),
+                   collectors=config.get("collectors"))
+
+    def __repr__(self) -> str:
+        return f"BBBTarget({self.name!r}, bbb_id={self.bbb_id!r})"
+
+    def applies_to(self, collector: str) -> bool:
+        return self.collectors is None or collector in self.collectors
+
+    def _board(self, agency_name: str) -> Optional[Dict]:
+        overrides = self._boards.get(agency_name, False)
+        if overrides is False:
+            if self.boards is not None and not any(fnmatchcase(agency_name.lower(), pattern)
+                                                   for pattern in self.boards):
+                overrides = None
+            else:
+                overrides = dict(self.fields, **self.mappings.get(agency_name, {}))
+            self._boards[agency_name] = overrides
+        return overrides
+
+    def project(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Yield the target's copy of each record it keeps.
+
+        Source records are never modified, so several targets can project the
+        same collected data at once.
+        """
+        board = self._board
+        zip_prefixes = self.zip_prefixes
+        statuses = self.statuses
+        for r in records:
+            overrides = board(r.get("Agency Name") or "")
+            if overrides is None:
+                continue
+            if zip_prefixes and not (r.get("Zip") or "").startswith(zip_prefixes):
+                continue
+            if statuses and (r.get("License Status") or "").strip().lower() not in statuses:
+                continue
+            projected = dict(r)
+            projected.update(overrides)
+            yield projected
+
+
+def load_targets(path: Optional[str] = None) -> List[BBBTarget]:
+    """Read BBB targets from a JSON file ({"targets": [...]} or a bare list)."""
+    path = Path(path) if path else DEFAULT_TARGETS_PATH
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    entries = config["targets"] if isinstance(config, dict) else config
+    targets = [BBBTarget.from_dict(entry) for entry in entries]
+    names = [t.name for t in targets]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate BBB target names in {path}: {names}")
+    logger.info(f"Loaded {len(targets)} BBB target(s) from {path}: {', '.join(names)}")
+    return targets
+
+
+def upload_to_targets(records: Iterable[Dict], targets: List[BBBTarget], dry_run: bool = False,
+                      max_parallel: int = DEFAULT_TARGET_PARALLEL,
+                      uploader_options: Optional[Dict] = None, gate=None) -> Dict[str, Dict]:
+    """
+    Upload one record set to several BBB targets in parallel.
+
+    Args:
+        records: Collected records; must be re-iterable (e.g. a list)
+        targets: BBB targets
+        dry_run: If True, don't actually upload data
+        max_parallel: Target uploads running at the same time
+        uploader_options: Extra VKBulkUploader options (e.g. deadline, hedge)
+        gate: Optional semaphore of global upload slots; each target upload
+            holds one slot while it sends
+
+    Returns:
+        Target name -> upload statistics (see VKBulkUploader.upload_stream);
+        a target with no records after projection succeeds with a total of 0
+    """
+    from src.utils.upload_api import VKBulkUploader
+
+    def upload(target: BBBTarget) -> Dict:
+        try:
+            projected = target.project(records)
+            first = next(projected, None)
+            if first is None:
+                logger.info(f"BBB target {target.name}: no records match its filters; nothing to upload")
+                return {"success": True, "total": 0, "uploaded": 0}
+            with gate or nullcontext():
+                logger.info(f"Uploading to BBB target {target.name} (BBB ID {target.bbb_id})")
+                return VKBulkUploader(dry_run=dry_run, **(uploader_options or {})).upload_stream(
+                    chain((first,), projected))
+        except Exception as e:
+            logger.error(f"Upload to BBB target {target.name} failed: {e}", exc_info=True)
+            return {"success": False, "total": 0, "uploaded": 0, "error": str(e)}
+
+    workers = max(1, min(max_parallel, len(targets)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bbb-upload") as pool:
+        results = dict(zip([t.name for t in targets], pool.map(upload, targets)))
+
+    for name, result in results.items():
+        status = "✅" if result["success"] else "❌"
+        logger.info(f"  {status} {name}: {result.get('uploaded', 0):,} of {result.get('total', 0):,} records uploaded")
+    return results
+
+
+def add_target_arguments(parser):
+    """Add the shared --bbb-targets option to an argparse parser."""
+    parser.add_argument('--bbb-targets', default=None, metavar='PATH',
+                        help=f'Upload to every BBB target in this JSON file (e.g. {DEFAULT_TARGETS_PATH}) '
+                             'instead of only the collector\'s own BBB')
+
+
+def targets_from_args(args) -> Optional[List[BBBTarget]]:
+    """BBB targets for parsed options, or None for a single-BBB run."""
+    path = getattr(args, 'bbb_targets', None)
+    return load_targets(path) if path else None
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Run Checkpoints
+===============
+Per-run, per-collector progress manifest so a crashed collection can resume
+where it stopped instead of starting over at link discovery.
+
+Each run lives in ``data/runs/<run-id>/<collector>/``:
+
+- ``manifest.json``: discovered dataset targets and each dataset's state
+  (downloaded -> processed -> uploaded), rewritten atomically on every change
+- ``raw/<dataset>.txt``: downloaded source files
+- ``records/<dataset>.jsonl.gz``: processed records (see record_io.py)
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RUNS_DIR = Path("data") / "runs"
+
+DOWNLOADED = "downloaded"
+PROCESSED = "processed"
+UPLOADED = "uploaded"
+
+# Dataset states in pipeline order
+STATES = (DOWNLOADED, PROCESSED, UPLOADED)
+
+
+def new_run_id() -> str:
+    """Timestamped run id, e.g. 20250419_031500."""
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
+class RunCheckpoint:
+    """Progress manifest for one collector in one run"""
+
+    def __init__(self, run_id: str, collector: str, runs_dir: Optional[str] = None,
+                 resume: bool = False):
+        """
+        Open (or create) a run checkpoint.
+
+        Args:
+            run_id: Run identifier
+            collector: Collector name; each collector gets its own manifest
+            runs_dir: Root directory for runs (default: data/runs)
+            resume: Require an existing manifest instead of starting a new run
+
+        Raises:
+            FileNotFoundError: resume=True and the run has no manifest
+        """
+        self.run_id = run_id
+        self.collector = collector
+        self.run_dir = Path(runs_dir or DEFAULT_RUNS_DIR) / run_id / collector
+        self.manifest_path = self.run_dir / "manifest.json"
+
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+            counts = self.counts()
+            logger.info(f"Resuming run {run_id} ({collector}): "
+                        + (", ".join(f"{n} {state}" for state, n in counts.items()) or "nothing done yet"))
+        elif resume:
+            raise FileNotFoundError(f"No checkpoint for run {run_id} ({collector}) at {self.manifest_path}")
+        else:
+            self.manifest = {"run_id": run_id, "collector": collector,
+                             "created": datetime.now().isoformat(), "targets": None, "datasets": {}}
+            self.save()
+
+    @property
+    def targets(self) -> Optional[List[Tuple[str, str]]]:
+        """Dataset (code, url) targets recorded by the run, or None before discovery."""
+        targets = self.manifest["targets"]
+        return [tuple(t) for t in targets] if targets is not None else None
+
+    def set_targets(self, targets: List[Tuple[str, str]]):
+        """Record the run's dataset targets so a resume skips link discovery."""
+        self.manifest["targets"] = [list(t) for t in targets]
+        self.save()
+
+    def state(self, dataset: str) -> Optional[str]:
+        entry = self.manifest["datasets"].get(dataset)
+        return entry["state"] if entry else None
+
+    def reached(self, dataset: str, state: str) -> bool:
+        """True if the dataset has completed the given state (or a later one)."""
+        current = self.state(dataset)
+        return current is not None and STATES.index(current) >= STATES.index(state)
+
+    def mark(self, dataset: str, state: str, **info):
+        """Advance a dataset to a new state, storing extra info (e.g. record counts)."""
+        entry = self.manifest["datasets"].setdefault(dataset, {})
+        entry.update(info)
+        entry["state"] = state
+        entry["updated"] = datetime.now().isoformat()
+        self.save()
+
+    def counts(self) -> Dict[str, int]:
+        """Number of datasets in each state."""
+        counts = {state: 0 for state in STATES}
+        for entry in self.manifest["datasets"].values():
+            counts[entry["state"]] += 1
+        return {state: n for state, n in counts.items() if n}
+
+    def raw_path(self, dataset: str) -> Path:
+        return self.run_dir / "raw" / f"{dataset}.txt"
+
+    def records_path(self, dataset: str) -> Path:
+        return self.run_dir / "records" / f"{dataset}.jsonl.gz"
+
+    def save(self):
+        """Write the manifest atomically."""
+        self.run_dir.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def add_checkpoint_arguments(parser):
+    """Add the shared --checkpoint/--resume options to an argparse parser."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--checkpoint', action='store_true',
+                       help='Save per-dataset progress so a failed run can be resumed')
+    group.add_argument('--resume', default=None, metavar='RUN_ID',
+                       help='Resume a checkpointed run, skipping datasets already done')
+    parser.add_argument('--runs-dir', default=None,
+                        help=f'Directory for run checkpoints (default: {DEFAULT_RUNS_DIR})')
+
+
+def run_id_from_args(args) -> Optional[str]:
+    """Run id to checkpoint under: the resumed run, a new one, or None if checkpointing is off."""
+    if args.resume:
+        return args.resume
+    if args.checkpoint:
+        return new_run_id()
+    return None
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Dataset Selection and Sharding
+==============================
+Chooses which datasets a collector run processes:
+
+- include/exclude by dataset code or glob pattern (e.g. ``0225*`` for one board)
+- ``--shard i/N`` splits datasets across N worker nodes
+
+Shard assignment uses rendezvous hashing on the dataset code alone, with
+equal shard weights. It depends on nothing but the code, so every node
+computes the same split without sharing any state, and adding or removing a
+dataset never moves another one.
+
+Size balancing is opt-in: ``--shard`` with ``--dataset-sizes PATH`` reads
+one size file that every node must share (e.g. on a shared volume). Datasets
+in the file are placed largest first by weighted rendezvous, each shard
+weighted by the bytes it still lacks from an equal share, so shard loads end
+up within a few percent. Every node reads the same file, so every node
+computes the same plan. Datasets missing from
+the file fall back to the code hash. Sharded runs never write to the shared
+file (their sizes go to the collector's own history), so it cannot change
+under a running split; unsharded runs with ``--dataset-sizes`` refresh it.
+"""
+
+import hashlib
+import json
+import logging
+import math
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES_PATH = Path("data") / "dataset_sizes.json"
+
+
+def parse_shard(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """Parse an "i/N" shard spec (0-based i) into (i, N)."""
+    if not value:
+        return None
+    try:
+        index, count = (int(part) for part in value.split('/', 1))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected i/N (e.g. 0/4)")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{value}': need 0 <= i < N")
+    return index, count
+
+
+def stable_hash(key: str) -> int:
+    """Hash that is identical across processes and hosts (unlike hash())."""
+    return int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big')
+
+
+def rendezvous_shard(code: str, count: int, weights: Optional[List[float]] = None) -> int:
+    """
+    Shard with the highest weighted rendezvous score for a dataset.
+
+    Args:
+        code: Dataset code (the only input hashed)
+        count: Number of shards
+        weights: Relative shard weights (default: all equal)
+    """
+    best, best_score = 0, -math.inf
+    for shard in range(count):
+        # Uniform in (0, 1); -w/ln(u) is the weighted rendezvous score
+        u = (stable_hash(f"{code}:{shard}") + 1) / (2 ** 64 + 1)
+        score = -(weights[shard] if weights else 1.0) / math.log(u)
+        if score > best_score:
+            best, best_score = shard, score
+    return best
+
+
+def balanced_shards(sizes: Dict[str, int], count: int) -> Dict[str, int]:
+    """
+    Assign sized datasets to shards so every shard gets about the same bytes.
+
+    Datasets are placed largest first (ties by code) by weighted rendezvous,
+    each shard weighted by the bytes it still lacks from an equal share. A
+    shard the dataset would overfill by more than it fills gets (almost) no
+    weight. The result depends only on sizes, so nodes reading the same size
+    file agree.
+
+    Args:
+        sizes: Size in bytes per dataset code
+        count: Number of shards
+
+    Returns:
+        Dataset code -> shard index
+    """
+    share = sum(sizes.values()) / count
+    # Floor keeps full shards eligible, so oversized datasets still land somewhere
+    floor = share * 1e-9 or 1.0
+    loads = [0] * count
+    assignment = {}
+    for code, size in sorted(sizes.items(), key=lambda item: (-item[1], item[0])):
+        shard = rendezvous_shard(code, count, [max(share - load - size / 2, 0) + floor for load in loads])
+        loads[shard] += size
+        assignment[code] = shard
+    return assignment
+
+
+class DatasetSizeHistory:
+    """Last observed download size per dataset, stored as JSON"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path) if path else DEFAULT_SIZES_PATH
+        self.sizes: Dict[str, int] = self._load()
+
+    def _load(self) -> Dict[str, int]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return {k: int(v) for k, v in json.load(f).items()}
+        except Exception as e:
+            logger.warning(f"Could not read dataset size history {self.path}: {e}")
+            return {}
+
+    def update(self, sizes: Dict[str, int]):
+        """Merge new sizes into the file (re-read first, so other shards' entries survive) and save."""
+        if not sizes:
+            return
+        self.sizes = self._load()
+        self.sizes.update(sizes)
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.sizes, f, indent=2, sort_keys=True)
+        tmp_path.replace(self.path)
+
+
+class DatasetSelector:
+    """Filters dataset codes by include/exclude patterns and shard"""
+
+    def __init__(self, include: Optional[Iterable[str]] = None, exclude: Optional[Iterable[str]] = None,
+                 shard: Optional[Tuple[int, int]] = None, sizes: Optional[Dict[str, int]] = None,
+                 sizes_path: Optional[str] = None):
+        """
+        Args:
+            include: Codes or glob patterns to keep (None keeps everything)
+            exclude: Codes or glob patterns to drop
+            shard: (index, count) to keep only this node's share
+            sizes: Size in bytes per dataset code from the shared size file, to balance shards
+            sizes_path: Shared size file; unsharded runs record new sizes there
+        """
+        self.include = [p.upper() for p in include] if include else None
+        self.exclude = [p.upper() for p in exclude] if exclude else []
+        self.shard = shard
+        self.sizes = sizes or {}
+        self.sizes_path = sizes_path
+
+    @property
+    def is_noop(self) -> bool:
+        return self.include is None and not self.exclude and (self.shard is None or self.shard[1] == 1)
+
+    def matches(self, code: str) -> bool:
+        """True if a dataset code passes the include/exclude patterns."""
+        code = code.upper()
+        if self.include is not None and not any(fnmatchcase(code, p) for p in self.include):
+            return False
+        return not any(fnmatchcase(code, p) for p in self.exclude)
+
+    def assign_shards(self, codes: List[str]) -> Dict[str, int]:
+        """
+        Map each dataset code to a shard index.
+
+        Without sizes, a dataset's shard is its rendezvous hash alone. With
+        sizes (the shared size file), datasets in the file that pass the
+        include/exclude patterns are balanced by size; the plan covers the
+        file rather than this node's link list, so nodes agree even if their
+        link lists differ.
+        """
+        count = self.shard[1] if self.shard else 1
+        balanced = {}
+        if self.sizes and count > 1:
+            balanced = balanced_shards({c: n for c, n in self.sizes.items() if self.matches(c)}, count)
+        return {code: balanced[code] if code in balanced else rendezvous_shard(code, count)
+                for code in codes}
+
+    def select(self, codes: Iterable[str]) -> List[str]:
+        """Return the codes this run should process, preserving input order."""
+        codes = list(codes)
+        selected = [c for c in codes if self.matches(c)]
+
+        if self.shard and self.shard[1] > 1:
+            # Assign over the full filtered set so every node computes the same split
+            assignment = self.assign_shards(sorted(set(selected)))
+            selected = [c for c in selected if assignment[c] == self.shard[0]]
+
+        logger.info(f"Selected {len(selected)} of {len(codes)} datasets"
+                    + (f" (shard {self.shard[0]}/{self.shard[1]})" if self.shard else ""))
+        return selected
+
+
+def add_selection_arguments(parser):
+    """Add the shared dataset selection options to an argparse parser."""
+    parser.add_argument('--include', action='append', default=None, metavar='PATTERN',
+                        help='Only process datasets matching code/glob (repeatable, e.g. 0225*)')
+    parser.add_argument('--exclude', action='append', default=None, metavar='PATTERN',
+                        help='Skip datasets matching code/glob (repeatable)')
+    parser.add_argument('--shard', default=None, metavar='i/N',
+                        help='Process only shard i of N (0-based), by a stable hash of the dataset code')
+    parser.add_argument('--dataset-sizes', default=None, metavar='PATH',
+                        help='Shared dataset size file: with --shard, balance shards by size (every node '
+                             'must read the same file); without --shard, record download sizes in it')
+
+
+def shared_sizes(path: str, shard: Optional[Tuple[int, int]]) -> Optional[Dict[str, int]]:
+    """
+    Sizes for size-balanced sharding from the shared size file (None if not sharding).
+
+    Raises:
+        FileNotFoundError: The file does not exist or holds no sizes; nodes would disagree
+    """
+    if not shard or shard[1] == 1:
+        return None
+    sizes = DatasetSizeHistory(path).sizes
+    if not sizes:
+        raise FileNotFoundError(f"Dataset size file {path} is missing or empty; run once without --shard "
+                                f"to record sizes, or drop --dataset-sizes to shard by code alone")
+    digest = hashlib.sha1(json.dumps(sizes, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    # Compare across nodes: the same fingerprint means the same split
+    logger.info(f"Balancing shards by {len(sizes)} dataset sizes from {path} (fingerprint {digest})")
+    return sizes
+
+
+def selector_from_args(args) -> Optional[DatasetSelector]:
+    """Build a DatasetSelector from parsed options, or None if no selection was requested."""
+    shard = parse_shard(args.shard)
+    if not args.include and not args.exclude and not shard and not args.dataset_sizes:
+        return None
+    sizes = shared_sizes(args.dataset_sizes, shard) if args.dataset_sizes else None
+    return DatasetSelector(include=args.include, exclude=args.exclude, shard=shard, sizes=sizes,
+                           sizes_path=args.dataset_sizes)
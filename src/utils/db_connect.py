@@ -65,15 +65,23 @@ def get_connection():
     )
 
 
-def PGconnection():
-    """Legacy PGconnection function that returns SQLAlchemy engine for sessionmaker compatibility"""
+def PGconnection(pool_size=None):
+    """
+    Legacy PGconnection function that returns SQLAlchemy engine for sessionmaker compatibility
+
+    Args:
+        pool_size: Optional hard cap on pooled connections (no overflow)
+    """
     config = get_db_connection()
 
     # Create SQLAlchemy engine URL
     db_url = f"postgresql://{config['user']}:{config['password']}@{config['host']}:{config['port']}/{config['database']}"
 
-    # Return SQLAlchemy engine for use with sessionmaker
-    return create_engine(db_url)
+    # Return SQLAlchemy engine for use with sessionmaker; pooled connections are
+    # checked before use so long-lived processes survive server-side timeouts
+    if pool_size:
+        return create_engine(db_url, pool_size=pool_size, max_overflow=0, pool_pre_ping=True)
+    return create_engine(db_url, pool_pre_ping=True)
 
 
 # For backward compatibility
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Stage Deadlines and Hedged Requests
+===================================
+Bounds how long a run can take, and how much one slow request can hold it up.
+
+A RunBudget is a deadline for the whole run, split across stages by share
+(see DEFAULT_SHARES). A stage's deadline is fixed when the stage starts. It
+gets its share of the time still left, measured against the stages not yet
+started, so time a fast stage leaves unused passes to the later ones:
+
+    stage budget = remaining * share / (share + shares of stages not started)
+
+Calls made inside a stage take the stage Deadline. Every request timeout is
+capped at the time it has left, and once it expires the remaining work is
+skipped rather than started. Skipped downloads or uploads fail the dataset or
+batch, so a checkpointed run can resume them.
+
+A HedgePolicy tracks the latency of a kind of call (for example a file
+download). When a call runs past the tracked percentile (p95 by default), it
+starts a duplicate. The first successful response wins. The other attempt is
+cancelled through its CancelToken, which closes its connection, and a ranged
+download keeps its finished parts on disk. Downloads are GETs and are hedged
+by default. Uploads are only hedged on request (``--hedge-uploads``),
+because a duplicate POST can store a batch twice unless the API ignores
+repeats.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional
+
+from src.utils.log_setup import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+# Share of the run budget per stage; other stages (e.g. csv) are bound by the run deadline only
+DEFAULT_SHARES = {"links": 0.05, "download": 0.45, "process": 0.2, "validate": 0.05, "upload": 0.25}
+
+
+class DeadlineExceeded(Exception):
+    """A stage or run ran out of time"""
+
+
+class Cancelled(Exception):
+    """An attempt was cancelled because another attempt won (or the caller gave up)"""
+
+
+class Deadline:
+    """A point in time by which work must finish, optionally bounded by a parent deadline"""
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional["Deadline"] = None, name: str = "run"):
+        """
+        Args:
+            seconds: Time from now (None = no limit of its own)
+            parent: Enclosing deadline; this one never ends later than its parent
+            name: Label for logs and errors
+        """
+        self.name = name
+        at = time.monotonic() + seconds if seconds is not None else None
+        if parent is not None and parent.at is not None:
+            at = parent.at if at is None else min(at, parent.at)
+        self.at = at
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None if unlimited."""
+        return None if self.at is None else max(0.0, self.at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.at is not None and time.monotonic() >= self.at
+
+    def check(self):
+        """Raise DeadlineExceeded if the deadline has passed."""
+        if self.expired:
+            raise DeadlineExceeded(f"{self.name} deadline reached")
+
+    def timeout(self, default: float) -> float:
+        """A request timeout: default, capped at the time left (raises if none is left)."""
+        self.check()
+        remaining = self.remaining()
+        return default if remaining is None else max(0.001, min(default, remaining))
+
+    def __repr__(self):
+        remaining = self.remaining()
+        return f"Deadline({self.name}, {'unlimited' if remaining is None else f'{remaining:.1f}s left'})"
+
+
+class RunBudget:
+    """A run deadline split across stages"""
+
+    def __init__(self, seconds: Optional[float], shares: Optional[Dict[str, float]] = None,
+                 parent: Optional[Deadline] = None, name: str = "run"):
+        """
+        Args:
+            seconds: Time for the whole run (None = only the parent's limit)
+            shares: Stage name -> share of the budget (default: DEFAULT_SHARES)
+            parent: Enclosing deadline, e.g. the orchestrator's run across collectors
+            name: Label for logs
+        """
+        self.deadline = Deadline(seconds, parent=parent, name=name)
+        self.shares = dict(DEFAULT_SHARES if shares is None else shares)
+        self._stages: Dict[str, Deadline] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str) -> Deadline:
+        """The stage's deadline, fixed the first time it is asked for."""
+        with self._lock:
+            if name in self._stages:
+                return self._stages[name]
+            share = self.shares.get(name)
+            remaining = self.deadline.remaining()
+            if share is None or remaining is None:
+                deadline = Deadline(parent=self.deadline, name=name)
+            else:
+                pending = sum(s for stage, s in self.shares.items() if stage not in self._stages)
+                seconds = remaining * share / max(pending, share)
+                deadline = Deadline(seconds, parent=self.deadline, name=name)
+                logger.debug(f"Stage {name}: {seconds:.0f}s of the {remaining:.0f}s left in {self.deadline.name}")
+            self._stages[name] = deadline
+            return deadline
+
+
+class CancelToken:
+    """Cancellation flag for one attempt; cancel() also runs registered callbacks (e.g. closing a connection)"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def register(self, callback: Callable[[], None]):
+        """Call callback on cancel (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug("Cancel callback failed: %s", e)
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+def check_interrupt(deadline: Optional[Deadline] = None, cancel: Optional[CancelToken] = None):
+    """Raise Cancelled or DeadlineExceeded if the attempt should stop."""
+    if cancel is not None:
+        cancel.check()
+    if deadline is not None:
+        deadline.check()
+
+
+class HedgePolicy:
+    """Issues a duplicate of a call that runs past a latency percentile; the first success wins"""
+
+    def __init__(self, name: str = "request", percentile: float = 0.95, window: int = 200,
+                 min_samples: int = 10, initial_delay: Optional[float] = None, min_delay: float = 0.05,
+                 max_hedges: int = 1):
+        """
+        Args:
+            name: Label for logs
+            percentile: Hedge once a call is slower than this fraction of recent calls
+            window: Recent latencies kept
+            min_samples: Don't hedge until this many latencies are known...
+            initial_delay: ...unless this fixed delay is given
+            min_delay: Never hedge sooner than this
+            max_hedges: Duplicates per call
+        """
+        self.name = name
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_hedges = max(0, max_hedges)
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def delay(self) -> Optional[float]:
+        """Seconds after which a call is hedged, or None if not known yet."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(self.percentile * len(ordered)))
+        return max(self.min_delay, ordered[index])
+
+    def call(self, fn: Callable[[CancelToken], object], deadline: Optional[Deadline] = None,
+             hedge_if: Optional[Callable[[], bool]] = None, label: str = ""):
+        """
+        Run fn(cancel_token), hedging it if it is slow.
+
+        Args:
+            fn: The call; it should stop soon after its token is cancelled
+            deadline: Give up (cancelling every attempt) when this passes
+            hedge_if: Checked before each hedge; False keeps the call unhedged
+                (its latency is then not recorded either)
+            label: What is being called, for logs
+
+        Returns:
+            The first successful attempt's result
+
+        Raises:
+            The first attempt's exception if every attempt failed;
+            DeadlineExceeded if the deadline passed first
+        """
+        with self._lock:
+            self.calls += 1
+        delay = self.delay()
+        if self.max_hedges == 0 or delay is None:
+            # Nothing to hedge yet: run inline (fn bounds itself by the deadline)
+            start = time.monotonic()
+            result = fn(CancelToken())
+            if hedge_if is None or hedge_if():
+                self.record(time.monotonic() - start)
+            return result
+
+        tokens = []
+        attempts = {}
+        errors = []
+        first_start = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=1 + self.max_hedges, thread_name_prefix=f"hedge-{self.name}")
+
+        def launch():
+            token = CancelToken()
+            tokens.append(token)
+            future = pool.submit(fn, token)
+            attempts[future] = len(tokens) - 1
+            return future
+
+        running = {launch()}
+        try:
+            while running:
+                timeout = None
+                if len(tokens) <= self.max_hedges:
+                    timeout = max(0.0, first_start + delay * len(tokens) - time.monotonic())
+                if deadline is not None and deadline.at is not None:
+                    remaining = deadline.remaining()
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+
+                done, running = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        if attempts[future] > 0:
+                            with self._lock:
+                                self.hedge_wins += 1
+                            logger.debug("Hedged %s won for %s", self.name, label, extra=RATE_LIMITED)
+                        if hedge_if is None or hedge_if():
+                            # The call's latency from the first attempt: a winning hedge's own
+                            # (shorter) time would pull the percentile down
+                            self.record(time.monotonic() - first_start)
+                        return future.result()
+                    errors.append(future.exception())
+
+                if deadline is not None and deadline.expired:
+                    raise DeadlineExceeded(f"{deadline.name} deadline reached{f' during {label}' if label else ''}")
+                # Timed out waiting: the latest attempt is past the hedge delay
+                if not done and len(tokens) <= self.max_hedges and (hedge_if is None or hedge_if()):
+                    with self._lock:
+                        self.hedged += 1
+                    logger.debug("Hedging %s for %s after %.2fs", self.name, label, delay, extra=RATE_LIMITED)
+                    running.add(launch())
+            raise errors[0]
+        finally:
+            # Stop the stragglers; their threads exit once their connection closes
+            for token in tokens:
+                token.cancel()
+            pool.shutdown(wait=False)
+
+    def summary(self) -> str:
+        delay = self.delay()
+        return (f"{self.name}: {self.hedged} of {self.calls} call(s) hedged, {self.hedge_wins} won by the hedge"
+                + (f" (hedge after {delay:.2f}s)" if delay is not None else ""))
+
+
+def add_deadline_arguments(parser):
+    """Add the shared run budget and hedging options to an argparse parser."""
+    parser.add_argument('--run-budget', type=float, default=None, metavar='MINUTES',
+                        help='Time limit for the run, split across stages; late downloads and uploads '
+                             'are skipped (and resumable with a checkpoint) (default: no limit)')
+    parser.add_argument('--no-hedge', action='store_true',
+                        help="Don't re-issue downloads that run past the p95 latency")
+    parser.add_argument('--hedge-uploads', action='store_true',
+                        help='Also re-issue slow upload batches (only if the API ignores duplicate batches)')
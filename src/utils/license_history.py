@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+License Status History
+======================
+Persistent SQLite index of license status and expiration changes across
+runs, so questions like "which licenses expired, lapsed or were newly issued
+since last week" are indexed lookups instead of diffs of multi-GB CSVs.
+
+Each run is recorded in bulk: the run's records are loaded into a temporary
+table, compared to the last known state of every license with set-based SQL,
+and the differences are appended as transitions:
+
+- ``new``: license not seen before
+- ``status``: License Status changed (e.g. Active -> Expired)
+- ``expiration``: Expiration Date changed (e.g. renewed)
+- ``removed``: license missing from its dataset, when that dataset was collected in this run
+- ``returned``: a removed license appeared again
+
+Licenses are keyed by (source, License Number); the board is the record's
+Agency Name. Each license remembers the dataset it last came from, so a
+partial (--include/--shard/--refresh) run can only remove licenses of the
+datasets it actually processed. Several datasets share a board name (e.g.
+the "VA - DPOR" fallback), so boards cannot scope removals.
+"""
+
+import csv
+import logging
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = Path("data") / "license_history.db"
+
+CHANGE_TYPES = ("new", "status", "expiration", "removed", "returned")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS license_current (
+    source TEXT NOT NULL,
+    license_number TEXT NOT NULL,
+    board TEXT,
+    business_name TEXT,
+    status TEXT,
+    expiration TEXT,
+    present INTEGER NOT NULL DEFAULT 1,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    dataset TEXT,
+    PRIMARY KEY (source, license_number)
+);
+
+CREATE TABLE IF NOT EXISTS license_transitions (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    run_date TEXT NOT NULL,
+    source TEXT NOT NULL,
+    license_number TEXT NOT NULL,
+    board TEXT,
+    business_name TEXT,
+    change TEXT NOT NULL,
+    old_status TEXT,
+    new_status TEXT,
+    old_expiration TEXT,
+    new_expiration TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ix_current_dataset ON license_current (source, dataset, present);
+
+CREATE INDEX IF NOT EXISTS ix_transitions_date ON license_transitions (run_date);
+CREATE INDEX IF NOT EXISTS ix_transitions_board ON license_transitions (board COLLATE NOCASE, run_date);
+CREATE INDEX IF NOT EXISTS ix_transitions_status ON license_transitions (new_status COLLATE NOCASE, run_date);
+CREATE INDEX IF NOT EXISTS ix_transitions_license ON license_transitions (license_number);
+
+CREATE TABLE IF NOT EXISTS history_runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    run_date TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    records INTEGER NOT NULL,
+    transitions INTEGER NOT NULL
+);
+"""
+
+# Transition queries run against the run's records in temp.run_licenses
+_TRANSITION_QUERIES = {
+    "new": """
+        SELECT r.license_number, r.board, r.business_name, NULL, r.status, NULL, r.expiration
+        FROM temp.run_licenses r
+        LEFT JOIN license_current c ON c.source = :source AND c.license_number = r.license_number
+        WHERE c.license_number IS NULL
+    """,
+    "returned": """
+        SELECT r.license_number, r.board, r.business_name, c.status, r.status, c.expiration, r.expiration
+        FROM temp.run_licenses r
+        JOIN license_current c ON c.source = :source AND c.license_number = r.license_number
+        WHERE c.present = 0
+    """,
+    "status": """
+        SELECT r.license_number, r.board, r.business_name, c.status, r.status, c.expiration, r.expiration
+        FROM temp.run_licenses r
+        JOIN license_current c ON c.source = :source AND c.license_number = r.license_number
+        WHERE c.present = 1 AND c.status IS NOT r.status
+    """,
+    "expiration": """
+        SELECT r.license_number, r.board, r.business_name, c.status, r.status, c.expiration, r.expiration
+        FROM temp.run_licenses r
+        JOIN license_current c ON c.source = :source AND c.license_number = r.license_number
+        WHERE c.present = 1 AND c.expiration IS NOT r.expiration
+    """,
+    # Only datasets processed in this run can lose licenses (every dataset with
+    # :complete), so partial runs don't mark everything else as removed
+    "removed": """
+        SELECT c.license_number, c.board, c.business_name, c.status, NULL, c.expiration, NULL
+        FROM license_current c
+        WHERE c.source = :source AND c.present = 1
+          AND (:complete OR c.dataset IN (SELECT dataset FROM temp.run_datasets))
+          AND NOT EXISTS (SELECT 1 FROM temp.run_licenses r WHERE r.license_number = c.license_number)
+    """,
+}
+
+
+class LicenseHistory:
+    """Change-tracking index of license status and expiration"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open (or create) the history database.
+
+        Args:
+            path: SQLite file (default: data/license_history.db)
+        """
+        self.path = Path(path) if path else DEFAULT_HISTORY_PATH
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=60)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        # Databases created before licenses remembered their dataset
+        columns = [row["name"] for row in self.conn.execute("PRAGMA table_info(license_current)")]
+        if columns and "dataset" not in columns:
+            self.conn.execute("ALTER TABLE license_current ADD COLUMN dataset TEXT")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def record_run(self, records: Iterable[Dict], source: str = "dpor",
+                   run_date: Optional[str] = None, complete: bool = False) -> Dict[str, int]:
+        """
+        Record one run's records without dataset information.
+
+        Without datasets no license can be scoped, so none is marked removed
+        unless the records cover the whole source.
+
+        Args:
+            records: Standardized records (streamed, not held in memory)
+            source: Collector name the records came from
+            run_date: Date of the run (default: today, YYYY-MM-DD)
+            complete: The records cover every dataset of the source; licenses
+                missing from them are recorded as removed
+
+        Returns:
+            Number of transitions per change type
+        """
+        return self.record_datasets([(None, records)], source=source, run_date=run_date, complete=complete)
+
+    def record_datasets(self, dataset_records: Iterable[Tuple[Optional[str], Iterable[Dict]]],
+                        source: str = "dpor", run_date: Optional[str] = None,
+                        complete: bool = False) -> Dict[str, int]:
+        """
+        Record one run's records and append the transitions since the last run.
+
+        Only licenses last seen in one of the run's datasets can be marked
+        removed, so a partial run leaves the other datasets alone.
+
+        Args:
+            dataset_records: (dataset code, records) pairs for the datasets this
+                run processed; records are streamed, not held in memory
+            source: Collector name the records came from
+            run_date: Date of the run (default: today, YYYY-MM-DD)
+            complete: The run covers every dataset of the source
+
+        Returns:
+            Number of transitions per change type
+        """
+        run_date = run_date or date.today().isoformat()
+        start = time.perf_counter()
+        params = {"source": source, "complete": int(complete)}
+        conn = self.conn
+        datasets = set()
+
+        def rows():
+            for dataset, records in dataset_records:
+                if dataset is not None:
+                    datasets.add(dataset)
+                for r in records:
+                    if r.get("License Number"):
+                        yield (r["License Number"], dataset, r.get("Agency Name"), r.get("Business Name"),
+                               r.get("License Status"), r.get("Expiration Date"))
+
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS temp.run_licenses")
+            conn.execute("DROP TABLE IF EXISTS temp.run_datasets")
+            conn.execute("""
+                CREATE TEMP TABLE run_licenses (
+                    license_number TEXT PRIMARY KEY,
+                    dataset TEXT, board TEXT, business_name TEXT, status TEXT, expiration TEXT
+                )
+            """)
+            conn.execute("CREATE TEMP TABLE run_datasets (dataset TEXT PRIMARY KEY)")
+            # Duplicate license numbers within a run: the last record wins
+            conn.executemany("INSERT OR REPLACE INTO temp.run_licenses VALUES (?, ?, ?, ?, ?, ?)", rows())
+            conn.executemany("INSERT INTO temp.run_datasets VALUES (?)", ((d,) for d in datasets))
+            record_count = conn.execute("SELECT COUNT(*) FROM temp.run_licenses").fetchone()[0]
+
+            run_id = conn.execute(
+                "INSERT INTO history_runs (source, run_date, recorded_at, records, transitions) "
+                "VALUES (?, ?, ?, ?, 0)",
+                (source, run_date, datetime.now().isoformat(), record_count)
+            ).lastrowid
+
+            counts = {}
+            for change in ("new", "returned", "status", "expiration", "removed"):
+                cursor = conn.execute(f"""
+                    INSERT INTO license_transitions
+                        (run_id, run_date, source, change, license_number, board, business_name,
+                         old_status, new_status, old_expiration, new_expiration)
+                    SELECT :run_id, :run_date, :source, :change, * FROM ({_TRANSITION_QUERIES[change]})
+                """, dict(params, run_id=run_id, run_date=run_date, change=change))
+                counts[change] = cursor.rowcount
+
+            conn.execute("""
+                UPDATE license_current SET present = 0
+                WHERE source = :source AND present = 1
+                  AND (:complete OR dataset IN (SELECT dataset FROM temp.run_datasets))
+                  AND NOT EXISTS (SELECT 1 FROM temp.run_licenses r
+                                  WHERE r.license_number = license_current.license_number)
+            """, params)
+            conn.execute("""
+                INSERT INTO license_current
+                    (source, license_number, board, business_name, status, expiration, present,
+                     first_seen, last_seen, dataset)
+                SELECT :source, license_number, board, business_name, status, expiration, 1,
+                       :run_date, :run_date, dataset
+                FROM temp.run_licenses WHERE true
+                ON CONFLICT (source, license_number) DO UPDATE SET
+                    board = excluded.board, business_name = excluded.business_name,
+                    status = excluded.status, expiration = excluded.expiration,
+                    present = 1, last_seen = excluded.last_seen,
+                    dataset = COALESCE(excluded.dataset, license_current.dataset)
+            """, dict(params, run_date=run_date))
+
+            conn.execute("UPDATE history_runs SET transitions = ? WHERE id = ?",
+                         (sum(counts.values()), run_id))
+            conn.execute("DROP TABLE temp.run_licenses")
+            conn.execute("DROP TABLE temp.run_datasets")
+
+        logger.info(f"License history: {record_count:,} licenses from {source} on {run_date}, "
+                    + ", ".join(f"{n:,} {change}" for change, n in counts.items())
+                    + f" ({time.perf_counter() - start:.1f}s)")
+        return counts
+
+    def transitions(self, since: Optional[str] = None, until: Optional[str] = None,
+                    board: Optional[str] = None, status: Optional[str] = None,
+                    change: Optional[str] = None, license_number: Optional[str] = None,
+                    source: Optional[str] = None, limit: Optional[int] = None,
+                    board_substring: bool = False) -> List[Dict]:
+        """
+        Query recorded transitions.
+
+        Args:
+            since: First run date to include (YYYY-MM-DD)
+            until: Last run date to include (YYYY-MM-DD)
+            board: Start of the board (Agency Name), case-insensitive; a full name
+                matches that board
+            board_substring: Match board anywhere in the name instead (a full scan,
+                since the board index only serves prefixes)
+            status: New status, case-insensitive (e.g. "Expired")
+            change: One of CHANGE_TYPES
+            license_number: Only this license
+            source: Only this collector
+            limit: Maximum rows (newest first)
+
+        Returns:
+            Transition dicts, newest first
+        """
+        query = "SELECT * FROM license_transitions WHERE 1 = 1"
+        params = []
+        if board:
+            # LIKE is case-insensitive already; a pattern not starting with a wildcard
+            # becomes a range search on ix_transitions_board (NOCASE)
+            board = re.sub(r"([%_\\])", r"\\\1", board) + "%"
+            if board_substring:
+                board = "%" + board
+        for clause, value in (("run_date >= ?", since), ("run_date <= ?", until),
+                              ("board LIKE ? ESCAPE '\\'", board or None),
+                              ("new_status = ? COLLATE NOCASE", status), ("change = ?", change),
+                              ("license_number = ?", license_number), ("source = ?", source)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        query += " ORDER BY run_date DESC, id DESC"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def current(self, license_number: str, source: str = "dpor") -> Optional[Dict]:
+        """Last known state of a license."""
+        row = self.conn.execute(
+            "SELECT * FROM license_current WHERE source = ? AND license_number = ?",
+            (source, license_number)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def runs(self, limit: int = 20) -> List[Dict]:
+        """Most recent recorded runs."""
+        return [dict(row) for row in self.conn.execute(
+            "SELECT * FROM history_runs ORDER BY id DESC LIMIT ?", (limit,))]
+
+
+def add_history_arguments(parser):
+    """Add the shared --track-changes options to an argparse parser."""
+    parser.add_argument('--track-changes', action='store_true',
+                        help='Record license status/expiration changes in the history index')
+    parser.add_argument('--history-db', default=None,
+                        help=f'License history database (default: {DEFAULT_HISTORY_PATH})')
+
+
+def _read_csv(path: str) -> Iterable[Dict]:
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.utils.log_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='License status change history')
+    parser.add_argument('--db', default=str(DEFAULT_HISTORY_PATH),
+                        help=f'History database (default: {DEFAULT_HISTORY_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record = subparsers.add_parser('record', help='Record a run from a collector CSV or records file')
+    record.add_argument('file', help='CSV from save_to_csv, or a .jsonl.gz records spill file')
+    record.add_argument('--source', default='dpor', help='Collector name (default: dpor)')
+    record.add_argument('--date', default=None, help='Run date (default: today)')
+    record.add_argument('--complete', action='store_true',
+                        help='The file covers every dataset; licenses missing from it are recorded as removed')
+
+    query = subparsers.add_parser('query', help='List transitions')
+    query.add_argument('--since', default=None, help='First run date (YYYY-MM-DD)')
+    query.add_argument('--until', default=None, help='Last run date (YYYY-MM-DD)')
+    query.add_argument('--board', default=None,
+                       help='Board (Agency Name) prefix, e.g. "VA - DPOR - Board for Contractors"')
+    query.add_argument('--board-substring', action='store_true',
+                       help='Match --board anywhere in the board name (slower: scans every transition)')
+    query.add_argument('--status', default=None, help='New status, e.g. Expired')
+    query.add_argument('--change', choices=CHANGE_TYPES, default=None, help='Change type')
+    query.add_argument('--license', default=None, help='License number')
+    query.add_argument('--limit', type=int, default=100, help='Maximum rows (default: 100, 0 = all)')
+    query.add_argument('--csv', action='store_true', help='Write results as CSV to stdout')
+
+    subparsers.add_parser('runs', help='List recorded runs')
+
+    args = parser.parse_args()
+    history = LicenseHistory(args.db)
+
+    if args.command == 'record':
+        if args.file.endswith('.jsonl.gz'):
+            from src.utils.record_io import read_records
+            source_records = read_records(args.file)
+        else:
+            source_records = _read_csv(args.file)
+        history.record_run(source_records, source=args.source, run_date=args.date, complete=args.complete)
+
+    elif args.command == 'query':
+        start = time.perf_counter()
+        rows = history.transitions(since=args.since, until=args.until, board=args.board,
+                                   status=args.status, change=args.change,
+                                   license_number=args.license, limit=args.limit,
+                                   board_substring=args.board_substring)
+        if args.csv:
+            import sys
+            writer = csv.writer(sys.stdout)
+            writer.writerow(rows[0].keys() if rows else [])
+            writer.writerows(row.values() for row in rows)
+        else:
+            for row in rows:
+                print(f"{row['run_date']}  {row['change']:<10} {row['license_number']:<14} "
+                      f"{row['old_status'] or '-'} -> {row['new_status'] or '-'}  "
+                      f"exp {row['old_expiration'] or '-'} -> {row['new_expiration'] or '-'}  "
+                      f"{row['board'] or ''}")
+        logger.info(f"{len(rows)} transition(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    else:
+        for run in history.runs():
+            print(f"{run['run_date']}  {run['source']:<10} {run['records']:>10,} licenses  "
+                  f"{run['transitions']:>8,} transitions  (recorded {run['recorded_at']})")
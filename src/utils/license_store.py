@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Embedded License Store
+======================
+Queryable SQLite copy of collector output, so lookups by license number,
+business name or ZIP take milliseconds instead of re-reading a CSV from
+``data/``.
+
+The ``licenses`` table follows the standardized record schema (see README,
+Data Format) with snake_case column names, plus:
+
+- ``source``: collector name
+- ``name_key``: normalized business name (upper case, punctuation removed)
+- ``zip5``: first five digits of the ZIP code
+
+Loads are bulk: records are inserted into a fresh staging table, indexes are
+built once at the end, and the staging table replaces ``licenses`` in one
+transaction. Rows from other collectors, and from boards not collected in this
+run (``--include``/``--shard``), are carried over unchanged.
+"""
+
+import csv
+import logging
+import re
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = Path("data") / "licenses.db"
+
+# (record field, column) in standardized record order
+RECORD_COLUMNS = (
+    ("Agency Name", "agency_name"),
+    ("BBB ID", "bbb_id"),
+    ("Agency ID", "agency_id"),
+    ("Agency URL", "agency_url"),
+    ("TOB ID", "tob_id"),
+    ("State Established", "state_established"),
+    ("Business Name", "business_name"),
+    ("Street", "street"),
+    ("City", "city"),
+    ("Zip", "zip"),
+    ("Date Established", "date_established"),
+    ("Category", "category"),
+    ("License Number", "license_number"),
+    ("Phone Number", "phone_number"),
+    ("Owner First Name", "owner_first_name"),
+    ("Owner Last Name", "owner_last_name"),
+    ("Expiration Date", "expiration_date"),
+    ("License Status", "license_status"),
+    ("County", "county"),
+)
+
+COLUMNS = ("source",) + tuple(column for _, column in RECORD_COLUMNS) + ("name_key", "zip5")
+
+_INDEXES = (
+    ("license_number", "license_number"),
+    ("name_key", "name_key"),
+    ("zip5", "zip5, name_key"),
+    ("board", "source, agency_name"),
+)
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]+')
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Normalized business name used for name lookups: "Acme, Inc." -> "ACME INC"."""
+    if not name:
+        return ""
+    return _NON_ALNUM.sub(' ', name.upper()).strip()
+
+
+def _zip5(zip_code: Optional[str]) -> str:
+    return zip_code.strip()[:5] if zip_code else ""
+
+
+class LicenseStore:
+    """SQLite store of standardized license records"""
+
+    def __init__(self, path: Optional[str] = None, readonly: bool = False):
+        """
+        Open (or create) the store.
+
+        Args:
+            path: SQLite file (default: data/licenses.db)
+            readonly: Open read-only (for query clients)
+        """
+        self.path = Path(path) if path else DEFAULT_STORE_PATH
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                                        check_same_thread=False)
+        else:
+            self.path.parent.mkdir(exist_ok=True, parents=True)
+            self.conn = sqlite3.connect(str(self.path), timeout=60)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(self._create_sql("licenses"))
+        self.conn.row_factory = sqlite3.Row
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _create_sql(table: str) -> str:
+        columns = ", ".join(f"{column} TEXT" for column in COLUMNS)
+        return f"CREATE TABLE IF NOT EXISTS {table} ({columns}, loaded_at TEXT)"
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def load(self, records: Iterable[Dict], source: str = "dpor") -> int:
+        """
+        Replace a collector's rows with a run's records in one bulk load.
+
+        Args:
+            records: Standardized records (streamed)
+            source: Collector name
+
+        Returns:
+            Number of records loaded
+        """
+        start = time.perf_counter()
+        loaded_at = datetime.now().isoformat()
+        conn = self.conn
+        fields = [field for field, _ in RECORD_COLUMNS]
+
+        def rows():
+            for r in records:
+                values = [r.get(field, "") for field in fields]
+                yield [source] + values + [normalize_name(r.get("Business Name")),
+                                           _zip5(r.get("Zip")), loaded_at]
+
+        placeholders = ", ".join("?" * (len(COLUMNS) + 1))
+        with conn:
+            # sqlite3 only opens a transaction before DML, so open it before the DDL too
+            conn.execute("BEGIN")
+            conn.execute("DROP TABLE IF EXISTS licenses_staging")
+            conn.execute(self._create_sql("licenses_staging"))
+            conn.executemany(f"INSERT INTO licenses_staging VALUES ({placeholders})", rows())
+            count = conn.execute("SELECT COUNT(*) FROM licenses_staging").fetchone()[0]
+
+            # Keep other collectors' rows and boards this run didn't collect
+            conn.execute("""
+                INSERT INTO licenses_staging
+                SELECT * FROM licenses
+                WHERE source != :source
+                   OR agency_name NOT IN (SELECT DISTINCT agency_name FROM licenses_staging)
+            """, {"source": source})
+
+            # Swap and index inside the transaction; readers keep seeing the old table until commit
+            conn.execute("DROP TABLE licenses")
+            conn.execute("ALTER TABLE licenses_staging RENAME TO licenses")
+            for name, columns in _INDEXES:
+                conn.execute(f"CREATE INDEX ix_licenses_{name} ON licenses ({columns})")
+
+        conn.execute("ANALYZE licenses")
+        logger.info(f"License store: loaded {count:,} {source} records into {self.path} "
+                    f"in {time.perf_counter() - start:.1f}s")
+        return count
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(self, sql: str, params=()) -> List[Dict]:
+        """Run an ad-hoc query and return rows as dicts."""
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def by_license(self, license_number: str) -> List[Dict]:
+        """Records with this license number (usually one)."""
+        return self.query("SELECT * FROM licenses WHERE license_number = ?", (license_number.strip(),))
+
+    def by_name(self, name: str, prefix: bool = False, limit: int = 100) -> List[Dict]:
+        """
+        Records whose normalized business name equals (or starts with) name.
+
+        Prefix matches use the name_key index as a range scan.
+        """
+        key = normalize_name(name)
+        if prefix:
+            return self.query("SELECT * FROM licenses WHERE name_key >= ? AND name_key < ? "
+                              "ORDER BY name_key LIMIT ?", (key, key + "\uffff", limit))
+        return self.query("SELECT * FROM licenses WHERE name_key = ? LIMIT ?", (key, limit))
+
+    def by_zip(self, zip_code: str, status: Optional[str] = None, limit: int = 1000) -> List[Dict]:
+        """Records in a ZIP code, optionally with one license status."""
+        sql = "SELECT * FROM licenses WHERE zip5 = ?"
+        params = [_zip5(zip_code)]
+        if status:
+            sql += " AND license_status = ? COLLATE NOCASE"
+            params.append(status)
+        return self.query(sql + " ORDER BY name_key LIMIT ?", params + [limit])
+
+    def stats(self) -> List[Dict]:
+        """Record counts per source and board."""
+        return self.query("SELECT source, agency_name, COUNT(*) AS records, MAX(loaded_at) AS loaded_at "
+                          "FROM licenses GROUP BY source, agency_name ORDER BY source, agency_name")
+
+
+def add_store_arguments(parser):
+    """Add the shared --load-store options to an argparse parser."""
+    parser.add_argument('--load-store', action='store_true',
+                        help='Load collected records into the embedded license store')
+    parser.add_argument('--store-db', default=None,
+                        help=f'License store database (default: {DEFAULT_STORE_PATH})')
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from src.utils.log_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Query the embedded license store')
+    parser.add_argument('--db', default=str(DEFAULT_STORE_PATH),
+                        help=f'Store database (default: {DEFAULT_STORE_PATH})')
+    parser.add_argument('--csv', action='store_true', help='Write results as CSV to stdout')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    license_cmd = subparsers.add_parser('license', help='Look up a license number')
+    license_cmd.add_argument('number')
+    name_cmd = subparsers.add_parser('name', help='Look up a business name')
+    name_cmd.add_argument('name')
+    name_cmd.add_argument('--prefix', action='store_true', help='Match names starting with NAME')
+    name_cmd.add_argument('--limit', type=int, default=100)
+    zip_cmd = subparsers.add_parser('zip', help='List licenses in a ZIP code')
+    zip_cmd.add_argument('zip')
+    zip_cmd.add_argument('--status', default=None, help='Only this license status')
+    zip_cmd.add_argument('--limit', type=int, default=1000)
+    sql_cmd = subparsers.add_parser('sql', help='Run a read-only SQL query against the licenses table')
+    sql_cmd.add_argument('sql')
+    subparsers.add_parser('stats', help='Record counts per board')
+    load_cmd = subparsers.add_parser('load', help='Load a collector CSV or .jsonl.gz records file')
+    load_cmd.add_argument('file')
+    load_cmd.add_argument('--source', default='dpor', help='Collector name (default: dpor)')
+
+    args = parser.parse_args()
+
+    if args.command == 'load':
+        if args.file.endswith('.jsonl.gz'):
+            from src.utils.record_io import read_records
+            source_records = read_records(args.file)
+        else:
+            source_records = csv.DictReader(open(args.file, 'r', newline='', encoding='utf-8'))
+        store = LicenseStore(args.db)
+        store.load(source_records, source=args.source)
+        store.close()
+        sys.exit(0)
+
+    store = LicenseStore(args.db, readonly=True)
+    start = time.perf_counter()
+    if args.command == 'license':
+        rows = store.by_license(args.number)
+    elif args.command == 'name':
+        rows = store.by_name(args.name, prefix=args.prefix, limit=args.limit)
+    elif args.command == 'zip':
+        rows = store.by_zip(args.zip, status=args.status, limit=args.limit)
+    elif args.command == 'sql':
+        rows = store.query(args.sql)
+    else:
+        rows = store.stats()
+    elapsed = (time.perf_counter() - start) * 1000
+
+    if args.csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(rows[0].keys() if rows else [])
+        writer.writerows(row.values() for row in rows)
+    else:
+        for row in rows:
+            print(" | ".join(str(v) for k, v in row.items() if v and k not in ("name_key", "zip5", "loaded_at")))
+    logger.info(f"{len(rows)} row(s) in {elapsed:.1f} ms")
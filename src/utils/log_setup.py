@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Logging Setup
+=============
+One logging configuration for every entry point, built so that logging
+costs the hot paths (parsing, downloads, uploads) almost nothing.
+
+- Calling threads only put the record on an in-process queue. Formatting and
+  I/O happen on a background QueueListener thread. Messages with %-style
+  arguments are formatted there too, unless an argument is mutable and
+  could change before then.
+- Repetitive call sites (per request, per batch) opt in to rate limiting
+  with ``extra=RATE_LIMITED``: each such site (file and line) may log
+  ``burst`` records per ``interval`` below ERROR; the rest are dropped and
+  counted. The count is reported with the next record from that site, or
+  when logging shuts down. Other records are never dropped.
+- Output is the usual text lines, or one JSON object per line
+  (``--log-json``) with ts, level, logger, message, thread and any
+  ``extra={...}`` fields.
+- Row-level problems are not logged per row: parsers count them in an
+  ErrorTally and log one summary per dataset.
+
+Usage:
+
+    from src.utils.log_setup import setup_logging
+    setup_logging(verbose=args.verbose, json_output=args.log_json, log_file=args.log_file)
+
+Hot-path calls should pass arguments instead of f-strings, so nothing is
+built for a disabled level:
+
+    logger.debug("Batch %d timed out", batch_num, extra=RATE_LIMITED)
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Argument types that cannot change between the log call and formatting
+_IMMUTABLE = (str, int, float, bool, type(None), bytes)
+
+# extra= for call sites that may be rate-limited
+RATE_LIMITED = {"rate_limit": True}
+
+# LogRecord attributes; anything else on a record came from extra={...}
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "rate_limit"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including extra={...} fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The standard text format, noting how many similar records were rate-limited"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} ({suppressed:,} similar message(s) suppressed)" if suppressed else text
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets each opted-in call site log at most burst records per interval.
+
+    Only records logged with extra=RATE_LIMITED are limited; ERROR and above
+    always pass.
+    """
+
+    def __init__(self, burst: int = 20, interval: float = 60.0, max_level: int = logging.WARNING):
+        """
+        Args:
+            burst: Records per call site per interval
+            interval: Window in seconds
+            max_level: Highest level that is rate-limited
+        """
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.max_level = max_level
+        # (path, line) -> [window start, records in window, suppressed since last passed record]
+        self._sites: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level or not getattr(record, "rate_limit", False):
+            return True
+        now = time.monotonic()
+        with self._lock:
+            site = self._sites.get((record.pathname, record.lineno))
+            if site is None:
+                self._sites[(record.pathname, record.lineno)] = [now, 1, 0]
+                return True
+            if now - site[0] >= self.interval:
+                site[0] = now
+                site[1] = 0
+            if site[1] >= self.burst:
+                site[2] += 1
+                return False
+            site[1] += 1
+            if site[2]:
+                record.suppressed = site[2]
+                site[2] = 0
+        return True
+
+    def pending(self) -> Dict[tuple, int]:
+        """(path, line) -> records suppressed and not yet reported."""
+        with self._lock:
+            return {key: site[2] for key, site in self._sites.items() if site[2]}
+
+
+class LazyQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves this process, so the record needs no pickling. Only
+        # mutable arguments are rendered now, since they could change before formatting
+        # (a lone dict argument arrives as the args mapping itself)
+        if record.args and not (isinstance(record.args, tuple)
+                                and all(isinstance(arg, _IMMUTABLE) for arg in record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Render the traceback now so the record doesn't keep the frames alive
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class ErrorTally:
+    """Per-dataset counts of row-level problems, logged as one summary rather than a line per row"""
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, dataset: str, problems: Dict[str, int]):
+        """Add a dataset's problem counts (e.g. {"short rows": 3})."""
+        problems = {kind: n for kind, n in problems.items() if n}
+        if not problems:
+            return
+        with self._lock:
+            counts = self.counts.setdefault(dataset, {})
+            for kind, n in problems.items():
+                counts[kind] = counts.get(kind, 0) + n
+
+    def totals(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        with self._lock:
+            for counts in self.counts.values():
+                for kind, n in counts.items():
+                    totals[kind] = totals.get(kind, 0) + n
+        return totals
+
+    def log_dataset(self, log: logging.Logger, dataset: str, problems: Dict[str, int],
+                    level: int = logging.INFO):
+        """Add a dataset's counts and log them in one line (nothing if there are none)."""
+        problems = {kind: n for kind, n in problems.items() if n}
+        self.add(dataset, problems)
+        if problems and log.isEnabledFor(level):
+            log.log(level, "%s: %s", dataset, _describe(problems), extra={"dataset": dataset, "problems": problems})
+
+    def log_summary(self, log: logging.Logger, level: int = logging.INFO):
+        """Log the totals across datasets (nothing if there were no problems)."""
+        totals = self.totals()
+        if totals:
+            log.log(level, "Problems in %d dataset(s): %s", len(self.counts), _describe(totals),
+                    extra={"problems": totals})
+
+
+def _describe(counts: Dict[str, int]) -> str:
+    return ", ".join(f"{n:,} {kind}" for kind, n in sorted(counts.items(), key=lambda item: -item[1]))
+
+
+# ----------------------------------------------------------------------
+# Setup
+# ----------------------------------------------------------------------
+
+_state = {}
+_state_lock = threading.Lock()
+
+
+def _handlers(json_output: bool, log_file: Optional[str]):
+    formatter = JsonFormatter() if json_output else TextFormatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _start(handlers, rate_filter: RateLimitFilter):
+    """Route the root logger through a new queue to a new listener thread."""
+    records = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(records)
+    queue_handler.addFilter(rate_filter)
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    _state.update(handler=queue_handler, listener=listener)
+
+
+def _restart_in_child():
+    # A forked child (worker process) has the queue but not the listener thread
+    if "listener" in _state:
+        parent = _state["filter"]
+        _state["filter"] = RateLimitFilter(burst=parent.burst, interval=parent.interval, max_level=parent.max_level)
+        _start(_state["handlers"], _state["filter"])
+
+
+def setup_logging(verbose: bool = False, json_output: bool = False, log_file: Optional[str] = None,
+                  burst: int = 20, interval: float = 60.0):
+    """
+    Configure the root logger: queued records, written by a background thread.
+
+    Calling it again changes the level and output (e.g. after parsing arguments).
+
+    Args:
+        verbose: Log DEBUG records too
+        json_output: One JSON object per line instead of text
+        log_file: Also write to this file
+        burst: Records per rate-limited call site per interval (below ERROR)
+        interval: Rate-limit window in seconds
+    """
+    with _state_lock:
+        if "listener" in _state:
+            _state["listener"].stop()
+        rate_filter = RateLimitFilter(burst=burst, interval=interval)
+        handlers = _handlers(json_output, log_file)
+        _state.update(handlers=handlers, filter=rate_filter)
+        _start(handlers, rate_filter)
+        if not _state.get("registered"):
+            _state["registered"] = True
+            atexit.register(shutdown_logging)
+            os.register_at_fork(after_in_child=_restart_in_child)
+
+    logging.getLogger().setLevel(logging.DEBUG if verbose else logging.INFO)
+    # Per-connection debug lines from urllib3 drown out the collectors' own
+    logging.getLogger("urllib3").setLevel(logging.INFO)
+
+
+def shutdown_logging():
+    """Report rate-limited records, then write out everything queued."""
+    with _state_lock:
+        listener = _state.pop("listener", None)
+        if listener is None:
+            return
+        pending = _state["filter"].pending()
+        if pending:
+            # One record, so the report isn't rate-limited itself
+            logger.warning("Messages suppressed by the rate limit: %s", ", ".join(
+                f"{count:,} from {os.path.basename(path)}:{line}" for (path, line), count in pending.items()))
+        listener.stop()
+        for handler in _state["handlers"]:
+            handler.flush()
+
+
+def add_logging_arguments(parser):
+    """Add the shared logging options to an argparse parser."""
+    parser.add_argument('--log-json', action='store_true',
+                        help='Write logs as one JSON object per line')
+    parser.add_argument('--log-file', default=None, metavar='PATH',
+                        help='Also write logs to this file')
+
+
+def setup_logging_from_args(args, verbose: bool = False):
+    """setup_logging() with the options added by add_logging_arguments (and --verbose, if present)."""
+    setup_logging(verbose=verbose or getattr(args, 'verbose', False),
+                  json_output=getattr(args, 'log_json', False), log_file=getattr(args, 'log_file', None))
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Fuzzy Business Name Matching
+============================
+Finds the same business under slightly different ``Business Name`` spellings
+(across DPOR boards or collectors) without pairwise comparison.
+
+- normalize_business_name() removes case, punctuation and legal suffixes
+  ("Acme Roofing, L.L.C." -> "ACME ROOFING")
+- TrigramIndex is an inverted index from character trigrams to the distinct
+  normalized names containing them. A query only scores names that share one
+  of its rarest trigrams (prefix filtering), which is exact for Jaccard
+  similarity and skips the long posting lists of common trigrams. Candidates
+  are length-filtered and scored with numpy over sorted posting arrays.
+- link_records() clusters records whose names match across boards.
+
+Similarity is the Jaccard index of the two names' trigram sets, 0.0-1.0.
+"""
+
+import csv
+import logging
+import math
+import re
+from array import array
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 0.7
+
+_NON_ALNUM = re.compile(r'[^0-9A-Z]+')
+
+# Trailing words that don't distinguish businesses
+LEGAL_SUFFIXES = frozenset({
+    "LLC", "L L C", "INC", "INCORPORATED", "CORP", "CORPORATION", "CO", "COMPANY",
+    "LTD", "LIMITED", "LP", "LLP", "PLLC", "PC", "P C", "PLC",
+})
+
+
+def normalize_business_name(name: Optional[str]) -> str:
+    """
+    Normalize a business name for matching.
+
+    Upper-cases, maps "&" to AND, replaces punctuation with spaces, drops a
+    leading THE and trailing legal suffixes (LLC, INC, CORP, ...).
+    """
+    if not name:
+        return ""
+    words = _NON_ALNUM.sub(' ', name.upper().replace('&', ' AND ')).split()
+    if len(words) > 1 and words[0] == "THE":
+        words = words[1:]
+
+    # Strip suffixes, including dotted forms like "L.L.C." that split into letters
+    changed = True
+    while changed and len(words) > 1:
+        changed = False
+        for size in (3, 2, 1):
+            if len(words) > size and " ".join(words[-size:]) in LEGAL_SUFFIXES:
+                words = words[:-size]
+                changed = True
+                break
+    return " ".join(words)
+
+
+def trigrams(normalized: str) -> set:
+    """Character trigrams of each word, padded like pg_trgm ("  ab " -> "  a", " ab", "ab ")."""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """Inverted trigram index over distinct normalized business names"""
+
+    def __init__(self):
+        self._vocab: Dict[str, int] = {}
+        self._postings: List[array] = []
+        self._names: List[str] = []
+        self._grams: List[Tuple[int, ...]] = []
+        self._keys: List[List[Hashable]] = []
+        self._name_ids: Dict[str, int] = {}
+        # numpy copies of postings and trigram counts; postings changed since are re-copied
+        # (copies, not views: a buffer view would stop the array('I') lists growing)
+        self._frozen_postings: Optional[List[np.ndarray]] = None
+        self._lengths: Optional[np.ndarray] = None
+        self._dirty: set = set()
+
+    def __len__(self):
+        return len(self._names)
+
+    def add(self, key: Hashable, name: str) -> Optional[int]:
+        """
+        Index one name under a caller key (e.g. a license number).
+
+        Names that normalize to the same string share one entry.
+
+        Returns:
+            Internal name id, or None if the name normalizes to nothing
+        """
+        normalized = normalize_business_name(name)
+        if not normalized:
+            return None
+
+        name_id = self._name_ids.get(normalized)
+        if name_id is None:
+            name_id = len(self._names)
+            self._name_ids[normalized] = name_id
+            self._names.append(normalized)
+            self._keys.append([])
+
+            gram_ids = []
+            for gram in trigrams(normalized):
+                gram_id = self._vocab.get(gram)
+                if gram_id is None:
+                    gram_id = self._vocab[gram] = len(self._postings)
+                    self._postings.append(array('I'))
+                self._postings[gram_id].append(name_id)
+                self._dirty.add(gram_id)
+                gram_ids.append(gram_id)
+            self._grams.append(tuple(gram_ids))
+
+        self._keys[name_id].append(key)
+        return name_id
+
+    def add_many(self, items: Iterable[Tuple[Hashable, str]]) -> int:
+        """Index (key, name) pairs; returns the number of distinct names."""
+        for key, name in items:
+            self.add(key, name)
+        return len(self._names)
+
+    def keys(self, name_id: int) -> List[Hashable]:
+        return self._keys[name_id]
+
+    def name(self, name_id: int) -> str:
+        return self._names[name_id]
+
+    def _freeze(self):
+        """Copy postings to numpy arrays (sorted, since name ids are appended in order)."""
+        if self._frozen_postings is None:
+            self._frozen_postings = [np.array(p, dtype=np.uint32) for p in self._postings]
+        elif self._dirty:
+            # Only the postings that grew since the last query
+            frozen = self._frozen_postings
+            frozen.extend([None] * (len(self._postings) - len(frozen)))
+            for gram_id in self._dirty:
+                frozen[gram_id] = np.array(self._postings[gram_id], dtype=np.uint32)
+        else:
+            return
+        self._dirty = set()
+        self._lengths = np.fromiter((len(g) for g in self._grams), dtype=np.int32,
+                                    count=len(self._grams))
+
+    def _gram_ids(self, normalized: str) -> Tuple[List[int], int]:
+        """Known gram ids of a query and its total trigram count."""
+        grams = trigrams(normalized)
+        return [self._vocab[g] for g in grams if g in self._vocab], len(grams)
+
+    def _search(self, gram_ids: List[int], size: int, threshold: float,
+                min_id: int = -1) -> List[Tuple[int, float]]:
+        """Score names sharing trigrams with a query of `size` trigrams (known ones in gram_ids)."""
+        if not size:
+            return []
+
+        # Any name with Jaccard >= t shares at least ceil(t*|Q|) trigrams with the query,
+        # so it must contain one of the |Q| - ceil(t*|Q|) + 1 rarest query trigrams
+        min_overlap = max(1, math.ceil(threshold * size - 1e-9))
+        prefix = size - min_overlap + 1
+        unknown = size - len(gram_ids)
+        by_rarity = sorted(gram_ids, key=lambda g: len(self._postings[g]))
+        probe = by_rarity[:max(0, prefix - unknown)]
+
+        if not probe:
+            return []
+
+        self._freeze()
+        postings = self._frozen_postings
+        candidates = np.unique(np.concatenate([postings[g] for g in probe]))
+        if min_id >= 0:
+            candidates = candidates[candidates > min_id]
+
+        # A name with Jaccard >= t has between t*|Q| and |Q|/t trigrams
+        lengths = self._lengths[candidates]
+        keep = lengths >= threshold * size
+        if threshold > 0:
+            keep &= lengths <= size / threshold
+        candidates, lengths = candidates[keep], lengths[keep]
+        if not len(candidates):
+            return []
+
+        overlap = np.zeros(len(candidates), dtype=np.int32)
+        for gram_id in gram_ids:
+            posting = postings[gram_id]
+            positions = np.minimum(np.searchsorted(posting, candidates), len(posting) - 1)
+            overlap += posting[positions] == candidates
+
+        scores = overlap / (size + lengths - overlap)
+        keep = scores >= threshold
+        results = sorted(zip(candidates[keep].tolist(), scores[keep].tolist()),
+                         key=lambda r: (-r[1], r[0]))
+        return results
+
+    def query(self, name: str, threshold: float = DEFAULT_THRESHOLD,
+              limit: Optional[int] = None) -> List[Tuple[str, float, List[Hashable]]]:
+        """
+        Find indexed names similar to a name.
+
+        Returns:
+            (normalized name, similarity, keys) tuples, best first
+        """
+        gram_ids, size = self._gram_ids(normalize_business_name(name))
+        matches = self._search(gram_ids, size, threshold)
+        if limit:
+            matches = matches[:limit]
+        return [(self._names[i], score, self._keys[i]) for i, score in matches]
+
+    def match_batch(self, names: Sequence[str], threshold: float = DEFAULT_THRESHOLD,
+                    limit: Optional[int] = 10) -> List[List[Tuple[str, float, List[Hashable]]]]:
+        """query() for a batch of names, one result list per input name, in input order."""
+        cache: Dict[str, list] = {}
+        results = []
+        for name in names:
+            normalized = normalize_business_name(name)
+            if normalized not in cache:
+                cache[normalized] = self.query(normalized, threshold, limit)
+            results.append(cache[normalized])
+        return results
+
+    def similar_pairs(self, threshold: float = DEFAULT_THRESHOLD) -> Iterator[Tuple[int, int, float]]:
+        """Yield (name_id, other_name_id, similarity) for every distinct pair above threshold, once."""
+        for name_id, grams in enumerate(self._grams):
+            for other_id, score in self._search(list(grams), len(grams), threshold, min_id=name_id):
+                yield name_id, other_id, score
+
+
+def link_records(records: Iterable[Dict], threshold: float = DEFAULT_THRESHOLD,
+                 cross_board_only: bool = True) -> List[List[Dict]]:
+    """
+    Cluster records whose business names match.
+
+    Records with the same normalized name, or names linked by a chain of
+    matches above the threshold, end up in one cluster.
+
+    Args:
+        records: Standardized records
+        threshold: Minimum trigram similarity for two names to match
+        cross_board_only: Only return clusters spanning more than one board (Agency Name)
+
+    Returns:
+        Clusters as lists of {"License Number", "Agency Name", "Business Name", "Normalized Name"}
+    """
+    index = TrigramIndex()
+    for r in records:
+        index.add((r.get("License Number", ""), r.get("Agency Name", ""), r.get("Business Name", "")),
+                  r.get("Business Name"))
+    logger.info(f"Indexed {len(index):,} distinct normalized names")
+
+    parent = list(range(len(index)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    pairs = 0
+    for a, b, _ in index.similar_pairs(threshold):
+        pairs += 1
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups: Dict[int, List[int]] = {}
+    for name_id in range(len(index)):
+        groups.setdefault(find(name_id), []).append(name_id)
+
+    clusters = []
+    for name_ids in groups.values():
+        members = [{"License Number": number, "Agency Name": board, "Business Name": business,
+                    "Normalized Name": index.name(name_id)}
+                   for name_id in name_ids for number, board, business in index.keys(name_id)]
+        if len(members) < 2:
+            continue
+        if cross_board_only and len({m["Agency Name"] for m in members}) < 2:
+            continue
+        clusters.append(members)
+
+    logger.info(f"Name linking: {pairs:,} similar name pairs, {len(clusters):,} clusters "
+                f"(threshold {threshold})")
+    return clusters
+
+
+def write_clusters(clusters: List[List[Dict]], path) -> str:
+    """Write clusters as CSV with a cluster_id column."""
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["cluster_id", "License Number", "Agency Name", "Business Name", "Normalized Name"])
+        for cluster_id, members in enumerate(clusters, start=1):
+            for m in members:
+                writer.writerow([cluster_id, m["License Number"], m["Agency Name"],
+                                 m["Business Name"], m["Normalized Name"]])
+    logger.info(f"Name clusters saved to: {path}")
+    return str(path)
+
+
+def add_linking_arguments(parser):
+    """Add the shared --link-names options to an argparse parser."""
+    parser.add_argument('--link-names', action='store_true',
+                        help='Cluster matching business names across boards into a CSV')
+    parser.add_argument('--link-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Name similarity threshold for --link-names (default: {DEFAULT_THRESHOLD})')
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from src.utils.log_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Fuzzy business name matching')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'Similarity threshold 0-1 (default: {DEFAULT_THRESHOLD})')
+    parser.add_argument('--store', default=None,
+                        help='Read names from the license store (default: data/licenses.db)')
+    parser.add_argument('--csv-file', default=None, help='Read names from a collector CSV instead')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    match_cmd = subparsers.add_parser('match', help='Find indexed names similar to the given names')
+    match_cmd.add_argument('names', nargs='+')
+    match_cmd.add_argument('--limit', type=int, default=10)
+    link_cmd = subparsers.add_parser('link', help='Write cross-board name clusters to CSV')
+    link_cmd.add_argument('--output', default='data/name_clusters.csv')
+
+    args = parser.parse_args()
+
+    if args.csv_file:
+        source = csv.DictReader(open(args.csv_file, 'r', newline='', encoding='utf-8'))
+    else:
+        from src.utils.license_store import LicenseStore
+        store = LicenseStore(args.store, readonly=True)
+        source = ({"License Number": r[0], "Agency Name": r[1], "Business Name": r[2]}
+                  for r in store.conn.execute(
+                      "SELECT license_number, agency_name, business_name FROM licenses"))
+
+    start = time.perf_counter()
+    if args.command == 'link':
+        write_clusters(link_records(source, args.threshold), args.output)
+    else:
+        index = TrigramIndex()
+        index.add_many(((r["License Number"], r["Agency Name"]), r["Business Name"]) for r in source)
+        logger.info(f"Indexed {len(index):,} names in {time.perf_counter() - start:.1f}s")
+        for name, matches in zip(args.names, index.match_batch(args.names, args.threshold, args.limit)):
+            print(f"{name}:")
+            for normalized, score, keys in matches:
+                print(f"  {score:.2f}  {normalized}  ({len(keys)} record(s), e.g. {keys[0]})")
+    logger.info(f"Done in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Record Normalization for VK Uploads
+===================================
+Fast, output-identical replacements for VKBulkUploader.clean_string and
+VKBulkUploader.format_date, plus a batch normalizer that applies them to
+whole upload batches.
+
+- DateNormalizer remembers which format last parsed each (dataset, column) and
+  tries it first, so the common case is a single strptime() instead of
+  exception-driven fallthrough. Repeated values are served from a bounded LRU.
+- BatchNormalizer cleans text inline in one comprehension per record and
+  only calls into DateNormalizer for the date columns.
+
+The supported date formats are mutually exclusive (no string parses under two
+of them), so trying the learned format first returns the same result as
+trying them in the original order.
+
+Text cleaning deliberately keeps the chained str.replace() calls: on short
+field values CPython's str.translate() with a deletion table measured several
+times slower, and memoizing text values costs more than it saves.
+"""
+
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Formats accepted by format_date, in the original order
+DATE_FORMATS = ('%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%d', '%b %d, %Y', '%m/%d/%Y')
+DATE_OUTPUT_FORMAT = '%m/%d/%Y'
+
+# Record fields formatted as dates rather than cleaned as text
+DATE_COLUMNS = ("Expiration Date", "Date Established")
+
+
+def clean_string(text) -> str:
+    """Clean string for database insertion."""
+    if not text:
+        return 'NA'
+    # Remove problematic characters
+    return str(text).replace(',', '').replace("'", '').replace('"', '').strip()
+
+
+class DateNormalizer:
+    """format_date() with per-column format learning and an LRU of results"""
+
+    def __init__(self, cache_size: int = 65536):
+        """
+        Args:
+            cache_size: Maximum number of distinct values remembered
+        """
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._learned: Dict[tuple, str] = {}
+        self._valid = {}
+        self.hits = 0
+        self.misses = 0
+
+    def format_date(self, date_str, column: Optional[str] = None, dataset: Optional[str] = None) -> str:
+        """Format date string to MM/DD/YYYY, return as-is if unparseable, or NA if empty."""
+        if not date_str or date_str == 'NA':
+            return 'NA'
+        if not isinstance(date_str, str):
+            # strptime() rejects non-strings, so the original returned them unchanged
+            return date_str
+
+        cache = self._cache
+        result = cache.get(date_str)
+        if result is not None:
+            cache.move_to_end(date_str)
+            self.hits += 1
+            return result
+
+        self.misses += 1
+        result = self._parse(date_str, (dataset, column))
+        cache[date_str] = result
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return result
+
+    def is_valid(self, date_str, column: Optional[str] = None, dataset: Optional[str] = None) -> bool:
+        """True if date_str parses under one of DATE_FORMATS."""
+        if not date_str or not isinstance(date_str, str):
+            return False
+
+        valid = self._valid.get(date_str)
+        if valid is None:
+            valid = self._match(date_str, (dataset, column)) is not None
+            if len(self._valid) >= self.cache_size:
+                self._valid.clear()
+            self._valid[date_str] = valid
+        return valid
+
+    def _match(self, date_str: str, learn_key: tuple) -> Optional[datetime]:
+        """Parse with the learned format first, then the rest in original order."""
+        learned = self._learned.get(learn_key)
+        if learned is not None:
+            try:
+                return datetime.strptime(date_str, learned)
+            except ValueError:
+                pass
+
+        for fmt in DATE_FORMATS:
+            if fmt == learned:
+                continue
+            try:
+                dt = datetime.strptime(date_str, fmt)
+            except ValueError:
+                continue
+            self._learned[learn_key] = fmt
+            return dt
+
+        return None
+
+    def _parse(self, date_str: str, learn_key: tuple) -> str:
+        """Format a date string, returning it as-is if no format matches."""
+        dt = self._match(date_str, learn_key)
+        if dt is None:
+            return date_str  # Return as-is if no format matches
+        return dt.strftime(DATE_OUTPUT_FORMAT)
+
+
+class BatchNormalizer:
+    """Normalizes whole record batches: dates via DateNormalizer, text via clean_string"""
+
+    def __init__(self, date_columns: Iterable[str] = DATE_COLUMNS, cache_size: int = 65536):
+        """
+        Args:
+            date_columns: Record fields formatted as dates
+            cache_size: LRU size for date values
+        """
+        self.date_columns = frozenset(date_columns)
+        self.dates = DateNormalizer(cache_size=cache_size)
+
+    def normalize_batch(self, records: List[Dict], dataset: Optional[str] = None) -> List[Dict]:
+        """
+        Return normalized copies of a batch of records.
+
+        Args:
+            records: Standardized records
+            dataset: Optional dataset key, so formats are learned per dataset
+
+        Returns:
+            New list of record dicts with the same keys in the same order
+        """
+        date_columns = self.date_columns
+        format_date = self.dates.format_date
+
+        normalized = []
+        for record in records:
+            # Same logic as clean_string(), inlined to avoid a call per field
+            out = {
+                key: 'NA' if not value else str(value).replace(',', '').replace("'", '').replace('"', '').strip()
+                for key, value in record.items()
+            }
+            # Overwriting keeps the original key order
+            for key in date_columns:
+                if key in record:
+                    out[key] = format_date(record[key], key, dataset)
+            normalized.append(out)
+
+        return normalized
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Notification Dispatcher
+=======================
+Sends notifications (e.g. SlackNotifier) from a background thread, so a slow
+webhook never stalls collection.
+
+- notify_*() calls only append to a bounded in-memory queue and return
+  immediately
+- progress messages are coalesced into one digest per interval
+- start/warning/success/error messages are sent as soon as the rate limit
+  allows, after any pending progress digest, so ordering is kept
+- the queue is flushed on close() and at interpreter exit
+
+The dispatcher has the notifier interface (notify_start, notify_progress,
+notify_warning, notify_success, notify_error, ...), so it wraps any
+notifier transparently:
+
+    slack = NotificationDispatcher(SlackNotifier("DC Collectors"))
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+PROGRESS = "notify_progress"
+
+
+class WebhookNotifier:
+    """Minimal notifier posting {"text": ...} to a Slack-compatible incoming webhook"""
+
+    def __init__(self, url: str, name: str = "DC Collectors", timeout: float = 10.0):
+        self.url = url
+        self.name = name
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _post(self, text: str):
+        response = self.session.post(self.url, json={"text": f"*{self.name}*: {text}"}, timeout=self.timeout)
+        response.raise_for_status()
+
+    def notify_start(self, details: Optional[dict] = None):
+        lines = [f"{k}: {v}" for k, v in (details or {}).items()]
+        self._post("\n".join(["Started"] + lines))
+
+    def notify_progress(self, message: str):
+        self._post(message)
+
+    def notify_warning(self, message: str):
+        self._post(f"⚠️ {message}")
+
+    def notify_success(self, message: str):
+        self._post(f"✅ {message}")
+
+    def notify_error(self, message: str, exception: Optional[BaseException] = None):
+        self._post(f"❌ {message}" + (f": {exception}" if exception else ""))
+
+
+class NotificationDispatcher:
+    """Non-blocking, coalescing, rate-limited wrapper around a notifier"""
+
+    def __init__(self, notifier, digest_interval: float = 30.0, min_interval: float = 1.0,
+                 max_queue: int = 1000, digest_lines: int = 10):
+        """
+        Start the dispatcher thread.
+
+        Args:
+            notifier: Object with notify_* methods (e.g. SlackNotifier)
+            digest_interval: Seconds between progress digests
+            min_interval: Minimum seconds between two notifier calls
+            max_queue: Queued (non-progress) messages kept before the oldest is dropped
+            digest_lines: Progress messages quoted in a digest (the most recent ones)
+        """
+        self.notifier = notifier
+        self.digest_interval = digest_interval
+        self.min_interval = min_interval
+        self.max_queue = max(1, max_queue)
+        self.digest_lines = max(1, digest_lines)
+
+        self._queue = deque()
+        self._progress = deque(maxlen=self.digest_lines)
+        self._progress_count = 0
+        self._progress_since = None
+        self.dropped = 0
+        self.sent = 0
+        self.failed = 0
+
+        self._cond = threading.Condition()
+        self._closed = False
+        self._last_send = 0.0
+        self._thread = threading.Thread(target=self._run, name="notifications", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ------------------------------------------------------------------
+    # Notifier interface (never blocks)
+    # ------------------------------------------------------------------
+
+    def __getattr__(self, name: str):
+        if not name.startswith("notify_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self._submit(name, args, kwargs)
+
+    def notify_progress(self, message: str):
+        """Queue a progress message for the next digest."""
+        with self._cond:
+            if self._closed:
+                return
+            if self._progress_since is None:
+                # First message of a digest: wake the thread to start the digest timer
+                self._progress_since = time.monotonic()
+                self._cond.notify()
+            self._progress.append(message)
+            self._progress_count += 1
+
+    def _submit(self, method: str, args, kwargs):
+        with self._cond:
+            if self._closed:
+                logger.debug(f"Notification after close dropped: {method}")
+                return
+            # Progress received so far goes out first, so ordering is kept
+            self._enqueue_digest()
+            self._enqueue((method, args, kwargs))
+            self._cond.notify()
+
+    def _enqueue(self, item):
+        if len(self._queue) >= self.max_queue:
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append(item)
+
+    def _enqueue_digest(self):
+        """Turn pending progress messages into one queued digest (call with the lock held)."""
+        if not self._progress_count:
+            return
+        count, messages = self._progress_count, list(self._progress)
+        self._progress.clear()
+        self._progress_count = 0
+        self._progress_since = None
+        if count == 1:
+            text = messages[0]
+        else:
+            earlier = count - len(messages)
+            text = "\n".join([f"{count} progress updates" + (f" ({earlier} earlier not shown)" if earlier else "") + ":"]
+                             + [f"• {m}" for m in messages])
+        self._enqueue((PROGRESS, (text,), {}))
+
+    # ------------------------------------------------------------------
+    # Background thread
+    # ------------------------------------------------------------------
+
+    def _send(self, method: str, args, kwargs):
+        wait = self._last_send + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            getattr(self.notifier, method)(*args, **kwargs)
+            self.sent += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Notification {method} failed: {e}")
+        self._last_send = time.monotonic()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    if self._progress_since is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self.digest_interval - (time.monotonic() - self._progress_since)
+                    if remaining <= 0:
+                        self._enqueue_digest()
+                    else:
+                        self._cond.wait(remaining)
+                if self._closed:
+                    self._enqueue_digest()
+                if not self._queue:
+                    return
+                item = self._queue.popleft()
+            self._send(*item)
+
+    # ------------------------------------------------------------------
+    # Shutdown
+    # ------------------------------------------------------------------
+
+    def close(self, timeout: float = 30.0):
+        """Send everything still queued (including a final digest) and stop the thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Notification dispatcher did not flush within "
+                           f"{timeout:.0f}s; remaining notifications dropped")
+        if self.dropped:
+            logger.warning(f"Dropped {self.dropped} notification(s) because the queue was full")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def add_notification_arguments(parser):
+    """Add the shared notification options to an argparse parser."""
+    parser.add_argument('--notify-interval', type=float, default=30.0,
+                        help='Seconds between coalesced progress notifications (default: 30)')
+    parser.add_argument('--notify-webhook', default=None, metavar='URL',
+                        help='Post notifications to this Slack-compatible webhook instead of SlackNotifier')
+
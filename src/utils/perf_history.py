@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Performance History
+===================
+Keeps each run's per-stage and per-dataset timings, bytes and record counts
+in a local SQLite store. A report compares a run with a rolling baseline of
+earlier runs and flags significant throughput regressions.
+
+Collectors fill a RunMetrics while they run:
+
+- stages: seconds in links, download, process, validate, upload, csv
+- datasets: download seconds and bytes, parse seconds and records
+- uploaded: records accepted by the API
+
+From these, a run has throughput metrics. ``download`` is bytes per second,
+``parse`` is records per second, and ``upload`` is uploaded records per
+second. Each is kept for the whole run and per dataset (for example
+``download:0401``). Any other stage recorded with a count (e.g. a benchmark's
+``normalize``) is a metric of its own.
+
+A run is compared with the last ``baseline`` successful runs of the same
+source and kind. A metric is flagged when its robust z-score is at most
+``-threshold``, with a default threshold of 3.5. The z-score is computed as
+``0.6745 * (log x - median) / MAD`` over log throughput, a modified z-score
+that one slow outlier in the baseline does not skew. The metric must also be
+``min_drop`` slower than the baseline median, and the baseline needs
+``min_runs`` runs. Timings under ``min_seconds`` are too noisy to judge.
+
+Benchmarks (see benchmarks/bench_normalize.py) record into the same store
+with kind "benchmark" and a version label, so collector versions can be
+compared with ``versions``.
+
+Store: ``data/perf_history.db``.
+"""
+
+import json
+import logging
+import math
+import sqlite3
+import statistics
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERF_PATH = Path("data") / "perf_history.db"
+
+# Throughput metric -> (stage whose seconds are the denominator, count column)
+THROUGHPUT_METRICS = {
+    "download": ("download", "bytes"),
+    "parse": ("process", "records"),
+    "upload": ("upload", "records"),
+}
+_STAGE_METRICS = {stage: metric for metric, (stage, _) in THROUGHPUT_METRICS.items()}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS perf_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version TEXT,
+    label TEXT,
+    started_at TEXT NOT NULL,
+    duration REAL,
+    success INTEGER NOT NULL,
+    meta TEXT
+);
+CREATE INDEX IF NOT EXISTS perf_runs_source ON perf_runs (source, kind, id);
+
+CREATE TABLE IF NOT EXISTS perf_stages (
+    run_id INTEGER NOT NULL REFERENCES perf_runs (id),
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    bytes INTEGER,
+    records INTEGER,
+    PRIMARY KEY (run_id, stage)
+);
+
+CREATE TABLE IF NOT EXISTS perf_datasets (
+    run_id INTEGER NOT NULL REFERENCES perf_runs (id),
+    dataset TEXT NOT NULL,
+    download_seconds REAL,
+    bytes INTEGER,
+    parse_seconds REAL,
+    records INTEGER,
+    upload_seconds REAL,
+    uploaded INTEGER,
+    PRIMARY KEY (run_id, dataset)
+);
+"""
+
+_DATASET_FIELDS = ("download_seconds", "bytes", "parse_seconds", "records", "upload_seconds", "uploaded")
+
+
+class RunMetrics:
+    """Thread-safe stage and dataset measurements for one collector run"""
+
+    def __init__(self):
+        # stage -> {"seconds", "bytes", "records"}
+        self.stages: Dict[str, Dict] = {}
+        self.datasets: Dict[str, Dict[str, float]] = {}
+        self.uploaded = 0
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float, bytes: Optional[int] = None,
+                  records: Optional[int] = None):
+        """Add time (and optionally the bytes or records it moved) to a stage."""
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"seconds": 0.0, "bytes": None, "records": None})
+            entry["seconds"] += seconds
+            for field, value in (("bytes", bytes), ("records", records)):
+                if value is not None:
+                    entry[field] = (entry[field] or 0) + value
+
+    def add_dataset(self, dataset: str, **values):
+        """Add to a dataset's counters (download_seconds, bytes, parse_seconds, records, ...)."""
+        with self._lock:
+            entry = self.datasets.setdefault(dataset, {})
+            for field, value in values.items():
+                entry[field] = entry.get(field, 0) + value
+
+    def add_uploaded(self, count: int):
+        with self._lock:
+            self.uploaded += count
+
+    @contextmanager
+    def timed(self, dataset: str, field: str):
+        """Add the wrapped block's seconds to a dataset's field."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_dataset(dataset, **{field: time.perf_counter() - start})
+
+    def stage_rows(self) -> Dict[str, Dict]:
+        """Per-stage seconds with the bytes and records they moved."""
+        with self._lock:
+            totals = {field: sum(d.get(field, 0) for d in self.datasets.values()) for field in _DATASET_FIELDS}
+            rows = {stage: dict(entry) for stage, entry in self.stages.items()}
+            counts = {"download": totals["bytes"], "parse": totals["records"], "upload": self.uploaded}
+
+        for metric, (stage, column) in THROUGHPUT_METRICS.items():
+            if not counts[metric] or (stage in rows and rows[stage][column] is not None):
+                continue
+            if stage not in rows:
+                # Streaming runs have no separate stage; fall back to the per-dataset times
+                seconds = totals[f"{metric}_seconds"]
+                if not seconds:
+                    continue
+                rows[stage] = {"seconds": seconds, "bytes": None, "records": None}
+            rows[stage][column] = counts[metric]
+        return rows
+
+
+class PerfHistory:
+    """SQLite store of run performance with baseline regression checks"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open (or create) the performance history.
+
+        Args:
+            path: SQLite file (default: data/perf_history.db)
+        """
+        self.path = Path(path) if path else DEFAULT_PERF_PATH
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        self.conn = sqlite3.connect(str(self.path), timeout=60)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record_run(self, source: str, metrics: RunMetrics, duration: Optional[float] = None,
+                   success: bool = True, kind: str = "collect", version: Optional[str] = None,
+                   label: Optional[str] = None, meta: Optional[Dict] = None) -> int:
+        """
+        Store one run's measurements.
+
+        Args:
+            source: Collector or benchmark name
+            metrics: The run's RunMetrics
+            duration: Wall-clock seconds of the whole run
+            success: Failed runs are kept but never used as a baseline
+            kind: "collect" or "benchmark"; runs are only compared within a kind
+            version: Code version (default: the git revision)
+            label: Free-form tag (e.g. "legacy" or a branch name)
+            meta: Extra JSON-serializable details
+
+        Returns:
+            The run id
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO perf_runs (source, kind, version, label, started_at, duration, success, meta) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, kind, version or code_version(), label,
+                 datetime.now().isoformat(timespec='seconds'), duration, int(bool(success)),
+                 json.dumps(meta) if meta else None))
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO perf_stages (run_id, stage, seconds, bytes, records) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, stage, row["seconds"], row["bytes"], row["records"])
+                 for stage, row in metrics.stage_rows().items()])
+            self.conn.executemany(
+                f"INSERT INTO perf_datasets (run_id, dataset, {', '.join(_DATASET_FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(_DATASET_FIELDS))})",
+                [(run_id, dataset) + tuple(values.get(field) for field in _DATASET_FIELDS)
+                 for dataset, values in metrics.datasets.items()])
+        logger.info(f"Performance history: run {run_id} of {source} recorded in {self.path}")
+        return run_id
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def runs(self, source: Optional[str] = None, kind: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Most recent runs, newest first."""
+        query = "SELECT * FROM perf_runs WHERE 1 = 1"
+        params = []
+        for clause, value in (("source = ?", source), ("kind = ?", kind)):
+            if value is not None:
+                query += f" AND {clause}"
+                params.append(value)
+        query += " ORDER BY id DESC LIMIT ?"
+        return [dict(row) for row in self.conn.execute(query, params + [limit])]
+
+    def run(self, run_id: int) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM perf_runs WHERE id = ?", (run_id,)).fetchone()
+        return dict(row) if row else None
+
+    def throughput(self, run_id: int, min_seconds: float = 0.0) -> Dict[str, float]:
+        """
+        Throughput metrics of a run: run-wide ``download``/``parse``/``upload``
+        (and other counted stages), and per dataset ``download:<dataset>``,
+        ``parse:<dataset>`` and ``upload:<dataset>``.
+        """
+        metrics = {}
+        for row in self.conn.execute("SELECT * FROM perf_stages WHERE run_id = ?", (run_id,)):
+            count = row["bytes"] or row["records"]
+            if count and row["seconds"] > max(min_seconds, 0.0):
+                metrics[_STAGE_METRICS.get(row["stage"], row["stage"])] = count / row["seconds"]
+
+        for row in self.conn.execute("SELECT * FROM perf_datasets WHERE run_id = ?", (run_id,)):
+            for metric, seconds, count in (("download", row["download_seconds"], row["bytes"]),
+                                           ("parse", row["parse_seconds"], row["records"]),
+                                           ("upload", row["upload_seconds"], row["uploaded"])):
+                if seconds and count and seconds > min_seconds:
+                    metrics[f"{metric}:{row['dataset']}"] = count / seconds
+        return metrics
+
+    def baseline_runs(self, run_id: int, baseline: int = 10) -> List[int]:
+        """Ids of the last `baseline` successful runs of the same source and kind before run_id."""
+        run = self.run(run_id)
+        if run is None:
+            raise KeyError(f"Unknown run: {run_id}")
+        return [row["id"] for row in self.conn.execute(
+            "SELECT id FROM perf_runs WHERE source = ? AND kind = ? AND success = 1 AND id < ? "
+            "ORDER BY id DESC LIMIT ?", (run["source"], run["kind"], run_id, baseline))]
+
+    # ------------------------------------------------------------------
+    # Regression checks
+    # ------------------------------------------------------------------
+
+    def compare(self, run_id: int, baseline: int = 10, threshold: float = 3.5, min_drop: float = 0.1,
+                min_runs: int = 5, min_seconds: float = 0.5) -> List[Dict]:
+        """
+        Compare a run's throughput with its rolling baseline.
+
+        Args:
+            run_id: Run to check
+            baseline: Number of earlier successful runs to compare with
+            threshold: Flag metrics whose robust z-score is at or below -threshold
+            min_drop: ...and that are at least this fraction slower than the baseline median
+            min_runs: Metrics with fewer baseline observations are not judged
+            min_seconds: Ignore measurements shorter than this
+
+        Returns:
+            One dict per metric (metric, value, median, change, z, runs, regression),
+            regressions first, then by z-score
+        """
+        current = self.throughput(run_id, min_seconds)
+        history: Dict[str, List[float]] = {}
+        for previous in self.baseline_runs(run_id, baseline):
+            for metric, value in self.throughput(previous, min_seconds).items():
+                history.setdefault(metric, []).append(value)
+
+        rows = []
+        for metric, value in current.items():
+            values = history.get(metric, [])
+            if len(values) < min_runs:
+                continue
+            median = statistics.median(values)
+            z = robust_z(value, values)
+            change = value / median - 1.0
+            rows.append({"metric": metric, "value": value, "median": median, "change": change,
+                         "z": z, "runs": len(values),
+                         "regression": z <= -threshold and change <= -min_drop})
+        rows.sort(key=lambda r: (not r["regression"], r["z"]))
+        return rows
+
+    def check_run(self, run_id: int, **options) -> List[Dict]:
+        """compare() and log a warning per regression; returns the regressions."""
+        regressions = [row for row in self.compare(run_id, **options) if row["regression"]]
+        run = self.run(run_id)
+        for row in regressions:
+            logger.warning(f"Performance regression in {run['source']} run {run_id}: {row['metric']} "
+                           f"{format_rate(row['metric'], row['value'])} vs median "
+                           f"{format_rate(row['metric'], row['median'])} ({row['change']:+.0%}, "
+                           f"z={row['z']:.1f} over {row['runs']} runs)")
+        return regressions
+
+    def versions(self, source: str, kind: Optional[str] = None, metric: Optional[str] = None) -> List[Dict]:
+        """Median run-wide throughput per version (and label) of a source, oldest version first."""
+        query = "SELECT id, version, label FROM perf_runs WHERE source = ? AND success = 1"
+        params = [source]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        groups: Dict[tuple, Dict[str, List[float]]] = {}
+        for row in self.conn.execute(query + " ORDER BY id", params):
+            values = groups.setdefault((row["version"], row["label"]), {})
+            for name, value in self.throughput(row["id"]).items():
+                if ":" not in name and (metric is None or name == metric):
+                    values.setdefault(name, []).append(value)
+        return [{"version": version, "label": label, "runs": len(next(iter(values.values()), [])),
+                 "metrics": {name: statistics.median(v) for name, v in sorted(values.items())}}
+                for (version, label), values in groups.items()]
+
+
+def robust_z(value: float, values: List[float]) -> float:
+    """Modified z-score of log(value) against log(values); +-inf if the baseline has no spread."""
+    logs = [math.log(v) for v in values]
+    median = statistics.median(logs)
+    mad = statistics.median(abs(x - median) for x in logs)
+    delta = math.log(value) - median
+    if mad == 0:
+        # Identical baselines: any real change is infinitely surprising, min_drop decides
+        return 0.0 if abs(delta) < 1e-9 else math.copysign(math.inf, delta)
+    return 0.6745 * delta / mad
+
+
+def format_rate(metric: str, value: float) -> str:
+    if metric.startswith("download"):
+        return f"{value / 1e6:,.2f} MB/s"
+    return f"{value:,.0f} records/s"
+
+
+def code_version() -> str:
+    """Short git revision of this checkout ("+" if modified), or "unknown"."""
+    root = Path(__file__).resolve().parents[2]
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                                  text=True, timeout=5).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                               capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+    return (revision + ("+" if dirty else "")) if revision else "unknown"
+
+
+def add_perf_arguments(parser):
+    """Add the shared --record-perf options to an argparse parser."""
+    parser.add_argument('--record-perf', action='store_true',
+                        help='Record stage and dataset timings in the performance history and '
+                             'warn about throughput regressions')
+    parser.add_argument('--perf-db', default=None,
+                        help=f'Performance history database (default: {DEFAULT_PERF_PATH})')
+
+
+def record_collector_run(source: str, collector, duration: float, success: bool,
+                         path: Optional[str] = None, kind: str = "collect") -> Optional[int]:
+    """Record a collector's RunMetrics and log regressions; never raises."""
+    try:
+        history = PerfHistory(path)
+        try:
+            run_id = history.record_run(source, collector.metrics, duration=duration, success=success,
+                                        kind=kind)
+            if success:
+                history.check_run(run_id)
+            return run_id
+        finally:
+            history.close()
+    except Exception as e:
+        logger.warning(f"Could not record performance history for {source}: {e}")
+        return None
+
+
+def _print_report(history: PerfHistory, run_id: int, rows: List[Dict], show_all: bool):
+    run = history.run(run_id)
+    print(f"Run {run_id}: {run['source']} ({run['kind']}) {run['started_at']} version {run['version']}"
+          + (f" [{run['label']}]" if run['label'] else "")
+          + (f", {run['duration']:.1f}s" if run['duration'] else ""))
+    if not rows:
+        print("Not enough baseline runs to compare")
+        return
+    print(f"{'metric':<28} {'this run':>16} {'baseline median':>16} {'change':>8} {'z':>7}  runs")
+    for row in rows:
+        if not show_all and not row["regression"] and ":" in row["metric"]:
+            continue
+        print(f"{row['metric']:<28} {format_rate(row['metric'], row['value']):>16} "
+              f"{format_rate(row['metric'], row['median']):>16} {row['change']:>+8.0%} {row['z']:>7.1f}  "
+              f"{row['runs']}" + ("  REGRESSION" if row["regression"] else ""))
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from src.utils.log_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Run performance history and regression report')
+    parser.add_argument('--db', default=str(DEFAULT_PERF_PATH),
+                        help=f'Performance history database (default: {DEFAULT_PERF_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    report = subparsers.add_parser('report', help='Compare a run with its rolling baseline '
+                                                  '(exit status 1 on regressions)')
+    report.add_argument('--source', default='dpor', help='Collector or benchmark (default: dpor)')
+    report.add_argument('--kind', default='collect', help='Run kind (default: collect)')
+    report.add_argument('--run', type=int, default=None, help='Run id (default: latest of --source)')
+    report.add_argument('--baseline', type=int, default=10, help='Earlier runs to compare with (default: 10)')
+    report.add_argument('--threshold', type=float, default=3.5, help='Robust z-score threshold (default: 3.5)')
+    report.add_argument('--min-drop', type=float, default=0.1,
+                        help='Minimum slowdown to flag, as a fraction (default: 0.1)')
+    report.add_argument('--all', action='store_true', help='Show every dataset, not only regressions')
+
+    runs = subparsers.add_parser('runs', help='List recorded runs')
+    runs.add_argument('--source', default=None)
+    runs.add_argument('--kind', default=None)
+    runs.add_argument('--limit', type=int, default=20)
+
+    versions = subparsers.add_parser('versions', help='Median throughput per code version')
+    versions.add_argument('--source', default='dpor')
+    versions.add_argument('--kind', default=None)
+    versions.add_argument('--metric', default=None, help='Only this metric (download, parse, upload, ...)')
+
+    args = parser.parse_args()
+    history = PerfHistory(args.db)
+
+    if args.command == 'report':
+        run_id = args.run
+        if run_id is None:
+            latest = history.runs(source=args.source, kind=args.kind, limit=1)
+            if not latest:
+                print(f"No runs recorded for {args.source}")
+                sys.exit(0)
+            run_id = latest[0]["id"]
+        rows = history.compare(run_id, baseline=args.baseline, threshold=args.threshold, min_drop=args.min_drop)
+        _print_report(history, run_id, rows, args.all)
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+    elif args.command == 'runs':
+        for run in history.runs(source=args.source, kind=args.kind, limit=args.limit):
+            throughput = history.throughput(run["id"])
+            print(f"{run['id']:>5} {run['started_at']} {run['source']:<16} {run['kind']:<9} "
+                  f"{run['version'] or '-':<10} {'ok ' if run['success'] else 'FAIL'} "
+                  + "  ".join(f"{m} {format_rate(m, v)}" for m, v in throughput.items() if ":" not in m))
+
+    elif args.command == 'versions':
+        for row in history.versions(args.source, kind=args.kind, metric=args.metric):
+            print(f"{row['version'] or '-':<10} {row['label'] or '':<12} {row['runs']:>4} run(s)  "
+                  + "  ".join(f"{m} {format_rate(m, v)}" for m, v in row["metrics"].items()))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Opt-in Stage Profiling for DC Collectors
+========================================
+Wraps named pipeline stages (links, download, process, validate, upload, csv) in
+cProfile and tracemalloc so slow or memory-hungry runs can be profiled
+without editing collector code.
+
+For every profiled stage two files are written to the run's profile
+directory:
+
+- ``<stage>.prof``: cProfile stats, readable with ``pstats`` or snakeviz
+- ``<stage>_alloc.txt``: peak traced memory plus the top-N allocation sites
+
+Stage timings are tracked even when profiling is off (see status()), for
+live progress reporting.
+
+cProfile and tracemalloc are process-wide, so one stage is profiled at a
+time: a stage that starts while another thread's stage is being profiled
+runs unprofiled. Per-stage peak memory needs tracemalloc.reset_peak()
+(Python 3.9+); on older versions the peak since tracing started is reported.
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Stages the collectors know how to wrap
+KNOWN_STAGES = ("links", "download", "process", "validate", "upload", "csv")
+
+
+class StageProfiler:
+    """CPU and memory profiler for named collector stages"""
+
+    def __init__(self, stages: Optional[Iterable[str]] = None, output_dir: str = "profiles",
+                 top_n: int = 25, enabled: bool = True):
+        """
+        Initialize the stage profiler.
+
+        Args:
+            stages: Stage names to profile (None profiles every stage)
+            output_dir: Directory that receives one sub-directory per run
+            top_n: Number of allocation sites to include in each report
+            enabled: If False, every stage() call is a no-op
+        """
+        self.enabled = enabled
+        self.stages = set(stages) if stages else None
+        self.top_n = top_n
+        self.run_dir = Path(output_dir) / datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Held while a stage is profiled; shared by every thread using this profiler
+        self._profile_lock = threading.Lock()
+        self._active = None
+
+        # Live stage timings: running stage -> start times, finished stage -> total seconds
+        self._running: Dict[str, list] = {}
+        self._finished: Dict[str, float] = {}
+        self._status_lock = threading.Lock()
+
+    def is_profiled(self, name: str) -> bool:
+        """Return True if the given stage will be profiled."""
+        if not self.enabled:
+            return False
+        return self.stages is None or name in self.stages
+
+    def status(self) -> Dict[str, Dict[str, float]]:
+        """Seconds spent so far in running stages and in total in finished stages."""
+        now = time.perf_counter()
+        with self._status_lock:
+            running = {name: round(now - min(starts), 1) for name, starts in self._running.items() if starts}
+            return {"running": running, "finished": {k: round(v, 1) for k, v in self._finished.items()}}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Run the wrapped block as the named stage, timing it and profiling it if enabled."""
+        start = time.perf_counter()
+        with self._status_lock:
+            self._running.setdefault(name, []).append(start)
+        try:
+            with self._profiled(name):
+                yield
+        finally:
+            with self._status_lock:
+                self._running[name].remove(start)
+                self._finished[name] = self._finished.get(name, 0.0) + time.perf_counter() - start
+
+    @contextmanager
+    def _profiled(self, name: str):
+        """
+        Profile the wrapped block as the named stage.
+
+        Stages do not overlap: cProfile and tracemalloc are process-wide, so a
+        stage opened while another stage is profiled (nested, or in another
+        thread) runs unprofiled.
+        """
+        if not self.is_profiled(name):
+            yield
+            return
+        if not self._profile_lock.acquire(blocking=False):
+            logger.debug(f"Stage '{name}' overlaps '{self._active}', not profiled separately")
+            yield
+            return
+
+        self._active = name
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+            tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - start
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            self._active = None
+            self._profile_lock.release()
+            self._write_reports(name, profiler, before, after, elapsed, current, peak)
+
+    def _write_reports(self, name: str, profiler: cProfile.Profile, before, after,
+                       elapsed: float, current: int, peak: int):
+        """Write the cProfile dump and the allocation report for a stage."""
+        self.run_dir.mkdir(exist_ok=True, parents=True)
+
+        prof_path = self.run_dir / f"{name}.prof"
+        profiler.dump_stats(str(prof_path))
+
+        # Exclude tracemalloc's own bookkeeping from the report
+        filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+
+        stats_stream = io.StringIO()
+        pstats.Stats(profiler, stream=stats_stream).sort_stats("cumulative").print_stats(self.top_n)
+
+        alloc_path = self.run_dir / f"{name}_alloc.txt"
+        with open(alloc_path, 'w', encoding='utf-8') as f:
+            f.write(f"Stage: {name}\n")
+            f.write(f"Wall time: {elapsed:.2f}s\n")
+            f.write(f"Traced memory at end: {current / 1024 / 1024:.1f} MiB\n")
+            f.write(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB\n")
+            f.write(f"\nTop {self.top_n} allocation sites (growth during stage):\n")
+            for stat in diff[:self.top_n]:
+                f.write(f"  {stat}\n")
+            f.write(f"\nTop {self.top_n} functions by cumulative time:\n")
+            f.write(stats_stream.getvalue())
+
+        logger.info(f"Profiled stage '{name}' in {elapsed:.2f}s "
+                    f"(peak {peak / 1024 / 1024:.1f} MiB) -> {prof_path}")
+
+
+def add_profiling_arguments(parser):
+    """Add the shared --profile* options to an argparse parser."""
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile CPU time and memory of collector stages')
+    parser.add_argument('--profile-stages', default=None,
+                        help=f'Comma-separated stages to profile (default: all of {",".join(KNOWN_STAGES)})')
+    parser.add_argument('--profile-dir', default='profiles',
+                        help='Directory for profile output (default: profiles)')
+    parser.add_argument('--profile-top', type=int, default=25,
+                        help='Number of allocation sites/functions per report (default: 25)')
+
+
+def profiler_from_args(args) -> StageProfiler:
+    """Build a StageProfiler from parsed --profile* options."""
+    stages = None
+    if args.profile_stages:
+        stages = [s.strip() for s in args.profile_stages.split(',') if s.strip()]
+        unknown = set(stages) - set(KNOWN_STAGES)
+        if unknown:
+            logger.warning(f"Unknown profile stages ignored: {', '.join(sorted(unknown))}")
+    return StageProfiler(
+        stages=stages,
+        output_dir=args.profile_dir,
+        top_n=args.profile_top,
+        enabled=args.profile
+    )
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""
+Ranged Downloads
+================
+Downloads large files as parallel HTTP Range requests that resume after an
+interruption, and verifies the assembled body.
+
+Every download starts as a plain streamed GET. If the response is large
+(``min_size``), uncompressed and the server sends ``Accept-Ranges: bytes``,
+the GET is dropped and the file is fetched as ``part_size`` byte ranges,
+``parts`` at a time:
+
+- each part is appended to ``<partial_dir>/<url hash>/part-NNNNN``; a failed
+  part resumes from its last byte, and a new process resumes the parts left
+  on disk as long as the file's length and ETag/Last-Modified are the same
+- ``If-Range`` makes the server send the whole file (200) if it changed in
+  between; the parts are then dropped and the file is downloaded in one piece
+- the body is checked against ``Content-Length`` and, when the server sends
+  one, the ``Digest``/``Repr-Digest`` (SHA-256) or ``Content-MD5`` hash
+
+Smaller files are read from the first GET. If that stream breaks, it resumes
+with a Range request when the server supports ranges and restarts otherwise.
+
+Downloads take an optional Deadline, which caps every request timeout and
+stops retries once it passes. They also take a CancelToken, which closes the
+connection. With a HedgePolicy, a small file that takes longer than the
+usual p95 is requested a second time, and the first copy to arrive is used
+(see src/utils/deadlines.py). Ranged downloads are already parallel and
+resumable, so they are not hedged, and a hedge always reads a single stream
+so it never shares the first attempt's part files. A cancelled ranged
+download keeps its parts for the next attempt.
+
+Try it against a local server that supports ranges and drops connections:
+
+    python -m src.utils.ranged_download --size-mb 64 --rate-mb 8 --fail-rate 0.3
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.compat import chardet
+from requests.utils import get_encoding_from_headers
+
+from src.utils.deadlines import CancelToken, Deadline, HedgePolicy, check_interrupt
+from src.utils.log_setup import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+_CHUNK = 1 << 16
+_MB = 1 << 20
+
+
+class DownloadError(Exception):
+    """A download failed, or its body did not match the server's length or hash"""
+
+
+class _ResourceChanged(Exception):
+    """The file changed on the server while its parts were downloading"""
+
+
+def _validator(headers) -> Optional[str]:
+    """Strong ETag or Last-Modified, for If-Range."""
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return headers.get("Last-Modified")
+
+
+def _range_start(response) -> Optional[int]:
+    """First byte of a 206 response, from its Content-Range ("bytes 100-199/1000" -> 100)."""
+    match = re.match(r"\s*bytes\s+(\d+)-", response.headers.get("Content-Range", ""))
+    return int(match.group(1)) if match else None
+
+
+def _expected_digests(headers) -> List[Tuple[str, bytes]]:
+    """(hashlib name, digest) pairs announced by the server."""
+    digests = []
+    for header in ("Repr-Digest", "Digest"):
+        for match in re.finditer(r'sha-256=:?([A-Za-z0-9+/=]+):?', headers.get(header, ""), re.IGNORECASE):
+            digests.append(("sha256", base64.b64decode(match.group(1))))
+    if headers.get("Content-MD5"):
+        digests.append(("md5", base64.b64decode(headers["Content-MD5"])))
+    return digests
+
+
+class RangedDownloader:
+    """Streamed GETs, switching to parallel resumable Range requests for large files"""
+
+    def __init__(self, session: Optional[requests.Session] = None, parts: int = 4,
+                 part_size: int = 8 * _MB, min_size: int = 16 * _MB,
+                 partial_dir: Optional[str] = None, timeout: float = 30, retries: int = 3,
+                 hedge: Optional[HedgePolicy] = None):
+        """
+        Initialize the downloader.
+
+        Args:
+            session: requests session to use (shared with the caller's other requests)
+            parts: Range requests in flight per large file (1 disables ranged downloads)
+            part_size: Bytes per Range request
+            min_size: Files at least this large are downloaded in ranges
+            partial_dir: Where parts of unfinished downloads are kept (default: a temp directory)
+            timeout: Connect/read timeout per request, in seconds
+            retries: Retries per part (or per stream) after a failed request
+            hedge: Optional policy re-issuing slow single-stream downloads
+        """
+        self.session = session or requests.Session()
+        self.parts = max(1, parts)
+        self.part_size = max(_CHUNK, part_size)
+        self.min_size = min_size
+        self.partial_dir = Path(partial_dir) if partial_dir else Path(tempfile.gettempdir()) / "dc-collectors-partial"
+        self.timeout = timeout
+        self.retries = retries
+        self.hedge = hedge
+
+    # ------------------------------------------------------------------
+    # Public interface
+    # ------------------------------------------------------------------
+
+    def fetch(self, url: str, ranged: bool = True, deadline: Optional[Deadline] = None,
+              cancel: Optional[CancelToken] = None,
+              on_ranged: Optional[Callable[[], None]] = None) -> Tuple[bytes, Dict]:
+        """
+        Download a URL.
+
+        Args:
+            url: URL to download
+            ranged: Allow parallel Range requests for large files
+            deadline: Optional deadline bounding every request and retry
+            cancel: Optional token that stops the download (closing its connection)
+            on_ranged: Called before switching to parallel Range requests
+
+        Returns:
+            (body, response headers)
+
+        Raises:
+            DownloadError: Non-200 response, or the body failed verification
+            requests.exceptions.RequestException: The download failed after all retries
+            DeadlineExceeded, Cancelled: The deadline passed, or the token was cancelled
+        """
+        response = self._get(url, {}, None, deadline, cancel)
+        try:
+            if response.status_code != 200:
+                raise DownloadError(f"Status: {response.status_code}")
+            headers = response.headers
+            length = headers.get("Content-Length", "")
+            length = int(length) if length.isdigit() else None
+            encoded = bool(headers.get("Content-Encoding"))
+            rangeable = headers.get("Accept-Ranges", "").lower() == "bytes" and not encoded
+
+            if ranged and rangeable and length is not None and length >= self.min_size and self.parts > 1:
+                response.close()
+                if on_ranged:
+                    on_ranged()
+                try:
+                    body = self._fetch_parts(url, length, _validator(headers), deadline, cancel)
+                except _ResourceChanged:
+                    logger.warning(f"{url} changed during download; downloading it again in one piece")
+                    return self.fetch(url, ranged=False, deadline=deadline, cancel=cancel)
+            else:
+                body = self._read_stream(url, response, length, rangeable, _validator(headers),
+                                         deadline, cancel)
+        finally:
+            response.close()
+
+        self._verify(url, body, None if encoded else length, headers)
+        return body, headers
+
+    def fetch_text(self, url: str, deadline: Optional[Deadline] = None) -> str:
+        """Download a URL (hedged, if a policy is set) and decode it the way requests' Response.text does."""
+        if self.hedge is None:
+            body, headers = self.fetch(url, deadline=deadline)
+        else:
+            ranged = threading.Event()
+            attempts = []
+            lock = threading.Lock()
+
+            def attempt(cancel: CancelToken):
+                with lock:
+                    first = not attempts
+                    attempts.append(cancel)
+                # Only the first attempt may switch to Range requests. A hedge can start while the
+                # first is still waiting for headers, and two attempts must not share the part files
+                return self.fetch(url, ranged=first, deadline=deadline, cancel=cancel,
+                                  on_ranged=ranged.set if first else None)
+
+            body, headers = self.hedge.call(attempt, deadline=deadline,
+                                            hedge_if=lambda: not ranged.is_set(), label=url)
+        encoding = get_encoding_from_headers(headers) or chardet.detect(body)["encoding"] or "utf-8"
+        return body.decode(encoding, errors="replace")
+
+    # ------------------------------------------------------------------
+    # Single stream
+    # ------------------------------------------------------------------
+
+    def _read_stream(self, url: str, response, length: Optional[int], rangeable: bool,
+                     validator: Optional[str], deadline: Optional[Deadline] = None,
+                     cancel: Optional[CancelToken] = None) -> bytes:
+        """Read a streamed response, resuming (or restarting) it when the connection breaks."""
+        body = bytearray()
+        attempt = 0
+        while True:
+            try:
+                for chunk in response.iter_content(_CHUNK):
+                    check_interrupt(deadline, cancel)
+                    body += chunk
+                if length is not None and len(body) < length and not response.headers.get("Content-Encoding"):
+                    raise DownloadError(f"connection closed after {len(body):,} of {length:,} bytes")
+                return bytes(body)
+            except (requests.exceptions.RequestException, DownloadError) as e:
+                response.close()
+                # A cancelled attempt's connection is closed under it; don't retry
+                check_interrupt(deadline, cancel)
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                self._backoff(attempt, deadline)
+                if rangeable and body:
+                    logger.info(f"Resuming {url} at byte {len(body):,} after: {e}")
+                    response = self._get(url, {"Range": f"bytes={len(body)}-"}, validator, deadline, cancel)
+                    if response.status_code == 206:
+                        if _range_start(response) == len(body):
+                            continue
+                        # Appending a range that starts elsewhere would corrupt the body
+                        logger.warning(f"Restarting {url}: asked for byte {len(body):,}, got "
+                                       f"{response.headers.get('Content-Range')!r}")
+                        response.close()
+                        response = self._get(url, {}, None, deadline, cancel)
+                else:
+                    logger.info(f"Restarting {url} after: {e}")
+                    response = self._get(url, {}, None, deadline, cancel)
+                if response.status_code != 200:
+                    raise DownloadError(f"Status: {response.status_code}")
+                # Full body again (no range support, or the file changed)
+                body.clear()
+
+    def _get(self, url: str, headers: Dict, validator: Optional[str], deadline: Optional[Deadline] = None,
+             cancel: Optional[CancelToken] = None):
+        headers = dict(headers, **{"Accept-Encoding": "identity"}) if "Range" in headers else headers
+        if validator and "Range" in headers:
+            headers["If-Range"] = validator
+        check_interrupt(deadline, cancel)
+        timeout = deadline.timeout(self.timeout) if deadline is not None else self.timeout
+        response = self.session.get(url, headers=headers, stream=True, timeout=timeout)
+        if cancel is not None:
+            cancel.register(response.close)
+        return response
+
+    def _backoff(self, attempt: int, deadline: Optional[Deadline]):
+        delay = min(2 ** attempt, 10) * 0.25
+        remaining = deadline.remaining() if deadline is not None else None
+        time.sleep(delay if remaining is None else min(delay, remaining))
+        if deadline is not None:
+            deadline.check()
+
+    # ------------------------------------------------------------------
+    # Parallel ranges
+    # ------------------------------------------------------------------
+
+    def _fetch_parts(self, url: str, length: int, validator: Optional[str],
+                     deadline: Optional[Deadline] = None, cancel: Optional[CancelToken] = None) -> bytes:
+        """Download a file as parallel byte ranges kept on disk until complete."""
+        state_dir = self.partial_dir / hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        meta = {"url": url, "length": length, "validator": validator, "part_size": self.part_size}
+        meta_path = state_dir / "meta.json"
+        try:
+            resumable = json.loads(meta_path.read_text()) == meta
+        except (OSError, ValueError):
+            resumable = False
+        if resumable:
+            have = sum(p.stat().st_size for p in state_dir.glob("part-*"))
+            logger.info(f"Resuming {url}: {have / _MB:,.1f} of {length / _MB:,.1f} MB already downloaded")
+        else:
+            shutil.rmtree(state_dir, ignore_errors=True)
+            state_dir.mkdir(parents=True)
+            meta_path.write_text(json.dumps(meta))
+
+        ranges = [(state_dir / f"part-{i:05d}", start, min(start + self.part_size, length) - 1)
+                  for i, start in enumerate(range(0, length, self.part_size))]
+        start_time = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=min(self.parts, len(ranges)),
+                                    thread_name_prefix="range") as pool:
+                for _ in pool.map(lambda r: self._fetch_part(url, *r, validator, deadline, cancel), ranges):
+                    pass
+        except _ResourceChanged:
+            shutil.rmtree(state_dir, ignore_errors=True)
+            raise
+
+        body = b"".join(path.read_bytes() for path, _, _ in ranges)
+        if len(body) != length:
+            # A corrupt part on disk: start over next time
+            shutil.rmtree(state_dir, ignore_errors=True)
+            raise DownloadError(f"assembled {len(body):,} bytes, expected {length:,}")
+        shutil.rmtree(state_dir, ignore_errors=True)
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Downloaded {url} ({length / _MB:,.1f} MB) in {len(ranges)} range(s) "
+                    f"in {elapsed:.1f}s")
+        return body
+
+    def _fetch_part(self, url: str, path: Path, start: int, end: int, validator: Optional[str],
+                    deadline: Optional[Deadline] = None, cancel: Optional[CancelToken] = None):
+        """Download bytes start..end (inclusive) into path, resuming from what it holds."""
+        size = end - start + 1
+        for attempt in range(self.retries + 1):
+            have = path.stat().st_size if path.exists() else 0
+            if have >= size:
+                return
+            try:
+                response = self._get(url, {"Range": f"bytes={start + have}-{end}"}, validator, deadline, cancel)
+                with response:
+                    if response.status_code == 200:
+                        raise _ResourceChanged(url)
+                    if response.status_code != 206:
+                        raise DownloadError(f"Status: {response.status_code} for range {start + have}-{end}")
+                    if _range_start(response) != start + have:
+                        raise DownloadError(f"asked for range {start + have}-{end}, got "
+                                            f"{response.headers.get('Content-Range')!r}")
+                    with open(path, 'ab') as f:
+                        for chunk in response.iter_content(_CHUNK):
+                            check_interrupt(deadline, cancel)
+                            f.write(chunk)
+                if path.stat().st_size >= size:
+                    return
+                raise DownloadError(f"range {start}-{end} ended early")
+            except (requests.exceptions.RequestException, DownloadError) as e:
+                check_interrupt(deadline, cancel)
+                if attempt == self.retries:
+                    raise
+                logger.debug("%s of %s interrupted (%s); resuming", path.name, url, e, extra=RATE_LIMITED)
+                self._backoff(attempt, deadline)
+
+    # ------------------------------------------------------------------
+    # Verification
+    # ------------------------------------------------------------------
+
+    def _verify(self, url: str, body: bytes, length: Optional[int], headers):
+        if length is not None and len(body) != length:
+            raise DownloadError(f"{url}: got {len(body):,} bytes, Content-Length is {length:,}")
+        if headers.get("Content-Encoding"):
+            return
+        for algorithm, expected in _expected_digests(headers):
+            if hashlib.new(algorithm, body).digest() != expected:
+                raise DownloadError(f"{url}: {algorithm} of the body does not match the server's digest")
+
+
+if __name__ == "__main__":
+    # Compare a plain GET with ranged downloads against a local stand-in for DPOR
+    import argparse
+    import os
+    import random
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from src.utils.log_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Ranged download demo against a local Range-capable server')
+    parser.add_argument('--size-mb', type=float, default=64, help='Size of the served file')
+    parser.add_argument('--rate-mb', type=float, default=8, help='Bandwidth per connection in MB/s')
+    parser.add_argument('--fail-rate', type=float, default=0.0,
+                        help='Probability that a response is cut off partway')
+    parser.add_argument('--parts', type=int, default=4)
+    parser.add_argument('--part-mb', type=float, default=8)
+    args = parser.parse_args()
+
+    content = os.urandom(int(args.size_mb * _MB))
+    digest = base64.b64encode(hashlib.sha256(content).digest()).decode()
+    etag = '"' + hashlib.md5(content).hexdigest() + '"'
+    random.seed(0)
+
+    class RangeServer(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            start, end = 0, len(content) - 1
+            match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get("Range", ""))
+            partial = bool(match) and self.headers.get("If-Range", etag) == etag
+            if partial:
+                start = int(match.group(1))
+                end = min(int(match.group(2)), end) if match.group(2) else end
+            self.send_response(206 if partial else 200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Repr-Digest", f"sha-256=:{digest}:")
+            self.send_header("Content-Type", "text/plain; charset=utf-8")
+            self.send_header("Content-Length", str(end - start + 1))
+            if partial:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(content)}")
+            self.end_headers()
+
+            cut = end + 1
+            if random.random() < args.fail_rate:
+                cut = random.randint(start, end)
+            pos = start
+            try:
+                while pos < cut:
+                    n = min(_CHUNK, cut - pos)
+                    self.wfile.write(content[pos:pos + n])
+                    pos += n
+                    time.sleep(n / (args.rate_mb * _MB))
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            if cut <= end:
+                self.close_connection = True
+                self.connection.shutdown(2)
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeServer)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/Board_for_Contractors.txt"
+
+    session = requests.Session()
+    for label, parts in (("single stream", 1), (f"{args.parts} ranges", args.parts)):
+        downloader = RangedDownloader(session, parts=parts, part_size=int(args.part_mb * _MB),
+                                      min_size=int(args.part_mb * _MB), retries=10)
+        start = time.perf_counter()
+        body, _ = downloader.fetch(url)
+        elapsed = time.perf_counter() - start
+        status = "verified" if body == content else "MISMATCH"
+        logger.info(f"{label}: {len(body) / _MB:,.1f} MB in {elapsed:.1f}s "
+                    f"({len(body) / _MB / elapsed:,.1f} MB/s), {status}")
+    server.shutdown()
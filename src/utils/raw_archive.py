@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Raw File Archive
+================
+Content-addressed, compressed store of downloaded source files, so datasets
+can be reprocessed later (parser fixes, benchmarks, historical snapshots)
+without hitting the source website again.
+
+Layout under the archive root (one archive per collector):
+
+- ``blobs/<sha[:2]>/<sha256>.gz``: gzip-compressed file content, named by the
+  SHA-256 of the uncompressed bytes. A dataset that hasn't changed since the
+  last run is stored only once.
+- ``index.jsonl``: one line per (date, dataset) -> sha256 entry, appended as
+  files are archived; a later entry for the same key wins.
+
+Replay reads blobs through mmap and decompresses them in one call, so
+reprocessing runs at local disk speed. Collectors fetch archived files through
+``archive://<date>/<dataset>`` URLs (see BaseCollector.fetch_url).
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import mmap
+import os
+import threading
+import zlib
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = Path("data") / "archive"
+ARCHIVE_SCHEME = "archive://"
+
+
+def archive_url(snapshot_date: str, dataset: str) -> str:
+    return f"{ARCHIVE_SCHEME}{snapshot_date}/{dataset}"
+
+
+def parse_archive_url(url: str) -> Tuple[str, str]:
+    """Split an archive:// URL into (date, dataset)."""
+    snapshot_date, _, dataset = url[len(ARCHIVE_SCHEME):].partition('/')
+    return snapshot_date, dataset
+
+
+class RawArchive:
+    """Content-addressed archive of raw downloads, indexed by date and dataset"""
+
+    def __init__(self, root: Optional[str] = None, compresslevel: int = 6):
+        """
+        Open (or create) an archive.
+
+        Args:
+            root: Archive directory (default: data/archive)
+            compresslevel: gzip level for new blobs
+        """
+        self.root = Path(root) if root else DEFAULT_ARCHIVE_DIR
+        self.index_path = self.root / "index.jsonl"
+        self.compresslevel = compresslevel
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[Tuple[str, str], Dict]] = None
+
+    def blob_path(self, sha: str) -> Path:
+        return self.root / "blobs" / sha[:2] / f"{sha}.gz"
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def store(self, dataset: str, text: str, snapshot_date: Optional[str] = None) -> str:
+        """
+        Archive one downloaded file. Safe to call from download threads.
+
+        Args:
+            dataset: Dataset code
+            text: Downloaded file content
+            snapshot_date: Date key (default: today, YYYY-MM-DD)
+
+        Returns:
+            SHA-256 of the content
+        """
+        data = text.encode('utf-8')
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha)
+
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True, parents=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(data, compresslevel=self.compresslevel))
+            os.replace(tmp_path, path)
+
+        entry = {"date": snapshot_date or date.today().isoformat(), "dataset": dataset,
+                 "sha256": sha, "size": len(data), "archived": datetime.now().isoformat()}
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            self.root.mkdir(exist_ok=True, parents=True)
+            with open(self.index_path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            if self._index is not None:
+                self._index[(entry["date"], dataset)] = entry
+
+        return sha
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def index(self) -> Dict[Tuple[str, str], Dict]:
+        """(date, dataset) -> latest index entry."""
+        with self._lock:
+            if self._index is None:
+                index = {}
+                if self.index_path.exists():
+                    with open(self.index_path, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            if line.strip():
+                                entry = json.loads(line)
+                                index[(entry["date"], entry["dataset"])] = entry
+                self._index = index
+            return self._index
+
+    def dates(self) -> List[str]:
+        """Snapshot dates in the archive, oldest first."""
+        return sorted({d for d, _ in self.index()})
+
+    def resolve_date(self, snapshot_date: str) -> str:
+        """Resolve "latest" to the newest snapshot date and check the date exists."""
+        dates = self.dates()
+        if snapshot_date == "latest":
+            if not dates:
+                raise FileNotFoundError(f"Archive {self.root} is empty")
+            return dates[-1]
+        if snapshot_date not in dates:
+            raise FileNotFoundError(f"No snapshot for {snapshot_date} in {self.root} "
+                                    f"(available: {', '.join(dates[-5:]) or 'none'})")
+        return snapshot_date
+
+    def snapshot(self, snapshot_date: str) -> Dict[str, Dict]:
+        """Dataset -> index entry for one date, in dataset order."""
+        snapshot_date = self.resolve_date(snapshot_date)
+        entries = {ds: entry for (d, ds), entry in self.index().items() if d == snapshot_date}
+        return dict(sorted(entries.items()))
+
+    def read_blob(self, sha: str, verify: bool = False) -> str:
+        """Read and decompress a blob through a memory map."""
+        path = self.blob_path(sha)
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            data = zlib.decompress(mm, wbits=31)
+        if verify and hashlib.sha256(data).hexdigest() != sha:
+            raise ValueError(f"Archive blob {path} is corrupt (hash mismatch)")
+        return data.decode('utf-8')
+
+    def load(self, dataset: str, snapshot_date: str = "latest", verify: bool = False) -> str:
+        """Return the archived content of a dataset on a date."""
+        snapshot_date = self.resolve_date(snapshot_date)
+        entry = self.index().get((snapshot_date, dataset))
+        if entry is None:
+            raise KeyError(f"Dataset {dataset} not archived on {snapshot_date}")
+        return self.read_blob(entry["sha256"], verify=verify)
+
+    def load_url(self, url: str) -> str:
+        """Load an archive://<date>/<dataset> URL."""
+        snapshot_date, dataset = parse_archive_url(url)
+        return self.load(dataset, snapshot_date)
+
+    def replay_targets(self, snapshot_date: str) -> List[Tuple[str, str]]:
+        """(dataset, archive URL) targets for every dataset in a snapshot."""
+        snapshot_date = self.resolve_date(snapshot_date)
+        targets = [(ds, archive_url(snapshot_date, ds)) for ds in self.snapshot(snapshot_date)]
+        logger.info(f"Replaying {len(targets)} dataset(s) from archive snapshot {snapshot_date}")
+        return targets
+
+
+def add_archive_arguments(parser):
+    """Add the shared --archive/--replay options to an argparse parser."""
+    parser.add_argument('--archive', action='store_true',
+                        help='Keep every downloaded file in the local raw archive')
+    parser.add_argument('--replay', default=None, metavar='DATE',
+                        help='Process an archived snapshot (YYYY-MM-DD or "latest") instead of downloading')
+    parser.add_argument('--archive-dir', default=None,
+                        help=f'Raw archive root; each collector uses a sub-directory (default: {DEFAULT_ARCHIVE_DIR})')
+
+
+def collector_archive_options(collector: str, archive: bool = False, replay: Optional[str] = None,
+                              archive_dir: Optional[str] = None) -> Dict:
+    """Collector keyword options (archive, replay), with one archive directory per collector."""
+    if not archive and not replay:
+        return {}
+    root = Path(archive_dir) if archive_dir else DEFAULT_ARCHIVE_DIR
+    options = {"archive": RawArchive(root / collector)}
+    if replay:
+        options["replay"] = replay
+    return options
+
+
+def archive_options(args, collector: str) -> Dict:
+    """collector_archive_options() for parsed --archive/--replay options."""
+    return collector_archive_options(collector, args.archive, args.replay, args.archive_dir)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.utils.log_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Inspect a raw file archive')
+    parser.add_argument('root', nargs='?', default=str(DEFAULT_ARCHIVE_DIR / "dpor"),
+                        help='Archive directory (default: data/archive/dpor)')
+    parser.add_argument('--date', default=None, help='List the datasets of one snapshot date')
+    args = parser.parse_args()
+
+    archive = RawArchive(args.root)
+    if args.date:
+        for dataset, entry in archive.snapshot(args.date).items():
+            print(f"{dataset:<20} {entry['size']:>12,} bytes  {entry['sha256'][:12]}")
+    else:
+        index = archive.index()
+        blobs = {e["sha256"] for e in index.values()}
+        paths = [archive.blob_path(sha) for sha in blobs]
+        stored = sum(path.stat().st_size for path in paths if path.exists())
+        for d in archive.dates():
+            entries = [e for (ed, _), e in index.items() if ed == d]
+            print(f"{d}  {len(entries):>5} datasets  {sum(e['size'] for e in entries):>14,} bytes")
+        print(f"{len(blobs)} unique blobs, {stored:,} bytes on disk")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Bounded Record Buffer
+=====================
+A list-like home for a collector's records that keeps at most a memory
+budget of them in RAM and spills the rest to disk, so a full DPOR run fits
+in a small container.
+
+Records are appended in memory until their estimated size passes half the
+budget. That batch is then written as one segment, and the in-memory list
+starts over. Reading a segment back needs about half the budget too, so the
+peak stays near the budget.
+
+A segment is a zlib-compressed pickle of the batch in columnar form: the
+field names once, then one list of values per field. Standardized records
+all share one schema, so this is much smaller than JSON Lines and decodes
+several times faster. Records with a different key set are stored whole.
+
+Sinks (CSV, upload, BBB targets, license store, history, name linking)
+only iterate, which streams segment by segment. ``len()``, indexing and
+slicing are supported too. A slice is a lazy view, used for the per-dataset
+upload spans of checkpointed runs.
+"""
+
+import logging
+import pickle
+import shutil
+import sys
+import tempfile
+import weakref
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MB = 1 << 20
+
+# Re-estimate the record size from every Nth record
+_SAMPLE_EVERY = 1000
+
+
+def record_size(record: Dict) -> int:
+    """Approximate bytes held by a record (dict plus its values; keys are shared)."""
+    return sys.getsizeof(record) + sum(sys.getsizeof(value) for value in record.values())
+
+
+def _encode(records: List[Dict]) -> bytes:
+    fields = tuple(records[0])
+    columns = [[] for _ in fields]
+    others = {}
+    for i, record in enumerate(records):
+        if len(record) == len(fields) and tuple(record) == fields:
+            for column, value in zip(columns, record.values()):
+                column.append(value)
+        else:
+            others[i] = record
+            for column in columns:
+                column.append(None)
+    return zlib.compress(pickle.dumps((fields, columns, others), protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+
+def _decode(data: bytes) -> List[Dict]:
+    fields, columns, others = pickle.loads(zlib.decompress(data))
+    records = [dict(zip(fields, values)) for values in zip(*columns)]
+    for i, record in others.items():
+        records[i] = record
+    return records
+
+
+class SpillingRecordList:
+    """Append-only record list bounded to a memory budget, spilling to disk segments"""
+
+    def __init__(self, memory_budget: int, spill_dir: Optional[str] = None):
+        """
+        Create an empty buffer.
+
+        Args:
+            memory_budget: Bytes of records to keep in memory
+            spill_dir: Parent directory for segment files (default: the system temp directory)
+        """
+        self.memory_budget = max(_MB, memory_budget)
+        parent = Path(spill_dir) if spill_dir else Path(tempfile.gettempdir())
+        parent.mkdir(exist_ok=True, parents=True)
+        self.path = Path(tempfile.mkdtemp(prefix="records-", dir=parent))
+        self._cleanup = weakref.finalize(self, shutil.rmtree, str(self.path), True)
+
+        # (path, first index, record count) per spilled segment
+        self.segments: List[Tuple[Path, int, int]] = []
+        self.spilled = 0
+        self.spilled_bytes = 0
+        self._tail: List[Dict] = []
+        self._record_bytes = 0.0
+        self._samples = 0
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, record: Dict):
+        tail = self._tail
+        if len(tail) % _SAMPLE_EVERY == 0:
+            self._samples += 1
+            self._record_bytes += (record_size(record) - self._record_bytes) / self._samples
+        tail.append(record)
+        if len(tail) * self._record_bytes >= self.memory_budget / 2:
+            self._spill()
+
+    def extend(self, records: Iterable[Dict]):
+        for record in records:
+            self.append(record)
+
+    def _spill(self):
+        data = _encode(self._tail)
+        path = self.path / f"segment-{len(self.segments):05d}.bin"
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.segments.append((path, self.spilled, len(self._tail)))
+        self.spilled += len(self._tail)
+        self.spilled_bytes += len(data)
+        if len(self.segments) == 1:
+            logger.info(f"Record buffer over {self.memory_budget / 2 / _MB:,.0f} MB; spilling to {self.path}")
+        self._tail = []
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self.spilled + len(self._tail)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self._iter_range(0, len(self))
+
+    def _load(self, segment: int) -> List[Dict]:
+        with open(self.segments[segment][0], 'rb') as f:
+            return _decode(f.read())
+
+    def _iter_range(self, start: int, stop: int) -> Iterator[Dict]:
+        # Each iterator reads segments on its own, so several threads can stream at once
+        for segment, (_, first, count) in enumerate(self.segments):
+            if first + count <= start:
+                continue
+            if first >= stop:
+                return
+            records = self._load(segment)
+            yield from records[max(0, start - first):stop - first]
+            del records
+        tail_start = max(0, start - self.spilled)
+        yield from self._tail[tail_start:max(0, stop - self.spilled)]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("SpillingRecordList slices do not support a step")
+            return RecordRange(self, start, max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index >= self.spilled:
+            return self._tail[index - self.spilled]
+        # Random access decodes a whole segment; sinks should iterate instead
+        for segment, (_, first, count) in enumerate(self.segments):
+            if first <= index < first + count:
+                return self._load(segment)[index - first]
+
+    # ------------------------------------------------------------------
+    # Cleanup
+    # ------------------------------------------------------------------
+
+    def close(self):
+        """Delete the spill files and drop all records."""
+        self._cleanup()
+        self.segments = []
+        self.spilled = 0
+        self._tail = []
+
+    def __repr__(self):
+        return (f"SpillingRecordList({len(self):,} records, {len(self.segments)} segment(s), "
+                f"{self.spilled_bytes / _MB:,.1f} MB spilled)")
+
+
+class RecordRange:
+    """Lazy [start, stop) view of a SpillingRecordList"""
+
+    def __init__(self, records: SpillingRecordList, start: int, stop: int):
+        self.records = records
+        self.start = start
+        self.stop = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __bool__(self) -> bool:
+        return self.stop > self.start
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self.records._iter_range(self.start, self.stop)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("RecordRange slices do not support a step")
+            return RecordRange(self.records, self.start + start, self.start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.records[self.start + index]
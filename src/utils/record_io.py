@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Record Spill Files
+==================
+Write and stream standardized records to/from gzip-compressed JSON Lines
+files. Used to hand records between pipeline stages that don't share memory
+(queue workers, checkpointed runs).
+"""
+
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator
+
+
+def write_records(path, records: Iterable[Dict]) -> int:
+    """
+    Write records to a .jsonl.gz file atomically.
+
+    The file is written under a temporary name and renamed into place, so a
+    crash never leaves a truncated spill file behind.
+
+    Returns:
+        Number of records written
+    """
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+
+    count = 0
+    with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=1) as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_records(path) -> Iterator[Dict]:
+    """Stream records from a .jsonl.gz file written by write_records()."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def write_text(path, text: str):
+    """Write a raw text payload (e.g. a downloaded TSV) atomically."""
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True, parents=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def read_text(path) -> str:
+    """Read a raw text payload written by write_text()."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
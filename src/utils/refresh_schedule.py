@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Change-Rate Aware Refresh Scheduling
+====================================
+Learns how often each dataset actually changes and plans each run to
+re-download only the datasets likely to have changed, within a bandwidth
+budget.
+
+Each download is hashed and compared with the previous one. Per dataset the
+scheduler keeps exponentially decayed counts of observed changes and observed
+days, which gives a change rate (a Poisson rate with a gamma prior):
+
+    rate = (changes + prior_changes) / (observed_days + prior_days)
+
+The probability that a dataset has changed since it was last checked is
+``1 - exp(-rate * days_since_check)``. A plan takes:
+
+1. new datasets, and datasets not checked for ``max_age_days``
+2. the rest whose change probability is at least ``min_probability``, by
+   probability per byte, until ``budget_bytes`` is used
+
+So fast-moving boards (contractors, real estate) are fetched every run and
+static ones every few weeks. Downloads whose content is unchanged are not
+parsed or uploaded again. Observations are saved only after a successful
+run, so a failed upload is retried.
+
+State is one JSON file per collector: ``data/refresh/<collector>.json``.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_DIR = Path("data") / "refresh"
+
+_DAY = 86400.0
+
+
+class RefreshScheduler:
+    """Per-dataset change-rate model and refresh planner for one collector"""
+
+    def __init__(self, collector: str, path: Optional[str] = None, budget_bytes: Optional[int] = None,
+                 max_age_days: float = 30.0, min_probability: float = 0.25,
+                 prior_changes: float = 1.0, prior_days: float = 7.0, half_life_days: float = 90.0,
+                 skip_unchanged: bool = True):
+        """
+        Load the collector's refresh history.
+
+        Args:
+            collector: Collector name
+            path: History file (default: data/refresh/<collector>.json)
+            budget_bytes: Download budget per run (None = unlimited)
+            max_age_days: Always refresh datasets not checked for this long
+            min_probability: Skip datasets less likely than this to have changed
+            prior_changes: Prior change count (with prior_days: one change a week)
+            prior_days: Prior observed days
+            half_life_days: Older observations count half after this long, so rates can drift
+            skip_unchanged: Drop downloads identical to the previous one before parsing
+        """
+        self.collector = collector
+        self.path = Path(path) if path else DEFAULT_REFRESH_DIR / f"{collector}.json"
+        self.budget_bytes = budget_bytes
+        self.max_age_days = max_age_days
+        self.min_probability = min_probability
+        self.prior_changes = prior_changes
+        self.prior_days = prior_days
+        self.half_life_days = half_life_days
+        self.skip_unchanged = skip_unchanged
+
+        self.datasets: Dict[str, Dict] = self._load()
+        self._observed: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read refresh history {self.path}: {e}")
+            return {}
+
+    # ------------------------------------------------------------------
+    # Model
+    # ------------------------------------------------------------------
+
+    def rate(self, code: str) -> float:
+        """Estimated changes per day."""
+        entry = self.datasets.get(code) or {}
+        return ((entry.get("changes", 0.0) + self.prior_changes)
+                / (entry.get("observed_days", 0.0) + self.prior_days))
+
+    def days_since_check(self, code: str, now: Optional[datetime] = None) -> Optional[float]:
+        entry = self.datasets.get(code)
+        if not entry or not entry.get("last_checked"):
+            return None
+        now = now or datetime.now()
+        return max(0.0, (now - datetime.fromisoformat(entry["last_checked"])).total_seconds() / _DAY)
+
+    def change_probability(self, code: str, now: Optional[datetime] = None) -> float:
+        """Probability that the dataset changed since it was last checked (1.0 if never checked)."""
+        age = self.days_since_check(code, now)
+        if age is None:
+            return 1.0
+        return 1.0 - math.exp(-self.rate(code) * age)
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    def plan(self, targets: List[Tuple[str, str]], now: Optional[datetime] = None) -> List[Tuple[str, str]]:
+        """
+        Choose which (dataset, url) targets to download this run.
+
+        Args:
+            targets: All candidate targets
+            now: Planning time (default: now)
+
+        Returns:
+            Selected targets, in their original order
+        """
+        now = now or datetime.now()
+        known_sizes = [e["size"] for e in self.datasets.values() if e.get("size")]
+        default_size = sorted(known_sizes)[len(known_sizes) // 2] if known_sizes else 0
+
+        required, optional, skipped = [], [], 0
+        for code, url in targets:
+            age = self.days_since_check(code, now)
+            probability = self.change_probability(code, now)
+            size = (self.datasets.get(code) or {}).get("size") or default_size
+            if age is None or age >= self.max_age_days:
+                required.append((code, probability, size))
+            elif probability >= self.min_probability:
+                optional.append((code, probability, size))
+            else:
+                skipped += 1
+
+        selected = {code for code, _, _ in required}
+        used = sum(size for _, _, size in required)
+        if self.budget_bytes is not None and used > self.budget_bytes:
+            logger.warning(f"Refresh plan: {len(required)} new or overdue dataset(s) alone need "
+                           f"{used / 1e6:,.1f} MB, over the {self.budget_bytes / 1e6:,.1f} MB budget")
+
+        # Most likely change per byte first
+        over_budget = 0
+        for code, probability, size in sorted(optional, key=lambda c: c[1] / max(c[2], 1), reverse=True):
+            if self.budget_bytes is not None and used + size > self.budget_bytes:
+                over_budget += 1
+                continue
+            selected.add(code)
+            used += size
+
+        expected = sum(self.change_probability(code, now) for code in selected)
+        total = sum((self.datasets.get(code) or {}).get("size") or default_size for code, _ in targets)
+        logger.info(f"Refresh plan: {len(selected)} of {len(targets)} dataset(s), ~{used / 1e6:,.1f} of "
+                    f"{total / 1e6:,.1f} MB, {expected:.1f} expected to have changed "
+                    f"({len(required)} new or overdue; skipped {skipped} unlikely changed"
+                    + (f", {over_budget} over budget" if over_budget else "") + ")")
+        return [(code, url) for code, url in targets if code in selected]
+
+    # ------------------------------------------------------------------
+    # Observations
+    # ------------------------------------------------------------------
+
+    def observe(self, code: str, text: str, now: Optional[datetime] = None) -> bool:
+        """
+        Record a download of a dataset (kept in memory until save()).
+
+        Returns:
+            True if the content differs from the previous download (or is new)
+        """
+        now = now or datetime.now()
+        sha = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        previous = self.datasets.get(code) or {}
+        changed = previous.get("sha256") != sha
+
+        entry = dict(previous)
+        age = self.days_since_check(code, now)
+        if age is not None:
+            decay = 0.5 ** (age / self.half_life_days)
+            entry["changes"] = entry.get("changes", 0.0) * decay + (1.0 if changed else 0.0)
+            entry["observed_days"] = entry.get("observed_days", 0.0) * decay + age
+        entry.update(sha256=sha, size=len(text), last_checked=now.isoformat(timespec='seconds'),
+                     checks=entry.get("checks", 0) + 1)
+        if changed:
+            entry["last_changed"] = now.isoformat(timespec='seconds')
+
+        with self._lock:
+            self._observed[code] = entry
+        return changed
+
+    @property
+    def pending(self) -> int:
+        """Observations not yet saved."""
+        return len(self._observed)
+
+    def filter_unchanged(self, downloads: Dict[str, str]) -> Dict[str, str]:
+        """observe() every download and, with skip_unchanged, drop the ones that didn't change."""
+        changed = {code: text for code, text in downloads.items() if self.observe(code, text)}
+        if not self.skip_unchanged:
+            return downloads
+        if len(changed) < len(downloads):
+            logger.info(f"Skipping {len(downloads) - len(changed)} unchanged dataset(s); "
+                        f"{len(changed)} changed")
+        return changed
+
+    def save(self):
+        """Commit this run's observations (call after the run succeeded)."""
+        with self._lock:
+            if not self._observed:
+                return
+            # Re-read so concurrent shards' observations survive
+            self.datasets = self._load()
+            self.datasets.update(self._observed)
+            self._observed = {}
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.datasets, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Refresh history saved: {self.path}")
+
+
+def add_refresh_arguments(parser):
+    """Add the shared refresh scheduling options to an argparse parser."""
+    parser.add_argument('--refresh', action='store_true',
+                        help='Only download datasets likely to have changed, based on their change history')
+    parser.add_argument('--refresh-budget', type=float, default=None, metavar='MB',
+                        help='Download budget per run for --refresh (default: unlimited)')
+    parser.add_argument('--refresh-max-age', type=float, default=30.0, metavar='DAYS',
+                        help='With --refresh, always download datasets not checked for this long (default: 30)')
+
+
+def refresh_scheduler(collector: str, refresh: bool = False, budget_mb: Optional[float] = None,
+                      max_age_days: float = 30.0) -> Optional[RefreshScheduler]:
+    """RefreshScheduler for a collector, or None if refresh scheduling is off."""
+    if not refresh:
+        return None
+    budget = int(budget_mb * 1e6) if budget_mb is not None else None
+    return RefreshScheduler(collector, budget_bytes=budget, max_age_days=max_age_days)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.utils.log_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Show learned dataset change rates and a refresh plan')
+    parser.add_argument('collector', nargs='?', default='dpor', help='Collector name (default: dpor)')
+    parser.add_argument('--path', default=None, help='History file (default: data/refresh/<collector>.json)')
+    parser.add_argument('--budget', type=float, default=None, metavar='MB', help='Plan with this budget')
+    parser.add_argument('--max-age', type=float, default=30.0, metavar='DAYS')
+    args = parser.parse_args()
+
+    scheduler = RefreshScheduler(args.collector, path=args.path, max_age_days=args.max_age,
+                                 budget_bytes=int(args.budget * 1e6) if args.budget is not None else None)
+    now = datetime.now()
+    print(f"{'dataset':<12} {'changes/day':>11} {'every':>9} {'p(changed)':>10} {'size MB':>9}  last changed")
+    for code in sorted(scheduler.datasets, key=scheduler.rate, reverse=True):
+        entry = scheduler.datasets[code]
+        rate = scheduler.rate(code)
+        print(f"{code:<12} {rate:>11.3f} {1 / rate:>8.1f}d {scheduler.change_probability(code, now):>10.2f} "
+              f"{entry.get('size', 0) / 1e6:>9.2f}  {entry.get('last_changed', '-')}")
+    planned = scheduler.plan([(code, "") for code in sorted(scheduler.datasets)], now)
+    print(f"\nWould refresh now: {', '.join(code for code, _ in planned) or 'nothing'}")
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Durable Task Queue
+==================
+A lease-based work queue stored in SQLite (a file shared by local workers)
+or Postgres (shared across hosts). Tasks are per-dataset pipeline steps
+(download, process, upload) with a state, retry count and lease.
+
+- claim() atomically leases the oldest runnable task: pending and available,
+  or leased by a worker whose lease has expired (crashed or killed).
+- A task whose lease expires on its last attempt is marked failed by sweep()
+  (run by claim() and is_drained()), so a task that kills its worker is not
+  retried forever.
+- complete() marks a task done; fail() puts it back with a retry delay, or
+  marks it failed once max_attempts is reached.
+- keep_alive() renews a lease in the background while a long task runs.
+
+Any number of worker processes can share one queue.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import create_engine, event, text
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS collector_tasks (
+    id {id_type},
+    run_id VARCHAR(64) NOT NULL,
+    kind VARCHAR(32) NOT NULL,
+    dataset VARCHAR(128) NOT NULL,
+    payload TEXT NOT NULL DEFAULT '{{}}',
+    state VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at DOUBLE PRECISION NOT NULL DEFAULT 0,
+    lease_owner VARCHAR(255),
+    lease_expires DOUBLE PRECISION,
+    last_error TEXT,
+    created_at DOUBLE PRECISION NOT NULL,
+    updated_at DOUBLE PRECISION NOT NULL,
+    UNIQUE (run_id, kind, dataset)
+)
+"""
+
+_INDEX = """
+CREATE INDEX IF NOT EXISTS ix_collector_tasks_runnable
+ON collector_tasks (state, available_at, id)
+"""
+
+
+class Task:
+    """A leased unit of work"""
+
+    def __init__(self, row: Dict):
+        self.id = row["id"]
+        self.run_id = row["run_id"]
+        self.kind = row["kind"]
+        self.dataset = row["dataset"]
+        self.payload = json.loads(row["payload"] or "{}")
+        self.attempts = row["attempts"]
+        self.max_attempts = row["max_attempts"]
+        self.lease_owner = row["lease_owner"]
+
+    def __repr__(self):
+        return f"Task({self.id}, {self.kind}, {self.dataset}, attempt {self.attempts})"
+
+
+def default_owner() -> str:
+    """Worker identity used for leases: host:pid:thread."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class TaskQueue:
+    """Lease-based task queue backed by SQLite or Postgres"""
+
+    def __init__(self, location: str = "data/tasks.db", lease_seconds: int = 900,
+                 retry_delay: float = 30.0):
+        """
+        Initialize the queue.
+
+        Args:
+            location: SQLite file path, or a SQLAlchemy URL (e.g. postgresql://...)
+            lease_seconds: How long a claimed task stays leased without renewal
+            retry_delay: Base delay before a failed task is retried (doubles per attempt)
+        """
+        if "://" in location:
+            url = location
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(location)), exist_ok=True)
+            url = f"sqlite:///{location}"
+
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        self.is_sqlite = url.startswith("sqlite")
+
+        if self.is_sqlite:
+            self.engine = create_engine(url, connect_args={"timeout": 60})
+
+            @event.listens_for(self.engine, "connect")
+            def _sqlite_pragmas(dbapi_connection, _):
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.close()
+        else:
+            self.engine = create_engine(url, pool_size=2, max_overflow=0)
+
+        id_type = "INTEGER PRIMARY KEY AUTOINCREMENT" if self.is_sqlite else "BIGSERIAL PRIMARY KEY"
+        with self.engine.begin() as conn:
+            conn.execute(text(_SCHEMA.format(id_type=id_type)))
+            conn.execute(text(_INDEX))
+
+    def enqueue(self, run_id: str, kind: str, dataset: str, payload: Optional[Dict] = None,
+                max_attempts: int = 3) -> bool:
+        """
+        Add a task unless (run_id, kind, dataset) already exists.
+
+        Returns:
+            True if a new task was created
+        """
+        return self.enqueue_many(run_id, kind, [(dataset, payload or {})], max_attempts) == 1
+
+    def enqueue_many(self, run_id: str, kind: str, items: Iterable, max_attempts: int = 3) -> int:
+        """Add (dataset, payload) tasks in one transaction; existing ones are left alone."""
+        now = time.time()
+        rows = [
+            {"run_id": run_id, "kind": kind, "dataset": dataset, "payload": json.dumps(payload or {}),
+             "max_attempts": max_attempts, "now": now}
+            for dataset, payload in items
+        ]
+        if not rows:
+            return 0
+
+        conflict = "ON CONFLICT (run_id, kind, dataset) DO NOTHING"
+        query = text(f"""
+            INSERT INTO collector_tasks
+                (run_id, kind, dataset, payload, max_attempts, created_at, updated_at)
+            VALUES (:run_id, :kind, :dataset, :payload, :max_attempts, :now, :now)
+            {conflict}
+        """)
+        with self.engine.begin() as conn:
+            created = 0
+            for row in rows:
+                created += conn.execute(query, row).rowcount
+        return created
+
+    def claim(self, owner: Optional[str] = None, kinds: Optional[List[str]] = None,
+              run_id: Optional[str] = None) -> Optional[Task]:
+        """
+        Atomically lease the oldest runnable task.
+
+        The claim is a single UPDATE whose outer WHERE re-checks the task state,
+        so two workers racing for the same row can't both win.
+
+        Args:
+            owner: Worker identity (default: host:pid:thread)
+            kinds: Only claim these task kinds
+            run_id: Only claim tasks from this run
+
+        Returns:
+            The leased Task, or None if nothing is runnable
+        """
+        owner = owner or default_owner()
+        now = time.time()
+        params = {"owner": owner, "now": now, "expires": now + self.lease_seconds}
+
+        filters = ""
+        if kinds:
+            placeholders = ", ".join(f":kind{i}" for i in range(len(kinds)))
+            filters += f" AND kind IN ({placeholders})"
+            params.update({f"kind{i}": k for i, k in enumerate(kinds)})
+        if run_id:
+            filters += " AND run_id = :run_id"
+            params["run_id"] = run_id
+
+        runnable = ("((state = 'pending' AND available_at <= :now) "
+                    "OR (state = 'leased' AND lease_expires < :now AND attempts < max_attempts))")
+        lock = "" if self.is_sqlite else " FOR UPDATE SKIP LOCKED"
+
+        query = text(f"""
+            UPDATE collector_tasks
+            SET state = 'leased', lease_owner = :owner, lease_expires = :expires,
+                attempts = attempts + 1, updated_at = :now
+            WHERE id = (
+                SELECT id FROM collector_tasks
+                WHERE {runnable}{filters}
+                ORDER BY id
+                LIMIT 1{lock}
+            )
+            AND {runnable}
+            RETURNING id, run_id, kind, dataset, payload, attempts, max_attempts, lease_owner
+        """)
+
+        self.sweep(run_id)
+        with self.engine.begin() as conn:
+            row = conn.execute(query, params).mappings().first()
+
+        return Task(dict(row)) if row else None
+
+    def sweep(self, run_id: Optional[str] = None) -> int:
+        """
+        Fail tasks whose lease expired on their last attempt (the worker died running them).
+
+        Returns:
+            Number of tasks marked failed
+        """
+        now = time.time()
+        query = """
+            UPDATE collector_tasks
+            SET state = 'failed', lease_owner = NULL, lease_expires = NULL, updated_at = :now,
+                last_error = COALESCE(last_error, 'lease expired; the worker stopped before finishing')
+            WHERE state = 'leased' AND lease_expires < :now AND attempts >= max_attempts
+        """
+        params = {"now": now}
+        if run_id:
+            query += " AND run_id = :run_id"
+            params["run_id"] = run_id
+        with self.engine.begin() as conn:
+            failed = conn.execute(text(query), params).rowcount
+        if failed:
+            logger.error(f"{failed} task(s) failed permanently: lease expired after the last attempt")
+        return failed
+
+    def renew(self, task: Task) -> bool:
+        """Extend a task's lease. Returns False if the lease was lost to another worker."""
+        now = time.time()
+        with self.engine.begin() as conn:
+            updated = conn.execute(text("""
+                UPDATE collector_tasks SET lease_expires = :expires, updated_at = :now
+                WHERE id = :id AND state = 'leased' AND lease_owner = :owner
+            """), {"expires": now + self.lease_seconds, "now": now, "id": task.id,
+                   "owner": task.lease_owner}).rowcount
+        return updated == 1
+
+    @contextmanager
+    def keep_alive(self, task: Task):
+        """Renew the task's lease in a background thread while the block runs."""
+        stop = threading.Event()
+
+        def renew_loop():
+            while not stop.wait(self.lease_seconds / 3):
+                if not self.renew(task):
+                    logger.warning(f"Lost lease on {task}")
+                    return
+
+        thread = threading.Thread(target=renew_loop, name=f"lease-{task.id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(self, task: Task):
+        """Mark a leased task as done."""
+        self._finish(task, DONE, None, 0)
+
+    def fail(self, task: Task, error: str):
+        """Record a failure: retry later with backoff, or give up after max_attempts."""
+        if task.attempts >= task.max_attempts:
+            logger.error(f"{task} failed permanently: {error}")
+            self._finish(task, FAILED, error, 0)
+        else:
+            delay = self.retry_delay * (2 ** (task.attempts - 1))
+            logger.warning(f"{task} failed, retrying in {delay:.0f}s: {error}")
+            self._finish(task, PENDING, error, delay)
+
+    def _finish(self, task: Task, state: str, error: Optional[str], delay: float):
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(text("""
+                UPDATE collector_tasks
+                SET state = :state, last_error = :error, available_at = :available_at,
+                    lease_owner = NULL, lease_expires = NULL, updated_at = :now
+                WHERE id = :id AND lease_owner = :owner
+            """), {"state": state, "error": error, "available_at": now + delay, "now": now,
+                   "id": task.id, "owner": task.lease_owner})
+
+    def counts(self, run_id: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Task counts by kind and state, e.g. {"download": {"done": 140, "pending": 3}}."""
+        query = "SELECT kind, state, COUNT(*) AS n FROM collector_tasks"
+        params = {}
+        if run_id:
+            query += " WHERE run_id = :run_id"
+            params["run_id"] = run_id
+        query += " GROUP BY kind, state"
+
+        counts: Dict[str, Dict[str, int]] = {}
+        with self.engine.connect() as conn:
+            for kind, state, n in conn.execute(text(query), params):
+                counts.setdefault(kind, {})[state] = n
+        return counts
+
+    def is_drained(self, run_id: Optional[str] = None) -> bool:
+        """True if no task is pending or leased."""
+        self.sweep(run_id)
+        return not any(state in (PENDING, LEASED)
+                       for states in self.counts(run_id).values() for state in states)
@@ -7,39 +7,72 @@ Based on oklahoma_collectors pattern.
 
 import sys
 import json
+import threading
 import requests
 import urllib3
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 from tqdm import tqdm
 import logging
 
+from src.utils.deadlines import CancelToken, Deadline, DeadlineExceeded, HedgePolicy
+from src.utils.log_setup import RATE_LIMITED
+from src.utils.normalize import BatchNormalizer, DateNormalizer, clean_string
+
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+DEFAULT_QUARANTINE_DIR = Path("data") / "quarantine"
+
+# Responses that reject the batch's content, so a smaller batch may succeed.
+# Auth errors, throttling and server errors (500-504) are not bisected: an
+# outage would otherwise send ~2n requests and quarantine good records.
+REJECTED_STATUSES = {400, 409, 413, 422}
+
+_quarantine_lock = threading.Lock()
+
 
 class VKBulkUploader:
     """Bulk uploader for Visual Knowledge API"""
 
-    def __init__(self, dry_run: bool = False, batch_size: int = 5000):
+    def __init__(self, dry_run: bool = False, batch_size: int = 5000, normalize: bool = False,
+                 bisect: bool = True, max_quarantine: int = 100, quarantine_path: Optional[str] = None,
+                 deadline: Optional[Deadline] = None, hedge: Optional[HedgePolicy] = None):
         """
         Initialize the bulk uploader.
 
         Args:
             dry_run: If True, don't actually upload data
             batch_size: Number of records to upload per batch
+            normalize: If True, clean text fields and format dates of each batch before sending
+            bisect: Split rejected batches to isolate the offending records
+            max_quarantine: Stop bisecting once this many records were quarantined
+                (a batch rejected as a whole for another reason then just fails)
+            quarantine_path: JSONL file for rejected records
+                (default: data/quarantine/upload_<timestamp>.jsonl, created on first use)
+            deadline: Optional upload stage deadline; it caps request timeouts, and
+                batches left when it passes fail without being sent
+            hedge: Optional policy re-sending slow batches (only safe if the API
+                ignores duplicate batches; see src/utils/deadlines.py)
         """
         self.api_url = 'https://api.visualknowledgeportal.com:5005/upload_point/false'
         self.dry_run = dry_run
         self.batch_size = batch_size
+        self.normalizer = BatchNormalizer() if normalize else None
+        self._dates = DateNormalizer()
+        self.bisect = bisect
+        self.max_quarantine = max_quarantine
+        self.quarantine_path = Path(quarantine_path) if quarantine_path else (
+            DEFAULT_QUARANTINE_DIR / f"upload_{datetime.now():%Y%m%d_%H%M%S}.jsonl")
+        self.quarantined = 0
+        self.deadline = deadline
+        self.hedge = hedge
+        self.timeout = 30
+        self._deadline_logged = False
         self.headers = {
             'Accept': '*/*',
             'Accept-Language': 'en-US,en;q=0.9',
@@ -55,27 +88,11 @@ class VKBulkUploader:
 
     def clean_string(self, text: str) -> str:
         """Clean string for database insertion."""
-        if not text:
-            return 'NA'
-        # Remove problematic characters
-        return str(text).replace(',', '').replace("'", '').replace('"', '').strip()
+        return clean_string(text)
 
     def format_date(self, date_str: str) -> str:
         """Format date string to MM/DD/YYYY or return NA."""
-        if not date_str or date_str == 'NA':
-            return 'NA'
-
-        try:
-            # Try parsing various date formats
-            for fmt in ['%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%d', '%b %d, %Y', '%m/%d/%Y']:
-                try:
-                    dt = datetime.strptime(date_str, fmt)
-                    return dt.strftime('%m/%d/%Y')
-                except:
-                    continue
-            return date_str  # Return as-is if no format matches
-        except:
-            return 'NA'
+        return self._dates.format_date(date_str)
 
     def upload_batch(self, batch: List[Dict], batch_num: int, total_batches: int) -> bool:
         """
@@ -89,29 +106,124 @@ class VKBulkUploader:
         Returns:
             True if successful, False otherwise
         """
+        if self.normalizer:
+            batch = self.normalizer.normalize_batch(batch)
+        ok, _, _ = self._post_batch(batch, batch_num)
+        return ok
+
+    def _post_batch(self, batch: List[Dict], batch_num: int,
+                    quiet: bool = False) -> Tuple[bool, Optional[int], str]:
+        """
+        POST one batch.
+
+        Returns:
+            (success, HTTP status or None if no response, response text or error)
+        """
         payload = {"results": batch}
+        log = logger.debug if quiet else logger.warning
+
+        if self.deadline is not None and self.deadline.expired:
+            if not self._deadline_logged:
+                self._deadline_logged = True
+                logger.warning(f"Upload deadline reached at batch {batch_num}; remaining batches are not sent")
+            return False, None, "deadline"
 
         try:
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self.headers,
-                verify=False,
-                timeout=30
-            )
+            if self.hedge is not None:
+                response = self.hedge.call(lambda cancel: self._post(payload, cancel),
+                                           deadline=self.deadline, label=f"batch {batch_num}")
+            else:
+                response = self._post(payload)
 
             if response.status_code == 200:
-                return True
+                return True, 200, ""
             else:
-                logger.warning(f"Batch {batch_num} failed with status {response.status_code}")
-                return False
+                log("Batch %d failed with status %d", batch_num, response.status_code, extra=RATE_LIMITED)
+                return False, response.status_code, response.text
 
-        except requests.exceptions.Timeout:
-            logger.error(f"Batch {batch_num} timed out")
-            return False
+        except (requests.exceptions.Timeout, DeadlineExceeded):
+            log("Batch %d timed out", batch_num, extra=RATE_LIMITED)
+            return False, None, "timeout"
         except Exception as e:
-            logger.error(f"Batch {batch_num} error: {str(e)}")
-            return False
+            log("Batch %d error: %s", batch_num, e, extra=RATE_LIMITED)
+            return False, None, str(e)
+
+    def _post(self, payload: Dict, cancel: Optional[CancelToken] = None):
+        """POST a payload, within the deadline; a cancelled attempt's connection is closed."""
+        timeout = self.deadline.timeout(self.timeout) if self.deadline is not None else self.timeout
+        if cancel is None:
+            return requests.post(self.api_url, json=payload, headers=self.headers, verify=False, timeout=timeout)
+        with requests.Session() as session:
+            cancel.register(session.close)
+            return session.post(self.api_url, json=payload, headers=self.headers, verify=False, timeout=timeout)
+
+    def send_batch(self, batch: List[Dict], batch_num: int) -> Tuple[int, int, int]:
+        """
+        Upload a batch, bisecting a rejected batch down to the records the API refuses.
+
+        Refused records are written to the quarantine file with the server's
+        response; every other record in the batch is still uploaded. A rejected
+        batch is assumed to be rejected as a whole (nothing from it was stored).
+
+        Args:
+            batch: List of records to upload
+            batch_num: Batch number for logs and the quarantine file
+
+        Returns:
+            (uploaded, quarantined, failed) record counts
+        """
+        if self.normalizer:
+            batch = self.normalizer.normalize_batch(batch)
+
+        ok, status, detail = self._post_batch(batch, batch_num)
+        if ok:
+            return len(batch), 0, 0
+        if not self.bisect or status not in REJECTED_STATUSES:
+            return 0, 0, len(batch)
+
+        logger.info(f"Batch {batch_num} rejected ({status}); bisecting {len(batch):,} records")
+        counts = self._bisect(batch, batch_num, status, detail)
+        logger.info(f"Batch {batch_num}: {counts[0]:,} uploaded, {counts[1]:,} quarantined, "
+                    f"{counts[2]:,} failed")
+        return counts
+
+    def _bisect(self, batch: List[Dict], batch_num: int, status: int, detail: str) -> Tuple[int, int, int]:
+        """Upload the halves of a rejected batch, recursing into rejected halves."""
+        if len(batch) == 1:
+            self._quarantine(batch[0], batch_num, status, detail)
+            return 0, 1, 0
+        if self.quarantined >= self.max_quarantine:
+            logger.warning(f"Batch {batch_num}: quarantine limit of {self.max_quarantine} records "
+                           f"reached; {len(batch):,} rejected records not bisected")
+            return 0, 0, len(batch)
+
+        uploaded = quarantined = failed = 0
+        middle = len(batch) // 2
+        for half in (batch[:middle], batch[middle:]):
+            ok, half_status, half_detail = self._post_batch(half, batch_num, quiet=True)
+            if ok:
+                uploaded += len(half)
+                continue
+            if half_status not in REJECTED_STATUSES:
+                failed += len(half)
+                continue
+            counts = self._bisect(half, batch_num, half_status, half_detail)
+            uploaded += counts[0]
+            quarantined += counts[1]
+            failed += counts[2]
+        return uploaded, quarantined, failed
+
+    def _quarantine(self, record: Dict, batch_num: int, status: int, detail: str):
+        """Append a refused record and the server's response to the quarantine file."""
+        entry = {"quarantined": datetime.now().isoformat(), "batch": batch_num,
+                 "status": status, "response": detail[:2000], "record": record}
+        with _quarantine_lock:
+            self.quarantine_path.parent.mkdir(exist_ok=True, parents=True)
+            with open(self.quarantine_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            self.quarantined += 1
+        if self.quarantined == 1:
+            logger.warning(f"Quarantining rejected records in {self.quarantine_path}")
 
     def upload_data(self, records: List[Dict]) -> Dict[str, any]:
         """
@@ -134,49 +246,99 @@ class VKBulkUploader:
             logger.info(f"Sample record:\n{json.dumps(records[0], indent=2)}")
             return {"success": True, "total": len(records), "uploaded": 0, "dry_run": True}
 
-        # Calculate batches
         total_batches = (len(records) + self.batch_size - 1) // self.batch_size
+        logger.info(f"Uploading in {total_batches} batches of up to {self.batch_size} records each")
+        return self.upload_stream(records, total=len(records))
+
+    def iter_batches(self, records: Iterable[Dict]) -> Iterator[List[Dict]]:
+        """Yield lists of up to batch_size records from any iterable."""
+        iterator = iter(records)
+        while True:
+            batch = list(islice(iterator, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def upload_stream(self, records: Iterable[Dict], total: Optional[int] = None) -> Dict[str, any]:
+        """
+        Upload records from an iterable without materializing them all.
+
+        Args:
+            records: Iterable of standardized records (e.g. a collector's record stream)
+            total: Expected record count, if known, for progress reporting
+
+        Returns:
+            Dictionary with upload statistics (same keys as upload_data)
+        """
+        total_batches = (total + self.batch_size - 1) // self.batch_size if total else None
         successful_batches = 0
         failed_batches = 0
+        record_count = 0
+        uploaded = 0
+        quarantined = 0
+        failed = 0
 
-        logger.info(f"Uploading in {total_batches} batches of up to {self.batch_size} records each")
+        if self.dry_run:
+            logger.info("DRY RUN MODE - Not uploading data")
 
-        # Upload with progress bar
         with tqdm(total=total_batches, desc="Uploading batches") as pbar:
-            for i in range(0, len(records), self.batch_size):
-                batch = records[i:i + self.batch_size]
-                batch_num = i // self.batch_size + 1
+            for batch_num, batch in enumerate(self.iter_batches(records), start=1):
+                if self.dry_run and record_count == 0:
+                    logger.info(f"Sample record:\n{json.dumps(batch[0], indent=2)}")
+                record_count += len(batch)
 
-                success = self.upload_batch(batch, batch_num, total_batches)
+                if self.dry_run:
+                    pbar.update(1)
+                    continue
 
-                if success:
-                    successful_batches += 1
-                    pbar.set_postfix({"Success": successful_batches, "Failed": failed_batches})
-                else:
+                batch_uploaded, batch_quarantined, batch_failed = self.send_batch(batch, batch_num)
+                uploaded += batch_uploaded
+                quarantined += batch_quarantined
+                failed += batch_failed
+                # A batch is failed if any of its records could not be delivered
+                # (quarantined records were delivered and refused)
+                if batch_failed:
                     failed_batches += 1
-                    pbar.set_postfix({"Success": successful_batches, "Failed": failed_batches})
-
+                else:
+                    successful_batches += 1
+                pbar.set_postfix({"Success": successful_batches, "Failed": failed_batches,
+                                  "Quarantined": quarantined})
                 pbar.update(1)
 
-        # Calculate results
-        total_records_uploaded = successful_batches * self.batch_size
-        if successful_batches == total_batches:
-            total_records_uploaded = len(records)
+        if record_count == 0:
+            logger.warning("No records to upload")
+            return {"success": False, "total": 0, "uploaded": 0}
+
+        if self.dry_run:
+            return {"success": True, "total": record_count, "uploaded": 0, "dry_run": True}
 
-        success_rate = (successful_batches / total_batches) * 100 if total_batches > 0 else 0
+        batches = successful_batches + failed_batches
+        success_rate = (successful_batches / batches) * 100 if batches > 0 else 0
 
-        # Log summary
         logger.info("Upload Summary:")
-        logger.info(f"  Total Records: {len(records)}")
-        logger.info(f"  Successful Batches: {successful_batches}/{total_batches}")
-        logger.info(f"  Failed Batches: {failed_batches}/{total_batches}")
+        logger.info(f"  Total Records: {record_count}")
+        logger.info(f"  Uploaded Records: {uploaded}")
+        if quarantined:
+            logger.info(f"  Quarantined Records: {quarantined} (see {self.quarantine_path})")
+        if failed:
+            logger.info(f"  Failed Records: {failed}")
+        logger.info(f"  Successful Batches: {successful_batches}/{batches}")
+        logger.info(f"  Failed Batches: {failed_batches}/{batches}")
         logger.info(f"  Success Rate: {success_rate:.1f}%")
 
         return {
             "success": successful_batches > 0,
-            "total": len(records),
-            "uploaded": total_records_uploaded,
+            "total": record_count,
+            "uploaded": uploaded,
+            "quarantined": quarantined,
+            "failed": failed,
             "successful_batches": successful_batches,
             "failed_batches": failed_batches,
             "success_rate": success_rate
-        }
\ No newline at end of file
+        }
+
+
+def add_upload_arguments(parser):
+    """Add the shared upload options to an argparse parser."""
+    parser.add_argument('--normalize-uploads', action='store_true',
+                        help='Clean text fields and format dates as MM/DD/YYYY in each upload batch')
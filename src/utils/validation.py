@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Pre-upload Record Validation
+============================
+Declarative validation rules, compiled once per record schema into plain
+predicate functions, that run between processing and upload. Records failing
+any rule are diverted to a rejects file instead of failing a whole upload
+batch at the API.
+
+Rules live in config/validation_rules.json:
+
+    {"name": "zip_format", "field": "Zip", "check": "regex",
+     "pattern": "\\d{5}(-?\\d{4})?", "allow_empty": true}
+
+Supported checks:
+- ``required``: value is present and not blank
+- ``regex``: value fully matches ``pattern``
+- ``date``: value parses under one of the upload date formats
+- ``max_length``: value is at most ``max`` characters
+- ``one_of``: value is one of ``values``
+
+``allow_empty`` (default false) makes a blank value pass the check.
+"""
+
+import json
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.utils.normalize import DateNormalizer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = Path(__file__).resolve().parent.parent.parent / "config" / "validation_rules.json"
+
+
+def load_rules(path: Optional[str] = None) -> List[Dict]:
+    """Load the rule list from a JSON rules file."""
+    with open(path or DEFAULT_RULES_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)["rules"]
+
+
+def _compile_check(rule: Dict, dates: DateNormalizer) -> Callable[[str], bool]:
+    """Turn one declarative rule into a predicate over a field value."""
+    check = rule["check"]
+    field = rule["field"]
+
+    if check == "required":
+        return lambda value: bool(value) and bool(str(value).strip())
+
+    if check == "regex":
+        fullmatch = re.compile(rule["pattern"]).fullmatch
+        predicate = lambda value: fullmatch(str(value)) is not None  # noqa: E731
+    elif check == "date":
+        is_valid = dates.is_valid
+        predicate = lambda value: is_valid(value, field)  # noqa: E731
+    elif check == "max_length":
+        limit = int(rule["max"])
+        predicate = lambda value: len(str(value)) <= limit  # noqa: E731
+    elif check == "one_of":
+        allowed = frozenset(rule["values"])
+        predicate = lambda value: value in allowed  # noqa: E731
+    else:
+        raise ValueError(f"Unknown validation check '{check}' in rule {rule.get('name')}")
+
+    if rule.get("allow_empty"):
+        return lambda value: not value or predicate(value)
+    return lambda value: bool(value) and predicate(value)
+
+
+class RecordValidator:
+    """Applies compiled validation rules and writes rejected records to a side file"""
+
+    def __init__(self, rules: Optional[List[Dict]] = None, output_dir: str = "data",
+                 prefix: str = "records"):
+        """
+        Initialize the validator.
+
+        Args:
+            rules: Rule dictionaries (default: config/validation_rules.json)
+            output_dir: Directory for rejects files
+            prefix: Filename prefix for rejects files (e.g. the collector's file prefix)
+        """
+        self.rules = rules if rules is not None else load_rules()
+        self.output_dir = Path(output_dir)
+        self.prefix = prefix
+        self.dates = DateNormalizer()
+        self._compiled: Dict[Tuple[str, ...], Tuple[List[str], List[Tuple[str, str, Callable]]]] = {}
+
+        self.checked = 0
+        self.rejected = 0
+        self.rule_counts = {rule["name"]: 0 for rule in self.rules}
+        self.rejects_path: Optional[Path] = None
+
+    def compile(self, schema: Tuple[str, ...]) -> Tuple[List[str], List[Tuple[str, str, Callable]]]:
+        """
+        Compile the rules for a record schema (tuple of field names), once.
+
+        Rules on fields missing from the schema are resolved at compile time
+        against an empty value: they either always fail (e.g. a missing
+        required column) or are dropped.
+
+        Returns:
+            (names of rules that always fail, [(name, field, predicate), ...])
+        """
+        compiled = self._compiled.get(schema)
+        if compiled is None:
+            fields = set(schema)
+            always_failed = []
+            checks = []
+            for rule in self.rules:
+                ok = _compile_check(rule, self.dates)
+                if rule["field"] in fields:
+                    checks.append((rule["name"], rule["field"], ok))
+                elif not ok(""):
+                    always_failed.append(rule["name"])
+            compiled = (always_failed, checks)
+            self._compiled[schema] = compiled
+        return compiled
+
+    def failed_rules(self, record: Dict, compiled) -> List[str]:
+        """Return the names of the rules a record fails."""
+        always_failed, checks = compiled
+        failed = [name for name, field, ok in checks if not ok(record[field])]
+        return always_failed + failed if always_failed else failed
+
+    def iter_valid(self, records: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Yield records that pass every rule; write the rest to the rejects file.
+
+        The rejects file is JSON Lines, one rejected record per line with the
+        failed rule names under "_failed_rules". A summary with per-rule counts
+        is written next to it when the stream is exhausted.
+        """
+        schema = None
+        compiled = None
+        rejects_file = None
+        self.checked = 0
+        self.rejected = 0
+        self.rule_counts = {rule["name"]: 0 for rule in self.rules}
+        self.rejects_path = None
+
+        try:
+            for record in records:
+                self.checked += 1
+                # A record with extra or different fields needs its own rules: which ones
+                # always fail depends on the schema, and no lookup error would reveal it
+                if schema is None or len(record) != len(schema) or tuple(record) != schema:
+                    schema = tuple(record)
+                    compiled = self.compile(schema)
+                failed = self.failed_rules(record, compiled)
+                if not failed:
+                    yield record
+                    continue
+
+                self.rejected += 1
+                for name in failed:
+                    self.rule_counts[name] += 1
+
+                if rejects_file is None:
+                    rejects_file = self._open_rejects_file()
+                rejects_file.write(json.dumps(dict(record, _failed_rules=failed)) + "\n")
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+            self._finish()
+
+    def filter(self, records: Iterable[Dict]) -> List[Dict]:
+        """Return the list of records that pass every rule."""
+        return list(self.iter_valid(records))
+
+    def _open_rejects_file(self):
+        self.output_dir.mkdir(exist_ok=True, parents=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.rejects_path = self.output_dir / f"{self.prefix}_rejects_{timestamp}.jsonl"
+        return open(self.rejects_path, 'w', encoding='utf-8')
+
+    def summary(self) -> Dict:
+        """Counts of checked and rejected records, per rule."""
+        return {
+            "checked": self.checked,
+            "rejected": self.rejected,
+            "rules": dict(self.rule_counts),
+            "rejects_file": str(self.rejects_path) if self.rejects_path else None
+        }
+
+    def _finish(self):
+        """Log the validation summary and write it next to the rejects file."""
+        if not self.rejected:
+            logger.info(f"Validation: all {self.checked:,} records passed")
+            return
+
+        logger.warning(f"Validation: rejected {self.rejected:,} of {self.checked:,} records "
+                       f"-> {self.rejects_path}")
+        for name, count in self.rule_counts.items():
+            if count:
+                logger.warning(f"  {name}: {count:,}")
+
+        summary_path = self.rejects_path.with_suffix(".summary.json")
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+ZIP-to-County Lookup
+====================
+Offline enrichment of the ``County`` field (and an empty ``City``) from a
+precomputed ZIP code table, with no network calls during a run.
+
+The table is one binary file (default: ``config/zip_county.bin``) built once
+from a ZIP/county crosswalk CSV, e.g. the HUD USPS ZIP Code Crosswalk or the
+Census ZCTA-to-county relationship file:
+
+- 8-byte magic, 4-byte header length, JSON header with the county and city
+  name lists
+- two dense little-endian uint16 arrays indexed by the 5-digit ZIP as an
+  integer (100,000 entries each): county and city name index, 0 = unknown
+
+The arrays are memory-mapped, so opening the table costs nothing and a lookup
+is one array read. Enrichment resolves each distinct ZIP once and then fills
+records with a single dict lookup each.
+
+Build the table:
+
+    python -m src.utils.zip_county build ZIP_COUNTY_122024.csv \\
+        --county-column COUNTY --county-names county_fips.csv \\
+        --city-column USPS_ZIP_PREF_CITY --weight-column RES_RATIO
+"""
+
+import csv
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE_PATH = Path("config") / "zip_county.bin"
+
+_MAGIC = b"ZIPCTY1\0"
+_ZIP_SLOTS = 100000
+_UNKNOWN = ("", "")
+
+
+def _zip_code(zip_code: Optional[str]) -> int:
+    """5-digit ZIP as an integer, or -1 if it isn't one ("22030-1234" -> 22030)."""
+    if not zip_code:
+        return -1
+    head = zip_code.strip()[:5]
+    return int(head) if len(head) == 5 and head.isdigit() else -1
+
+
+class ZipCountyTable:
+    """Memory-mapped ZIP -> (county, city) table"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Open a table built by build_table().
+
+        Args:
+            path: Table file (default: config/zip_county.bin)
+
+        Raises:
+            FileNotFoundError: The table file does not exist
+            ValueError: The file is not a ZIP table
+        """
+        self.path = Path(path) if path else DEFAULT_TABLE_PATH
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:8] != _MAGIC:
+            self._mm.close()
+            raise ValueError(f"{self.path} is not a ZIP county table")
+        header_len = struct.unpack_from('<I', self._mm, 8)[0]
+        self.header = json.loads(self._mm[12:12 + header_len].decode('utf-8'))
+        self.counties = [""] + self.header["counties"]
+        self.cities = [""] + self.header["cities"]
+
+        offset = self.header["offset"]
+        view = memoryview(self._mm)
+        self._county_ids = view[offset:offset + 2 * _ZIP_SLOTS].cast('H')
+        self._city_ids = view[offset + 2 * _ZIP_SLOTS:offset + 4 * _ZIP_SLOTS].cast('H')
+        if sys.byteorder != 'little':
+            self._county_ids = array('H', self._county_ids)
+            self._county_ids.byteswap()
+            self._city_ids = array('H', self._city_ids)
+            self._city_ids.byteswap()
+
+        # Raw Zip value -> (county, city); bounded by the number of distinct ZIPs seen
+        self._resolved: Dict[str, Tuple[str, str]] = {}
+
+    @classmethod
+    def open_default(cls, path: Optional[str] = None, required: bool = False) -> Optional["ZipCountyTable"]:
+        """
+        Open the table, or return None (enrichment off) if it hasn't been built.
+
+        Args:
+            path: Table file (default: config/zip_county.bin)
+            required: Raise instead of returning None if the table is missing
+
+        Raises:
+            FileNotFoundError: required is set and the table does not exist
+        """
+        table_path = Path(path) if path else DEFAULT_TABLE_PATH
+        if not table_path.exists():
+            message = (f"ZIP county table {table_path} not found; build it with "
+                       f"'python -m src.utils.zip_county build <crosswalk.csv>' (see README, County Enrichment)")
+            if required:
+                raise FileNotFoundError(message)
+            logger.warning(f"{message}. County will be left empty (--no-enrich silences this)")
+            return None
+        return cls(table_path)
+
+    def __len__(self) -> int:
+        """Number of ZIP codes with a county."""
+        return self.header["zips"]
+
+    def lookup(self, zip_code: Optional[str]) -> Tuple[str, str]:
+        """(county, city) for a ZIP code, ("", "") if unknown."""
+        resolved = self._resolved.get(zip_code)
+        if resolved is None:
+            code = _zip_code(zip_code)
+            if code < 0:
+                resolved = _UNKNOWN
+            else:
+                resolved = (self.counties[self._county_ids[code]], self.cities[self._city_ids[code]])
+            self._resolved[zip_code] = resolved
+        return resolved
+
+    def enrich(self, records: Iterable[Dict]) -> int:
+        """
+        Fill empty County (and City) fields in place.
+
+        Args:
+            records: Standardized records
+
+        Returns:
+            Number of records whose County was filled
+        """
+        resolved = self._resolved
+        lookup = self.lookup
+        filled = 0
+        for r in records:
+            if r.get("County"):
+                continue
+            zip_code = r.get("Zip")
+            county, city = resolved.get(zip_code) or lookup(zip_code)
+            if county:
+                r["County"] = county
+                filled += 1
+            if city and not r.get("City"):
+                r["City"] = city
+        return filled
+
+    def close(self):
+        for ids in (self._county_ids, self._city_ids):
+            if isinstance(ids, memoryview):
+                ids.release()
+        self._mm.close()
+
+
+def _find_column(fieldnames, name: str) -> str:
+    for field in fieldnames or ():
+        if field.strip().lower() == name.lower():
+            return field
+    raise KeyError(f"Column {name!r} not found (columns: {', '.join(fieldnames or ())})")
+
+
+def build_table(crosswalk: str, path: Optional[str] = None, zip_column: str = "zip",
+                county_column: str = "county", city_column: Optional[str] = None,
+                weight_column: Optional[str] = None, county_names: Optional[str] = None,
+                state: Optional[str] = None, state_column: str = "state") -> Path:
+    """
+    Build a table file from a ZIP/county crosswalk CSV.
+
+    A ZIP that spans several counties gets the one with the largest weight
+    (e.g. the residential address ratio), or the first one listed.
+
+    Args:
+        crosswalk: Crosswalk CSV with one row per (ZIP, county)
+        path: Output table file (default: config/zip_county.bin)
+        zip_column: ZIP code column
+        county_column: County name column (or county code, with county_names)
+        city_column: Optional preferred city name column
+        weight_column: Optional column used to pick the dominant county
+        county_names: Optional CSV of (county code, county name) rows
+        state: Only keep rows for this state (e.g. "VA")
+        state_column: State column used with state
+
+    Returns:
+        Path of the table file
+    """
+    path = Path(path) if path else DEFAULT_TABLE_PATH
+    names = {}
+    if county_names:
+        with open(county_names, 'r', newline='', encoding='utf-8-sig') as f:
+            names = {row[0].strip(): row[1].strip() for row in csv.reader(f) if len(row) >= 2}
+
+    best: Dict[int, Tuple[float, str, str]] = {}
+    with open(crosswalk, 'r', newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        zip_field = _find_column(reader.fieldnames, zip_column)
+        county_field = _find_column(reader.fieldnames, county_column)
+        city_field = _find_column(reader.fieldnames, city_column) if city_column else None
+        weight_field = _find_column(reader.fieldnames, weight_column) if weight_column else None
+        state_field = _find_column(reader.fieldnames, state_column) if state else None
+
+        for row in reader:
+            if state_field and row[state_field].strip().upper() != state.upper():
+                continue
+            code = _zip_code(row[zip_field].zfill(5))
+            county = row[county_field].strip()
+            county = names.get(county, county)
+            if code < 0 or not county:
+                continue
+            weight = float(row[weight_field] or 0) if weight_field else 0.0
+            if code not in best or weight > best[code][0]:
+                city = row[city_field].strip().title() if city_field else ""
+                best[code] = (weight, county, city)
+
+    counties = sorted({county for _, county, _ in best.values()})
+    cities = sorted({city for _, _, city in best.values() if city})
+    if len(counties) >= 0xFFFF or len(cities) >= 0xFFFF:
+        raise ValueError("Too many distinct county/city names for a uint16 table")
+    county_ids = {name: i + 1 for i, name in enumerate(counties)}
+    city_ids = {name: i + 1 for i, name in enumerate(cities)}
+
+    county_array = array('H', bytes(2 * _ZIP_SLOTS))
+    city_array = array('H', bytes(2 * _ZIP_SLOTS))
+    for code, (_, county, city) in best.items():
+        county_array[code] = county_ids[county]
+        city_array[code] = city_ids.get(city, 0)
+    if sys.byteorder != 'little':
+        county_array.byteswap()
+        city_array.byteswap()
+
+    header = {"counties": counties, "cities": cities, "zips": len(best),
+              "source": Path(crosswalk).name, "built": datetime.now().isoformat()}
+    # Arrays start on an 8-byte boundary after the header
+    body = json.dumps(header).encode('utf-8')
+    offset = 12 + len(body) + 64
+    offset += -offset % 8
+    header["offset"] = offset
+    header_bytes = json.dumps(header).encode('utf-8').ljust(offset - 12)
+
+    path.parent.mkdir(exist_ok=True, parents=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(county_array.tobytes())
+        f.write(city_array.tobytes())
+    os.replace(tmp_path, path)
+
+    logger.info(f"ZIP county table: {len(best):,} ZIPs, {len(counties):,} counties, "
+                f"{len(cities):,} cities -> {path} ({path.stat().st_size:,} bytes)")
+    return path
+
+
+def add_enrichment_arguments(parser):
+    """Add the shared ZIP enrichment options to an argparse parser."""
+    parser.add_argument('--zip-table', default=None,
+                        help=f'ZIP county table for County enrichment (default: {DEFAULT_TABLE_PATH}, if built; '
+                             f'a table given here must exist)')
+    enrich = parser.add_mutually_exclusive_group()
+    enrich.add_argument('--enrich', action='store_true',
+                        help='Require County enrichment: stop with an error if the ZIP table is missing')
+    enrich.add_argument('--no-enrich', action='store_true',
+                        help='Leave County empty instead of filling it from the ZIP table')
+
+
+def zip_table_from_args(args) -> Optional[ZipCountyTable]:
+    """
+    Open the ZIP table for parsed options, or None if enrichment is off or the default table is missing.
+
+    Raises:
+        FileNotFoundError: --enrich or --zip-table was given and the table does not exist
+    """
+    if getattr(args, 'no_enrich', False):
+        return None
+    path = getattr(args, 'zip_table', None)
+    return ZipCountyTable.open_default(path, required=bool(path) or getattr(args, 'enrich', False))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from src.utils.log_setup import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Build or query the ZIP county table')
+    parser.add_argument('--table', default=str(DEFAULT_TABLE_PATH),
+                        help=f'Table file (default: {DEFAULT_TABLE_PATH})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_cmd = subparsers.add_parser('build', help='Build the table from a crosswalk CSV')
+    build_cmd.add_argument('crosswalk')
+    build_cmd.add_argument('--zip-column', default='zip')
+    build_cmd.add_argument('--county-column', default='county')
+    build_cmd.add_argument('--city-column', default=None)
+    build_cmd.add_argument('--weight-column', default=None,
+                           help='Pick the county with the largest value for ZIPs spanning counties')
+    build_cmd.add_argument('--county-names', default=None,
+                           help='CSV of (county code, county name) rows, for crosswalks keyed by FIPS code')
+    build_cmd.add_argument('--state', default=None, help='Only keep ZIPs in this state')
+    build_cmd.add_argument('--state-column', default='state')
+    lookup_cmd = subparsers.add_parser('lookup', help='Look up ZIP codes')
+    lookup_cmd.add_argument('zips', nargs='+')
+    subparsers.add_parser('info', help='Show table metadata')
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_table(args.crosswalk, args.table, zip_column=args.zip_column,
+                    county_column=args.county_column, city_column=args.city_column,
+                    weight_column=args.weight_column, county_names=args.county_names,
+                    state=args.state, state_column=args.state_column)
+    else:
+        table = ZipCountyTable(args.table)
+        if args.command == 'lookup':
+            for zip_code in args.zips:
+                county, city = table.lookup(zip_code)
+                print(f"{zip_code:<10} {county or '-':<30} {city}")
+        else:
+            print(f"{table.path}: {len(table):,} ZIPs, {len(table.counties) - 1:,} counties, "
+                  f"{len(table.cities) - 1:,} cities (source: {table.header['source']}, "
+                  f"built {table.header['built']})")
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Import src.* from the repository root
+sys.path.insert(0, str(Path(__file__).parent.parent))
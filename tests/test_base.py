@@ -0,0 +1,49 @@
+import csv
+import json
+
+from src.collectors.base import BaseCollector
+
+
+class StreamingCollector(BaseCollector):
+    """Yields records lazily and counts how many were produced"""
+
+    file_prefix = "stream"
+
+    def __init__(self, count, **kwargs):
+        self.count = count
+        self.produced = 0
+        super().__init__(**kwargs)
+
+    def iter_records(self):
+        for i in range(self.count):
+            self.produced += 1
+            yield {"License Number": str(i), "Business Name": f"Business {i}"}
+
+
+def test_save_to_csv_streams_without_collecting(tmp_path):
+    collector = StreamingCollector(5, output_dir=str(tmp_path))
+    path = collector.save_to_csv("stream.csv")
+
+    assert collector.produced == 5
+    assert collector.collected_data == []
+    with open(path, newline="", encoding="utf-8") as f:
+        assert [row["License Number"] for row in csv.DictReader(f)] == ["0", "1", "2", "3", "4"]
+    manifest = json.loads((tmp_path / "stream.manifest.json").read_text(encoding="utf-8"))
+    assert manifest["complete"]
+    collector.close()
+
+
+def test_collect_materializes_once_and_records_reuses_it(tmp_path):
+    collector = StreamingCollector(3, output_dir=str(tmp_path))
+    assert len(collector.collect()) == 3
+    assert [r["License Number"] for r in collector.records()] == ["0", "1", "2"]
+    assert collector.produced == 3
+    collector.close()
+
+
+def test_memory_budget_spills_collected_records(tmp_path):
+    collector = StreamingCollector(2000, output_dir=str(tmp_path), memory_budget=16 * 1024)
+    records = collector.collect()
+    assert len(records) == 2000 and records.segments
+    assert records[1999]["License Number"] == "1999"
+    collector.close()
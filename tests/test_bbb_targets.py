@@ -0,0 +1,52 @@
+import threading
+import time
+
+from src.utils import upload_api
+from src.utils.bbb_targets import BBBTarget, upload_to_targets
+
+RECORDS = [{"Agency Name": "VA - DPOR - Real Estate Board", "Zip": "22030", "License Status": "Active"}]
+
+
+def track_concurrency(monkeypatch):
+    """Slow uploads that record how many ran at once."""
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def upload_stream(self, records):
+        total = len(list(records))
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.2)
+        with lock:
+            running.pop()
+        return {"success": True, "total": total, "uploaded": total}
+
+    monkeypatch.setattr(upload_api.VKBulkUploader, "upload_stream", upload_stream)
+    return peak
+
+
+def test_targets_upload_in_parallel(monkeypatch):
+    peak = track_concurrency(monkeypatch)
+    targets = [BBBTarget(bbb_id=str(i), name=f"t{i}") for i in range(3)]
+    results = upload_to_targets(RECORDS, targets)
+    assert max(peak) == 3
+    assert all(result["uploaded"] == 1 for result in results.values())
+
+
+def test_each_target_upload_takes_a_gate_slot(monkeypatch):
+    peak = track_concurrency(monkeypatch)
+    targets = [BBBTarget(bbb_id=str(i), name=f"t{i}") for i in range(4)]
+    results = upload_to_targets(RECORDS, targets, gate=threading.BoundedSemaphore(2))
+    assert max(peak) == 2
+    assert all(result["success"] for result in results.values())
+
+
+def test_target_with_no_matching_records_succeeds(monkeypatch):
+    monkeypatch.setattr(upload_api.VKBulkUploader, "upload_stream",
+                        lambda self, records: {"success": True, "total": 1, "uploaded": 1})
+    targets = [BBBTarget(bbb_id="1", name="all"), BBBTarget(bbb_id="2", name="richmond", zip_prefixes=["230"])]
+    results = upload_to_targets(RECORDS, targets)
+    assert results["richmond"] == {"success": True, "total": 0, "uploaded": 0}
+    assert results["all"]["uploaded"] == 1
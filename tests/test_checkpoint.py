@@ -0,0 +1,56 @@
+import pytest
+
+from src.collectors.base import BaseCollector
+from src.utils import upload_api
+from src.utils.checkpoint import DOWNLOADED, PROCESSED, UPLOADED, RunCheckpoint
+
+TARGETS = [("0225crnt", "https://example.invalid/0225crnt"), ("0226crnt", "https://example.invalid/0226crnt")]
+
+
+def test_resume_reopens_targets_and_dataset_states(tmp_path):
+    checkpoint = RunCheckpoint("run1", "dpor", runs_dir=str(tmp_path))
+    checkpoint.set_targets(TARGETS)
+    checkpoint.mark("0225crnt", DOWNLOADED, size=10)
+    checkpoint.mark("0225crnt", PROCESSED, records=3)
+
+    resumed = RunCheckpoint("run1", "dpor", runs_dir=str(tmp_path), resume=True)
+    assert resumed.targets == TARGETS
+    assert resumed.reached("0225crnt", DOWNLOADED) and not resumed.reached("0225crnt", UPLOADED)
+    assert not resumed.reached("0226crnt", DOWNLOADED)
+    assert resumed.counts() == {PROCESSED: 1}
+
+
+def test_resume_of_unknown_run_fails(tmp_path):
+    with pytest.raises(FileNotFoundError, match="run2"):
+        RunCheckpoint("run2", "dpor", runs_dir=str(tmp_path), resume=True)
+
+
+def test_resumed_upload_skips_uploaded_datasets(tmp_path, monkeypatch):
+    sent = []
+
+    def upload_data(self, records):
+        records = list(records)
+        sent.append([r["License Number"] for r in records])
+        # The second dataset's upload fails on the first attempt
+        ok = len(sent) != 2
+        return {"success": ok, "total": len(records), "uploaded": len(records) if ok else 0}
+
+    monkeypatch.setattr(upload_api.VKBulkUploader, "upload_data", upload_data)
+
+    def run(resume):
+        checkpoint = RunCheckpoint("run1", "dpor", runs_dir=str(tmp_path), resume=resume)
+        collector = BaseCollector(output_dir=str(tmp_path), checkpoint=checkpoint)
+        collector.collected_data = collector.buffer_datasets(
+            [("0225crnt", [{"License Number": "1"}, {"License Number": "2"}]),
+             ("0226crnt", [{"License Number": "3"}])])
+        collector._collected = True
+        return collector.upload_to_api(), checkpoint
+
+    success, checkpoint = run(resume=False)
+    assert not success
+    assert checkpoint.reached("0225crnt", UPLOADED) and not checkpoint.reached("0226crnt", UPLOADED)
+
+    success, checkpoint = run(resume=True)
+    assert success
+    assert sent == [["1", "2"], ["3"], ["3"]]
+    assert checkpoint.reached("0226crnt", UPLOADED)
@@ -0,0 +1,58 @@
+import argparse
+
+import pytest
+
+from src.utils.dataset_selection import (DatasetSelector, DatasetSizeHistory, add_selection_arguments,
+                                         selector_from_args)
+
+CODES = [f"{board:04d}{kind}" for board in range(100, 160) for kind in ("crnt", "pend")]
+
+
+def shard_of(codes, sizes=None, count=4):
+    return DatasetSelector(shard=(0, count), sizes=sizes).assign_shards(codes)
+
+
+def test_every_dataset_is_assigned_once():
+    picked = [DatasetSelector(shard=(i, 4)).select(CODES) for i in range(4)]
+    assert sorted(code for shard in picked for code in shard) == sorted(CODES)
+    assert all(picked)
+
+
+def test_code_hash_ignores_other_datasets():
+    full = shard_of(CODES)
+    partial = shard_of(CODES[::2])
+    assert all(full[code] == shard for code, shard in partial.items())
+
+
+def test_nodes_sharing_a_size_file_agree_and_balance(tmp_path):
+    path = tmp_path / "sizes.json"
+    # Skewed sizes: a few large boards and a long tail, like DPOR's
+    sizes = {code: (400_000 if i % 17 == 0 else 1_000 + 37 * i) for i, code in enumerate(CODES)}
+    DatasetSizeHistory(str(path)).update(sizes)
+
+    parser = argparse.ArgumentParser()
+    add_selection_arguments(parser)
+    picked = []
+    for i in range(4):
+        # Each node lists its datasets in a different order
+        selector = selector_from_args(parser.parse_args(["--shard", f"{i}/4", "--dataset-sizes", str(path)]))
+        picked.append(selector.select(CODES[i:] + CODES[:i]))
+
+    assert sorted(code for shard in picked for code in shard) == sorted(CODES)
+    loads = [sum(sizes[code] for code in shard) for shard in picked]
+    assert max(loads) <= 1.05 * min(loads)
+
+
+def test_sharding_by_size_requires_the_size_file(tmp_path):
+    parser = argparse.ArgumentParser()
+    add_selection_arguments(parser)
+    args = parser.parse_args(["--shard", "0/4", "--dataset-sizes", str(tmp_path / "missing.json")])
+    with pytest.raises(FileNotFoundError, match="--dataset-sizes"):
+        selector_from_args(args)
+
+
+def test_size_history_merges_updates(tmp_path):
+    path = tmp_path / "sizes.json"
+    DatasetSizeHistory(str(path)).update({"0225crnt": 10})
+    DatasetSizeHistory(str(path)).update({"0226crnt": 20})
+    assert DatasetSizeHistory(str(path)).sizes == {"0225crnt": 10, "0226crnt": 20}
@@ -0,0 +1,62 @@
+from src.utils.license_history import LicenseHistory
+
+BOARDS = ["VA - DPOR - Board for Contractors", "VA - DPOR - Real Estate Board", "VA - DPOR - 100%_Board"]
+
+
+def history_with_transitions(tmp_path):
+    history = LicenseHistory(str(tmp_path / "history.db"))
+    records = [{"License Number": str(i), "Agency Name": board, "Business Name": f"Business {i}",
+                "License Status": "Active", "Expiration Date": "2030-01-01"}
+               for i, board in enumerate(BOARDS)]
+    history.record_run(records, run_date="2025-04-19")
+    return history
+
+
+def test_board_matches_prefix_case_insensitively(tmp_path):
+    history = history_with_transitions(tmp_path)
+    rows = history.transitions(board="va - dpor - board for")
+    assert [row["board"] for row in rows] == [BOARDS[0]]
+    assert [row["board"] for row in history.transitions(board=BOARDS[1])] == [BOARDS[1]]
+    assert history.transitions(board="contractors") == []
+    # Wildcards in the board are matched literally
+    assert [row["board"] for row in history.transitions(board="VA - DPOR - 100%_")] == [BOARDS[2]]
+    assert history.transitions(board="VA - DPOR - 1_0") == []
+    history.close()
+
+
+def test_board_substring_is_opt_in(tmp_path):
+    history = history_with_transitions(tmp_path)
+    rows = history.transitions(board="CONTRACTORS", board_substring=True)
+    assert [row["board"] for row in rows] == [BOARDS[0]]
+    history.close()
+
+
+def test_board_prefix_uses_the_board_index(tmp_path):
+    history = history_with_transitions(tmp_path)
+    statements = []
+    history.conn.set_trace_callback(statements.append)
+    history.transitions(board="VA - DPOR - Board")
+    history.conn.set_trace_callback(None)
+    plan = history.conn.execute("EXPLAIN QUERY PLAN " + statements[-1]).fetchall()
+    assert any("ix_transitions_board" in row[-1] for row in plan)
+    history.close()
+
+
+def test_partial_run_only_removes_licenses_of_its_datasets(tmp_path):
+    history = LicenseHistory(str(tmp_path / "history.db"))
+
+    def licenses(numbers):
+        # Both datasets fall back to the shared "VA - DPOR" board name
+        return [{"License Number": n, "Agency Name": "VA - DPOR", "License Status": "Active"} for n in numbers]
+
+    history.record_datasets([("0225crnt", licenses(["1", "2"])), ("0226crnt", licenses(["3", "4"]))],
+                            run_date="2025-04-19")
+    # --include '0225*': license 2 is gone, but 0226crnt was not collected
+    counts = history.record_datasets([("0225crnt", licenses(["1"]))], run_date="2025-04-20")
+    assert counts["removed"] == 1
+    assert [row["license_number"] for row in history.transitions(change="removed")] == ["2"]
+
+    # Records without datasets never remove anything unless they cover the whole source
+    assert history.record_run(licenses(["1"]), run_date="2025-04-21")["removed"] == 0
+    assert history.record_run(licenses(["1"]), run_date="2025-04-22", complete=True)["removed"] == 2
+    history.close()
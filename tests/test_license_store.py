@@ -0,0 +1,59 @@
+import pytest
+
+from src.utils.license_store import LicenseStore
+
+
+def record(number, board, name="Acme, Inc.", zip_code="22030-1234"):
+    return {"License Number": number, "Agency Name": board, "Business Name": name, "Zip": zip_code}
+
+
+def numbers(store):
+    return sorted(row["license_number"] for row in store.query("SELECT license_number FROM licenses"))
+
+
+def test_load_replaces_collected_boards_and_keeps_the_rest(tmp_path):
+    store = LicenseStore(str(tmp_path / "licenses.db"))
+    store.load([record("1", "Real Estate"), record("2", "Contractors")], source="dpor")
+    store.load([record("9", "Business")], source="dc")
+    # A partial run of one board replaces only that board's rows
+    store.load([record("3", "Real Estate")], source="dpor")
+
+    assert numbers(store) == ["2", "3", "9"]
+    assert store.by_name("ACME INC")[0]["zip5"] == "22030"
+    indexes = {row["name"] for row in store.query("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"ix_licenses_license_number", "ix_licenses_name_key"} <= indexes
+    store.close()
+
+
+def test_readers_see_the_old_table_until_the_swap_commits(tmp_path):
+    path = str(tmp_path / "licenses.db")
+    store = LicenseStore(path)
+    store.load([record("1", "Real Estate")])
+    reader = LicenseStore(path, readonly=True)
+    seen_during_load = []
+
+    def records():
+        yield record("2", "Real Estate")
+        seen_during_load.append(numbers(reader))
+        yield record("3", "Real Estate")
+
+    store.load(records())
+    assert seen_during_load == [["1"]]
+    assert numbers(reader) == ["2", "3"]
+    reader.close()
+    store.close()
+
+
+def test_failed_load_leaves_the_previous_table(tmp_path):
+    store = LicenseStore(str(tmp_path / "licenses.db"))
+    store.load([record("1", "Real Estate")])
+
+    def broken():
+        yield record("2", "Real Estate")
+        raise RuntimeError("download failed")
+
+    with pytest.raises(RuntimeError):
+        store.load(broken())
+    assert numbers(store) == ["1"]
+    assert not store.query("SELECT name FROM sqlite_master WHERE name = 'licenses_staging'")
+    store.close()
@@ -0,0 +1,49 @@
+import logging
+
+from src.utils.log_setup import RATE_LIMITED, ErrorTally, JsonFormatter, RateLimitFilter
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def make_logger(name, burst=3):
+    log = logging.getLogger(name)
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    capture = Capture()
+    capture.addFilter(RateLimitFilter(burst=burst, interval=60))
+    log.handlers = [capture]
+    return log, capture
+
+
+def test_only_opted_in_sites_are_rate_limited():
+    log, capture = make_logger("test_log_setup.opt_in")
+    for i in range(10):
+        log.warning("Batch %d failed", i, extra=RATE_LIMITED)
+    for i in range(10):
+        log.info("Dataset %d parsed", i)
+    limited = [r for r in capture.records if r.getMessage().startswith("Batch")]
+    assert len(limited) == 3
+    assert len(capture.records) == 13
+
+
+def test_error_tally_dataset_lines_are_never_dropped():
+    log, capture = make_logger("test_log_setup.tally", burst=1)
+    tally = ErrorTally()
+    for i in range(50):
+        tally.log_dataset(log, f"{i:04d}crnt", {"short rows": 1})
+    assert len(capture.records) == 50
+    assert tally.totals() == {"short rows": 50}
+
+
+def test_rate_limit_flag_is_not_a_json_field():
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "hello", (), None)
+    record.__dict__.update(RATE_LIMITED, dataset="0401crnt")
+    assert '"rate_limit"' not in JsonFormatter().format(record)
+    assert '"dataset": "0401crnt"' in JsonFormatter().format(record)
@@ -0,0 +1,49 @@
+import csv
+import json
+from datetime import date, timedelta
+
+from src.lookup_service import LookupService
+
+FIELDS = ["License Number", "Business Name", "License Status", "Expiration Date"]
+
+
+def write_output(data_dir, name, rows, complete=True):
+    path = data_dir / name
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+    if complete is not None:
+        manifest = {"file": name, "complete": complete, "reasons": [] if complete else ["refresh"]}
+        path.with_suffix(".manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    return path
+
+
+def test_partial_and_unmanifested_runs_are_skipped(tmp_path):
+    full = write_output(tmp_path, "dpor_data_20240101_000000.csv", [["1", "Acme", "Active", ""]])
+    write_output(tmp_path, "dpor_data_20240102_000000.csv", [["2", "Beta", "Active", ""]], complete=False)
+    write_output(tmp_path, "dpor_data_20240103_000000.csv", [["3", "Gamma", "Active", ""]], complete=None)
+
+    service = LookupService(data_dir=str(tmp_path), poll_interval=0)
+    assert service.latest_file() == full
+    service.reload()
+    assert service.lookup_licenses(["1"])["1"]["found"]
+
+    partial = LookupService(data_dir=str(tmp_path), poll_interval=0, include_partial=True)
+    assert partial.latest_file().name == "dpor_data_20240103_000000.csv"
+
+
+def test_cached_active_flag_expires_with_the_day(tmp_path, monkeypatch):
+    today = date.today()
+    write_output(tmp_path, "dpor_data_20240101_000000.csv", [["1", "Acme", "Active", today.isoformat()]])
+    service = LookupService(data_dir=str(tmp_path), poll_interval=0)
+    service.reload()
+    assert service.lookup_licenses(["1"])["1"]["active"]
+
+    class Tomorrow(date):
+        @classmethod
+        def today(cls):
+            return today + timedelta(days=1)
+
+    monkeypatch.setattr("src.lookup_service.date", Tomorrow)
+    assert not service.lookup_licenses(["1"])["1"]["active"]
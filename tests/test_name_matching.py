@@ -0,0 +1,33 @@
+from src.utils.name_matching import TrigramIndex
+
+NAMES = [
+    "Acme Plumbing LLC", "ACME Plumbing, Inc.", "Acme Plumbing and Heating", "Blue Ridge Electric",
+    "Blue Ridge Electrical Services", "Capital Roofing Co", "Capitol Roofing Company", "Dominion HVAC",
+]
+
+
+def test_add_after_query():
+    index = TrigramIndex()
+    index.add("1", NAMES[0])
+    assert index.query(NAMES[0])
+
+    # A query must not pin the posting lists; growing them used to raise BufferError
+    index.add("2", NAMES[1])
+    index.add("3", NAMES[2])
+    assert index.query("acme plumbing") == [("ACME PLUMBING", 1.0, ["1", "2"])]
+    assert index.query("acme plumbing heating", threshold=0.5)[0][2] == ["3"]
+
+
+def test_interleaved_adds_match_a_batch_build():
+    incremental = TrigramIndex()
+    for i, name in enumerate(NAMES):
+        incremental.add(str(i), name)
+        for queried in NAMES[:i + 1]:
+            incremental.query(queried, threshold=0.3)
+
+    batch = TrigramIndex()
+    batch.add_many((str(i), name) for i, name in enumerate(NAMES))
+
+    for name in NAMES + ["Blue Ridge", "Capital Roofing"]:
+        assert incremental.query(name, threshold=0.3) == batch.query(name, threshold=0.3)
+    assert sorted(incremental.similar_pairs(0.5)) == sorted(batch.similar_pairs(0.5))
@@ -0,0 +1,67 @@
+import threading
+import time
+
+from src.utils.notifications import NotificationDispatcher
+
+
+class StubNotifier:
+    """Records (method, text) for each call; blocks while `release` is unset"""
+
+    def __init__(self):
+        self.received = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def _record(self, method, text):
+        self.release.wait(5)
+        self.received.append((method, text))
+
+    def notify_progress(self, message):
+        self._record("progress", message)
+
+    def notify_warning(self, message):
+        self._record("warning", message)
+
+    def notify_success(self, message):
+        self._record("success", message)
+
+
+def test_full_queue_drops_the_oldest_messages():
+    stub = StubNotifier()
+    stub.release.clear()
+    dispatcher = NotificationDispatcher(stub, min_interval=0, max_queue=3)
+    # The first warning is taken by the (blocked) sender thread, the rest queue up
+    dispatcher.notify_warning("w0")
+    while dispatcher._queue:
+        time.sleep(0.001)
+    for i in range(1, 6):
+        dispatcher.notify_warning(f"w{i}")
+    stub.release.set()
+    dispatcher.close()
+
+    assert dispatcher.dropped == 2
+    assert [text for _, text in stub.received] == ["w0", "w3", "w4", "w5"]
+
+
+def test_progress_is_coalesced_into_a_digest_before_the_next_message():
+    stub = StubNotifier()
+    dispatcher = NotificationDispatcher(stub, digest_interval=60, min_interval=0, digest_lines=2)
+    for i in range(5):
+        dispatcher.notify_progress(f"dataset {i} processed")
+    dispatcher.notify_success("done")
+    dispatcher.close()
+
+    assert [method for method, _ in stub.received] == ["progress", "success"]
+    digest = stub.received[0][1]
+    assert digest.startswith("5 progress updates (3 earlier not shown):")
+    assert digest.endswith("• dataset 3 processed\n• dataset 4 processed")
+
+
+def test_close_flushes_pending_progress():
+    stub = StubNotifier()
+    dispatcher = NotificationDispatcher(stub, digest_interval=60, min_interval=0)
+    dispatcher.notify_progress("only update")
+    dispatcher.close()
+    dispatcher.notify_warning("after close")
+
+    assert stub.received == [("progress", "only update")]
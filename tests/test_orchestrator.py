@@ -0,0 +1,72 @@
+import threading
+import time
+
+from src import orchestrator
+from src.collectors.registry import CollectorSpec, ResourceLimits
+from src.orchestrator import CollectionOrchestrator, OrchestratorOptions
+
+
+class FakeCollector:
+    """Collects a few records, and records how many uploads run at once"""
+
+    created = []
+    uploading = []
+    peak = []
+    lock = threading.Lock()
+
+    def __init__(self, **options):
+        self.options = options
+        self.created.append(self)
+
+    def collect(self):
+        return [{"License Number": "1"}, {"License Number": "2"}]
+
+    def upload_to_api(self, dry_run=False):
+        with self.lock:
+            self.uploading.append(1)
+            self.peak.append(len(self.uploading))
+        time.sleep(0.1)
+        with self.lock:
+            self.uploading.pop()
+        return True
+
+
+def registry(monkeypatch, names):
+    specs = {name: CollectorSpec(name, FakeCollector, name.upper(), ResourceLimits()) for name in names}
+    monkeypatch.setattr(orchestrator, "discover_collectors", lambda: specs)
+
+
+def test_options_reach_collectors_and_uploads_share_the_slots(monkeypatch):
+    registry(monkeypatch, ["a", "b", "c"])
+    FakeCollector.created.clear()
+    FakeCollector.peak.clear()
+    options = OrchestratorOptions(upload=True, upload_slots=2, validate=True, hedge=False)
+    results = CollectionOrchestrator(options=options).run()
+
+    assert [r.name for r in results] == ["a", "b", "c"]
+    assert all(r.success and r.records == 2 for r in results)
+    assert max(FakeCollector.peak) == 2
+    assert all(c.options["validate"] and c.options["hedge"] is False for c in FakeCollector.created)
+
+
+def test_default_options(monkeypatch):
+    registry(monkeypatch, ["a"])
+    orchestrator_ = CollectionOrchestrator()
+    assert orchestrator_.options == OrchestratorOptions()
+    assert orchestrator_.max_parallel == 1
+    assert orchestrator_.limit_overrides == {}
+
+
+def test_missing_replay_snapshot_fails_the_collector_without_a_traceback(monkeypatch, caplog):
+    class NoSnapshot(FakeCollector):
+        def collect(self):
+            raise FileNotFoundError("No archived snapshots in data/archive/a")
+
+    specs = {"a": CollectorSpec("a", NoSnapshot, "A", ResourceLimits())}
+    monkeypatch.setattr(orchestrator, "discover_collectors", lambda: specs)
+    results = CollectionOrchestrator(options=OrchestratorOptions(replay="latest")).run()
+
+    assert not results[0].success
+    assert isinstance(results[0].error, FileNotFoundError)
+    errors = [r for r in caplog.records if r.levelname == "ERROR"]
+    assert errors and not any(r.exc_info for r in errors)
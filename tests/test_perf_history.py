@@ -0,0 +1,40 @@
+from src.utils.perf_history import PerfHistory, RunMetrics
+
+
+def metrics(download_seconds, parse_seconds=2.0):
+    run = RunMetrics()
+    run.add_dataset("0401", download_seconds=download_seconds, bytes=10_000_000,
+                    parse_seconds=parse_seconds, records=50_000)
+    return run
+
+
+def record_baseline(history, runs=6):
+    # Small jitter so the baseline has a spread
+    for i in range(runs):
+        history.record_run("dpor", metrics(2.0 + 0.02 * i), version="abc")
+
+
+def test_slow_download_is_flagged_against_the_baseline(tmp_path):
+    history = PerfHistory(str(tmp_path / "perf.db"))
+    record_baseline(history)
+    run_id = history.record_run("dpor", metrics(6.0), version="abc")
+
+    regressions = history.check_run(run_id)
+    assert {row["metric"] for row in regressions} == {"download", "download:0401"}
+    assert all(row["change"] < -0.5 and row["runs"] == 6 for row in regressions)
+    history.close()
+
+
+def test_normal_runs_failed_runs_and_short_baselines_are_not_flagged(tmp_path):
+    history = PerfHistory(str(tmp_path / "perf.db"))
+    record_baseline(history, runs=4)
+    run_id = history.record_run("dpor", metrics(6.0), version="abc")
+    # Four baseline runs are below min_runs
+    assert history.compare(run_id) == []
+
+    # A failed run is not used as a baseline
+    history.record_run("dpor", metrics(60.0), version="abc", success=False)
+    run_id = history.record_run("dpor", metrics(2.05), version="abc")
+    assert history.baseline_runs(run_id) == [5, 4, 3, 2, 1]
+    assert not history.check_run(run_id)
+    history.close()
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.deadlines import HedgePolicy
+from src.utils.ranged_download import RangedDownloader
+
+BODY = os.urandom(3 << 20)
+
+
+class SlowFirstByteHandler(BaseHTTPRequestHandler):
+    """Serves BODY with Range support, holding every response for a moment first"""
+
+    protocol_version = "HTTP/1.1"
+    delay = 0.5
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        start, end = 0, len(BODY) - 1
+        status = 200
+        if self.headers.get("Range"):
+            first, _, last = self.headers["Range"][len("bytes="):].partition("-")
+            start, end = int(first), int(last) if last else len(BODY) - 1
+            status = 206
+        data = BODY[start:end + 1]
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(BODY)}")
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SlowFirstByteHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/data.txt"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_hedge_started_before_headers_does_not_share_parts(server, tmp_path):
+    hedge = HedgePolicy("download", initial_delay=0.1)
+    downloader = RangedDownloader(part_size=256 << 10, min_size=1 << 20, partial_dir=str(tmp_path),
+                                  hedge=hedge)
+
+    fetched = []
+    fetch = downloader.fetch
+
+    bodies = []
+
+    def recording_fetch(url, ranged=True, **kwargs):
+        fetched.append(ranged)
+        body, headers = fetch(url, ranged=ranged, **kwargs)
+        bodies.append(body)
+        return body, headers
+
+    downloader.fetch = recording_fetch
+    downloader.fetch_text(server)
+
+    assert bodies[0] == BODY
+    assert hedge.hedged == 1
+    # The hedge reads one stream; only the first attempt may use Range requests
+    assert fetched == [True, False]
+
+
+def test_ranged_download_assembles_the_body(server, tmp_path):
+    downloader = RangedDownloader(part_size=256 << 10, min_size=1 << 20, partial_dir=str(tmp_path))
+    body, _ = downloader.fetch(server)
+    assert body == BODY
+
+
+def test_hedge_records_the_first_attempts_latency():
+    hedge = HedgePolicy("upload", initial_delay=0.05, min_samples=100)
+    calls = []
+
+    def slow_first(cancel):
+        calls.append(cancel)
+        if len(calls) == 1:
+            cancel._event.wait(1.0)
+            raise RuntimeError("cancelled")
+        time.sleep(0.05)
+        return "ok"
+
+    assert hedge.call(slow_first) == "ok"
+    assert hedge.hedge_wins == 1
+    # About 0.05s until the hedge started plus its own 0.05s, not just the hedge's 0.05s
+    assert hedge._latencies[-1] >= 0.1
+
+
+class MisplacedRangeHandler(BaseHTTPRequestHandler):
+    """Drops the first stream halfway, then answers the resume with a range from byte 0"""
+
+    protocol_version = "HTTP/1.1"
+    requests = []
+    body = BODY[:200 << 10]
+
+    def do_GET(self):
+        self.requests.append(self.headers.get("Range"))
+        status = 206 if self.headers.get("Range") else 200
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(self.body)))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes 0-{len(self.body) - 1}/{len(self.body)}")
+        self.end_headers()
+        if len(self.requests) == 1:
+            self.wfile.write(self.body[:len(self.body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(self.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_resume_with_misplaced_content_range_restarts():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), MisplacedRangeHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        downloader = RangedDownloader(retries=2)
+        downloader._backoff = lambda attempt, deadline: None
+        body, _ = downloader.fetch(f"http://127.0.0.1:{httpd.server_address[1]}/data.txt")
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+    assert body == MisplacedRangeHandler.body
+    assert MisplacedRangeHandler.requests[0] is None and MisplacedRangeHandler.requests[1].startswith("bytes=")
+    assert MisplacedRangeHandler.requests[-1] is None
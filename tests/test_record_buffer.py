@@ -0,0 +1,49 @@
+import pytest
+
+from src.utils.record_buffer import SpillingRecordList
+
+_MB = 1 << 20
+
+
+def make_records(n):
+    return [{"License Number": str(i), "Name": f"Business {i}" * 20, "Status": "Active"} for i in range(n)]
+
+
+def test_spills_to_segments_and_reads_back_in_order(tmp_path):
+    records = make_records(20000)
+    records[5] = {"License Number": "5", "Other": "schema"}
+    buffer = SpillingRecordList(_MB, spill_dir=str(tmp_path))
+    buffer.extend(records)
+
+    assert len(buffer.segments) > 1
+    assert 0 < buffer.spilled < len(buffer) == len(records)
+    assert list(buffer) == records
+    assert buffer[5] == records[5]
+    assert buffer[-1] == records[-1]
+    with pytest.raises(IndexError):
+        buffer[len(records)]
+
+
+def test_slices_are_lazy_views_across_segments(tmp_path):
+    records = make_records(20000)
+    buffer = SpillingRecordList(_MB, spill_dir=str(tmp_path))
+    buffer.extend(records)
+
+    first, count = buffer.segments[1][1], buffer.segments[1][2]
+    view = buffer[first - 10:first + count + 10]
+    assert len(view) == count + 20
+    assert list(view) == records[first - 10:first + count + 10]
+    assert list(view[5:15]) == records[first - 5:first + 5]
+    assert view[-1] == records[first + count + 9]
+    assert not buffer[10:10]
+    with pytest.raises(ValueError):
+        buffer[::2]
+
+
+def test_close_removes_spill_files(tmp_path):
+    buffer = SpillingRecordList(_MB, spill_dir=str(tmp_path))
+    buffer.extend(make_records(20000))
+    assert buffer.path.exists()
+    buffer.close()
+    assert not buffer.path.exists()
+    assert len(buffer) == 0
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from src.utils.refresh_schedule import RefreshScheduler
+
+T0 = datetime(2024, 1, 1, 3, 0)
+
+
+def test_observations_round_trip_and_drive_the_plan(tmp_path):
+    path = tmp_path / "dpor.json"
+    scheduler = RefreshScheduler("dpor", path=str(path), min_probability=0.5)
+    assert scheduler.observe("fast", "v1", now=T0)
+    assert scheduler.observe("slow", "v1", now=T0)
+    assert scheduler.pending == 2
+    assert not path.exists()
+    scheduler.save()
+
+    # Daily checks: "fast" changes every time, "slow" never does
+    for day in range(1, 30):
+        scheduler = RefreshScheduler("dpor", path=str(path), min_probability=0.5)
+        now = T0 + timedelta(days=day)
+        assert scheduler.observe("fast", f"v{day + 1}", now=now)
+        assert not scheduler.observe("slow", "v1", now=now)
+        scheduler.save()
+
+    scheduler = RefreshScheduler("dpor", path=str(path), min_probability=0.5)
+    assert scheduler.datasets["slow"]["checks"] == 30
+    assert scheduler.rate("fast") > 10 * scheduler.rate("slow")
+
+    next_day = T0 + timedelta(days=30)
+    targets = [("fast", "u1"), ("slow", "u2"), ("new", "u3")]
+    assert scheduler.plan(targets, now=next_day) == [("fast", "u1"), ("new", "u3")]
+    # Overdue datasets are always refreshed
+    assert ("slow", "u2") in scheduler.plan(targets, now=next_day + timedelta(days=31))
+
+
+def test_unsaved_observations_are_not_persisted(tmp_path):
+    path = tmp_path / "dpor.json"
+    scheduler = RefreshScheduler("dpor", path=str(path))
+    assert scheduler.filter_unchanged({"a": "x"}) == {"a": "x"}
+    assert RefreshScheduler("dpor", path=str(path)).datasets == {}
+
+    scheduler.save()
+    scheduler = RefreshScheduler("dpor", path=str(path))
+    assert scheduler.filter_unchanged({"a": "x", "b": "y"}) == {"b": "y"}
@@ -0,0 +1,48 @@
+from src.collectors import registry
+from src.collectors.registry import ResourceLimits, discover_collectors, get_collector, register_collector
+
+
+class PluginCollector:
+    def __init__(self, **options):
+        self.options = options
+
+
+class EntryPoint:
+    def __init__(self, name, loader):
+        self.name = name
+        self.load = loader
+
+
+def isolated_registry(monkeypatch, entry_points):
+    monkeypatch.setattr(registry, "_REGISTRY", {})
+    monkeypatch.setattr(registry, "_entry_points", lambda: entry_points)
+
+
+def test_undecorated_entry_point_is_registered_under_its_name(monkeypatch):
+    isolated_registry(monkeypatch, [EntryPoint("plugin", lambda: PluginCollector)])
+    specs = discover_collectors()
+
+    assert specs["plugin"].cls is PluginCollector
+    collector = get_collector("plugin").create(ResourceLimits(network_slots=3, memory_mb=2))
+    assert collector.options["download_workers"] == 3
+    assert collector.options["memory_budget"] == 2 * 1024 * 1024
+
+
+def test_decorated_entry_point_keeps_its_registration(monkeypatch):
+    def load():
+        return register_collector("decorated", display_name="Decorated")(PluginCollector)
+
+    isolated_registry(monkeypatch, [EntryPoint("other-name", load)])
+    specs = discover_collectors()
+    assert specs["decorated"].display_name == "Decorated"
+    assert "other-name" not in specs
+
+
+def test_broken_entry_point_is_skipped(monkeypatch, caplog):
+    def broken():
+        raise ImportError("missing dependency")
+
+    isolated_registry(monkeypatch, [EntryPoint("broken", broken), EntryPoint("plugin", lambda: PluginCollector)])
+    specs = discover_collectors()
+    assert "broken" not in specs and "plugin" in specs
+    assert "broken" in caplog.text
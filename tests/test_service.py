@@ -0,0 +1,75 @@
+import queue
+
+import pytest
+
+from src import orchestrator, service
+from src.collectors.registry import CollectorSpec, ResourceLimits
+from src.service import CollectorService
+
+
+class WarmCollector:
+    """Collects a few records and counts how often it was created and reset"""
+
+    created = 0
+
+    def __init__(self, **options):
+        WarmCollector.created += 1
+        self.resets = 0
+
+    def collect(self):
+        return [{"License Number": "1"}, {"License Number": "2"}]
+
+    def reset_run(self, **options):
+        self.resets += 1
+
+    def clear_cache(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def collectors(monkeypatch):
+    specs = {"a": CollectorSpec("a", WarmCollector, "A", ResourceLimits())}
+    monkeypatch.setattr(orchestrator, "discover_collectors", lambda: specs)
+    monkeypatch.setattr(service, "list_collectors", lambda: sorted(specs))
+    WarmCollector.created = 0
+
+
+def test_trigger_rejects_unknown_and_mistyped_options(collectors):
+    svc = CollectorService(defaults={})
+    with pytest.raises(ValueError, match="Unknown run option"):
+        svc.trigger({"bogus": True})
+    with pytest.raises(ValueError, match="must be bool"):
+        svc.trigger({"upload": "yes"})
+    with pytest.raises(ValueError, match="Unknown collector"):
+        svc.trigger({"collectors": ["nope"]})
+    assert svc.status()["queued"] == 0
+
+
+def test_trigger_queues_up_to_max_pending(collectors):
+    svc = CollectorService(defaults={"upload": False}, max_pending=1)
+    run = svc.trigger({"upload": True})
+    assert run["state"] == "queued" and run["options"] == {"upload": True}
+    with pytest.raises(queue.Full):
+        svc.trigger()
+    assert svc.status()["queued"] == 1
+
+
+def test_runs_reuse_warm_collectors_and_show_in_status(collectors):
+    svc = CollectorService(defaults={})
+    for _ in range(2):
+        svc.trigger()
+        svc._execute(svc._queue.get_nowait())
+
+    status = svc.status()
+    assert status["state"] == "idle" and status["current"] is None
+    assert status["warm_collectors"] == ["a"]
+    assert [r["state"] for r in status["recent"]] == ["succeeded", "succeeded"]
+    assert status["recent"][0]["results"][0]["records"] == 2
+    assert "profiler" not in status["recent"][0]
+    # Created once, then reset before the second run and after each run
+    assert WarmCollector.created == 1
+    assert svc.pool["a"].resets == 3
+    assert svc.get_run(status["recent"][0]["id"])["state"] == "succeeded"
@@ -0,0 +1,89 @@
+import threading
+import time
+
+from src.utils.task_queue import DONE, FAILED, LEASED, TaskQueue
+
+
+def make_queue(tmp_path, **kwargs):
+    return TaskQueue(str(tmp_path / "tasks.db"), **kwargs)
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0)
+    queue.enqueue("run", "download", "0225crnt", max_attempts=3)
+
+    first = queue.claim(owner="a")
+    time.sleep(0.01)
+    second = queue.claim(owner="b")
+
+    assert first.id == second.id
+    assert second.attempts == 2
+    assert second.lease_owner == "b"
+
+
+def test_expired_lease_retries_are_bounded(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0)
+    queue.enqueue("run", "download", "0225crnt", max_attempts=2)
+
+    claims = 0
+    for _ in range(5):
+        time.sleep(0.01)
+        if queue.claim(owner="worker") is not None:
+            claims += 1
+
+    assert claims == 2
+    assert queue.counts("run") == {"download": {FAILED: 1}}
+    assert queue.is_drained("run")
+
+
+def test_sweep_keeps_the_last_error(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=0, retry_delay=0)
+    queue.enqueue("run", "process", "0225crnt", max_attempts=2)
+
+    queue.fail(queue.claim(owner="a"), "parse error")
+    time.sleep(0.01)
+    assert queue.claim(owner="b").attempts == 2
+    time.sleep(0.01)
+
+    assert queue.sweep("run") == 1
+    with queue.engine.connect() as conn:
+        state, error = conn.exec_driver_sql("SELECT state, last_error FROM collector_tasks").one()
+    assert (state, error) == (FAILED, "parse error")
+
+
+def test_live_lease_is_not_swept(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=60)
+    queue.enqueue("run", "upload", "0225crnt", max_attempts=1)
+
+    task = queue.claim(owner="a")
+    assert queue.sweep("run") == 0
+    assert queue.counts("run") == {"upload": {LEASED: 1}}
+    queue.complete(task)
+    assert queue.counts("run") == {"upload": {DONE: 1}}
+
+
+def test_two_workers_never_claim_the_same_task(tmp_path):
+    location = str(tmp_path / "tasks.db")
+    TaskQueue(location).enqueue_many("run", "download", [(f"{i:04d}crnt", {}) for i in range(50)])
+
+    claimed = {"a": [], "b": []}
+    start = threading.Barrier(2)
+
+    def work(owner):
+        queue = TaskQueue(location)
+        start.wait()
+        while True:
+            task = queue.claim(owner=owner)
+            if task is None:
+                return
+            claimed[owner].append(task.id)
+
+    threads = [threading.Thread(target=work, args=(owner,)) for owner in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ids = claimed["a"] + claimed["b"]
+    assert len(ids) == 50
+    assert len(set(ids)) == 50
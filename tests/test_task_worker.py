@@ -0,0 +1,40 @@
+from src.task_worker import TaskWorker
+from src.utils import upload_api
+from src.utils.record_io import write_records
+from src.utils.task_queue import DONE, FAILED, TaskQueue
+
+
+def upload_task(tmp_path, records):
+    queue = TaskQueue(str(tmp_path / "tasks.db"))
+    path = tmp_path / "records.jsonl.gz"
+    count = write_records(path, records)
+    queue.enqueue("run", "upload", "dpor:0225crnt", {"records": str(path), "count": count,
+                                                     "work_dir": str(tmp_path)}, max_attempts=1)
+    return queue
+
+
+def test_partially_failed_upload_fails_the_task(tmp_path, monkeypatch):
+    class PartialUploader(upload_api.VKBulkUploader):
+        """Sends batches of two; the batch holding record 3 hits a server error."""
+
+        def __init__(self, **kwargs):
+            super().__init__(batch_size=2, quarantine_path=str(tmp_path / "quarantine.jsonl"), **kwargs)
+
+        def _post_batch(self, batch, batch_num, quiet=False):
+            ok = all(record["id"] != 3 for record in batch)
+            return ok, 200 if ok else 500, "" if ok else "unavailable"
+
+    monkeypatch.setattr(upload_api, "VKBulkUploader", PartialUploader)
+    queue = upload_task(tmp_path, [{"id": i} for i in range(6)])
+
+    assert TaskWorker(queue, run_id="run", poll_interval=0).run(exit_when_idle=True) == 0
+    assert queue.counts("run") == {"upload": {FAILED: 1}}
+
+
+def test_complete_upload_marks_the_task_done(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_api.VKBulkUploader, "_post_batch",
+                        lambda self, batch, batch_num, quiet=False: (True, 200, ""))
+    queue = upload_task(tmp_path, [{"id": i} for i in range(6)])
+
+    assert TaskWorker(queue, run_id="run", poll_interval=0).run(exit_when_idle=True) == 1
+    assert queue.counts("run") == {"upload": {DONE: 1}}
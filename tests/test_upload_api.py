@@ -0,0 +1,40 @@
+from src.utils.upload_api import VKBulkUploader
+
+
+def uploader(tmp_path, statuses):
+    """An uploader whose POSTs answer with the given status per record (200 unless listed)."""
+    vk = VKBulkUploader(quarantine_path=str(tmp_path / "quarantine.jsonl"))
+    posts = []
+
+    def post_batch(batch, batch_num, quiet=False):
+        posts.append(len(batch))
+        status = max((statuses.get(record["id"], 200) for record in batch), default=200)
+        return status == 200, status, "" if status == 200 else "rejected"
+
+    vk._post_batch = post_batch
+    return vk, posts
+
+
+def test_rejected_batch_is_bisected(tmp_path):
+    vk, posts = uploader(tmp_path, {5: 422})
+    assert vk.send_batch([{"id": i} for i in range(8)], 1) == (7, 1, 0)
+    assert len(posts) > 1
+
+
+def test_server_error_fails_batch_without_bisecting(tmp_path):
+    vk, posts = uploader(tmp_path, {5: 500})
+    assert vk.send_batch([{"id": i} for i in range(8)], 1) == (0, 0, 8)
+    assert posts == [8]
+    assert not (tmp_path / "quarantine.jsonl").exists()
+
+
+def test_normalize_cleans_text_and_formats_dates(tmp_path):
+    vk = VKBulkUploader(normalize=True, quarantine_path=str(tmp_path / "quarantine.jsonl"))
+    sent = []
+    vk._post_batch = lambda batch, batch_num, quiet=False: (sent.extend(batch), (True, 200, ""))[1]
+
+    stats = vk.upload_stream([{"Business Name": ' Acme, "Inc" ', "Phone": "", "Expiration Date": "2025-04-19"},
+                              {"Business Name": "O'Neil", "Phone": "555", "Expiration Date": "Apr 19, 2025"}])
+    assert stats["uploaded"] == 2
+    assert sent == [{"Business Name": "Acme Inc", "Phone": "NA", "Expiration Date": "04/19/2025"},
+                    {"Business Name": "ONeil", "Phone": "555", "Expiration Date": "04/19/2025"}]
@@ -0,0 +1,19 @@
+from src.utils.validation import RecordValidator
+
+RULES = [
+    {"name": "license_required", "field": "License Number", "check": "required"},
+    {"name": "zip_format", "field": "Zip", "check": "regex", "pattern": "\\d{5}", "allow_empty": True},
+]
+
+
+def test_records_with_another_schema_get_their_own_rules(tmp_path):
+    validator = RecordValidator(rules=RULES, output_dir=str(tmp_path))
+    records = [
+        {"Zip": "22030"},                               # no License Number: always fails
+        {"Zip": "22030", "License Number": "2705"},     # superset schema: must pass
+        {"License Number": "2705", "Zip": "abc"},       # same fields, another order
+        {"License Number": "0401", "Zip": ""},
+    ]
+    valid = list(validator.iter_valid(records))
+    assert valid == [records[1], records[3]]
+    assert validator.rule_counts == {"license_required": 1, "zip_format": 1}
@@ -0,0 +1,37 @@
+import argparse
+
+import pytest
+
+from src.utils.zip_county import ZipCountyTable, add_enrichment_arguments, build_table, zip_table_from_args
+
+
+def parse(*argv):
+    parser = argparse.ArgumentParser()
+    add_enrichment_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def test_missing_table_fails_when_enrichment_is_required(tmp_path):
+    missing = str(tmp_path / "zip_county.bin")
+    with pytest.raises(FileNotFoundError, match="zip_county build"):
+        zip_table_from_args(parse("--zip-table", missing))
+    with pytest.raises(FileNotFoundError):
+        ZipCountyTable.open_default(missing, required=True)
+    assert ZipCountyTable.open_default(missing) is None
+    assert zip_table_from_args(parse("--no-enrich", "--zip-table", missing)) is None
+
+
+def test_built_table_enriches_county(tmp_path):
+    crosswalk = tmp_path / "crosswalk.csv"
+    crosswalk.write_text("zip,county,city,ratio\n22030,Fairfax,FAIRFAX,0.9\n22030,Loudoun,,0.1\n"
+                         "23219,Richmond City,RICHMOND,1\n", encoding="utf-8")
+    path = build_table(str(crosswalk), str(tmp_path / "zip_county.bin"), city_column="city", weight_column="ratio")
+
+    table = zip_table_from_args(parse("--enrich", "--zip-table", str(path)))
+    records = [{"Zip": "22030-1234", "County": "", "City": ""}, {"Zip": "23219", "County": "Henrico"},
+               {"Zip": "99999", "County": ""}]
+    assert table.enrich(records) == 1
+    assert records[0] == {"Zip": "22030-1234", "County": "Fairfax", "City": "Fairfax"}
+    assert records[1]["County"] == "Henrico"
+    assert records[2]["County"] == ""
+    table.close()